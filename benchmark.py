@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from screener.FMPStandIn import FMPStandIn
+from screener.Profiler import RunProfiler
+
+SCREENERS = ["alpha", "beta", "v1", "v2"]
+
+class OfflineSheet:
+  # stands in for the Google Sheet: nothing was seen before and nothing is written
+  def get_all_previously_seen_tickers(self) -> set:
+    return set()
+
+def peak_rss_mb() -> float:
+  import resource
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10) # bytes on macOS, KiB on Linux
+
+async def screen(name: str, universe_path: str, profile_path: str = None, stream: bool = False) -> dict:
+  """
+  Runs one screener end to end against whatever `FMP_BASE_URL` points at. Executed in a fresh process per screener.
+  """
+  from screener.FMPClient import FMPClient
+  from screener.AsyncScreener import AsyncScreener
+  from screener.AsyncScreener2 import AsyncScreener2
+  from screenerV3.alpha_module import AlphaModule
+  from screenerV3.beta_module import BetaModule
+  from screener.RunMetrics import get_run_metrics
+  with open(universe_path, 'r') as file:
+    tickers = json.load(file)
+  started = time.perf_counter()
+  async with FMPClient() as client:
+    if name == "alpha":
+      module = AlphaModule(None, client= client, tickers= tickers)
+    elif name == "beta":
+      module = BetaModule(None, client= client, tickers= tickers)
+    elif name == "v1":
+      module = AsyncScreener(universe_path, client= client, sheet_client= OfflineSheet())
+    else:
+      module = AsyncScreener2(universe_path, client= client, sheet_client= OfflineSheet(), stream= stream)
+    if profile_path:
+      async with RunProfiler(profile_path):
+        await module.run_async(retry_delay= 1.0)
+    else:
+      await module.run_async(retry_delay= 1.0)
+    stats = client.get_stats()
+  return {
+    "screener": name,
+    "tickers": sum(len(i) for i in tickers.values()),
+    "results": len(module.results),
+    "wall_seconds": time.perf_counter() - started,
+    "phases": module.timings,
+    "requests": stats["requests"],
+    "retries": stats["retries"],
+    "failed": stats["failed"],
+    "peak_rss_mb": peak_rss_mb(),
+    "metrics": get_run_metrics().report(),
+  }
+
+async def run_child(name: str, args, universe_path: str, url: str, workdir: str) -> dict:
+  env = {k: v for k, v in os.environ.items() if not k.startswith("FMP_KEY")}
+  env.update({"FMP_BASE_URL": url, "FMP_RATE_LIMIT": str(args.client_rate_limit), "PYTHONPATH": os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)), os.environ.get("PYTHONPATH")]))})
+  env["FMP_KEY"] = os.environ.get("FMP_KEY", "") if args.mode == "record" else "benchmark"
+  cwd = os.path.join(workdir, name) # fresh caches, snapshots and checkpoints per screener
+  os.makedirs(cwd)
+  command = [sys.executable, os.path.abspath(__file__), "--child", name, "--universe", universe_path]
+  if args.profile:
+    command += ["--profile", os.path.join(os.path.abspath(args.profile), name)]
+  if args.stream:
+    command += ["--stream"]
+  process = await asyncio.create_subprocess_exec(*command, cwd= cwd, env= env, stdout= asyncio.subprocess.PIPE)
+  output, _ = await process.communicate()
+  lines = output.decode().strip().splitlines()
+  if process.returncode != 0 or not lines:
+    raise RuntimeError(f"The {name} benchmark exited with {process.returncode}")
+  print("\n".join(lines[:-1])) if args.verbose else None
+  return json.loads(lines[-1])
+
+def synthetic_universe(count: int) -> dict[str:list]:
+  countries = ["USA", "Japan", "Canada", "United Kingdom", "Germany"]
+  universe = {country: [] for country in countries}
+  for i in range(count):
+    universe[countries[i % len(countries)]].append(f"SYN{i:05d}")
+  return universe
+
+def report(runs: list[dict]) -> str:
+  lines = [f"{'screener':<9}{'tickers':>8}{'results':>8}{'wall s':>9}{'tickers/s':>11}{'requests':>10}{'req/s':>9}{'peak RSS MB':>13}"]
+  for run in runs:
+    lines.append(f"{run['screener']:<9}{run['tickers']:>8}{run['results']:>8}{run['wall_seconds']:>9.2f}{run['tickers_per_second']:>11.1f}{run['requests']:>10}{run['requests_per_second']:>9.1f}{run['peak_rss_mb']:>13.1f}")
+    lines.append("  " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in run["phases"].items()))
+  return "\n".join(lines)
+
+async def main(args) -> None:
+  with tempfile.TemporaryDirectory(prefix="fmp_benchmark_") as workdir:
+    if args.universe:
+      universe_path = os.path.abspath(args.universe)
+      with open(universe_path, 'r') as file:
+        universe = json.load(file)
+    else:
+      universe = synthetic_universe(args.tickers)
+      universe_path = os.path.join(workdir, "universe.json")
+      with open(universe_path, 'w') as file:
+        json.dump(universe, file)
+    symbols = [i for v in universe.values() for i in v]
+    stand_in = FMPStandIn(symbols, args.latency, rate_limit= args.rate_limit, throttle_rate= args.throttle_rate, error_rate= args.error_rate, mode= args.mode, cassette= args.cassette)
+    runs = []
+    async with stand_in:
+      print(f"Benchmarking {', '.join(args.screeners)} over {len(symbols)} tickers against {stand_in.url} ({args.mode}).")
+      for name in args.screeners:
+        run = await run_child(name, args, universe_path, stand_in.url, workdir)
+        run["tickers_per_second"] = run["tickers"] / run["wall_seconds"]
+        run["requests_per_second"] = run["requests"] / run["wall_seconds"]
+        runs.append(run)
+    print(report(runs))
+    print(f"Stand-in: {stand_in.get_stats()}")
+    if args.output:
+      with open(args.output, 'w') as file:
+        json.dump({"settings": vars(args), "runs": runs, "stand_in": stand_in.get_stats()}, file, indent= 2)
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Run every screener end to end against a local FMP stand-in and report throughput.")
+  parser.add_argument("--screeners", nargs="+", choices=SCREENERS, default=SCREENERS)
+  parser.add_argument("--tickers", type=int, default=500, help="size of the synthetic universe")
+  parser.add_argument("--universe", help="ticker JSON file (country -> tickers) to screen instead of a synthetic universe")
+  parser.add_argument("--latency", type=float, default=0.02, help="mean seconds per response")
+  parser.add_argument("--rate-limit", type=int, help="requests per minute the stand-in allows per key")
+  parser.add_argument("--client-rate-limit", type=int, default=100000, help="FMP_RATE_LIMIT of the screeners")
+  parser.add_argument("--throttle-rate", type=float, default=0.0)
+  parser.add_argument("--error-rate", type=float, default=0.0)
+  parser.add_argument("--mode", choices=["synthetic", "record", "replay"], default="synthetic", help="record forwards to FMP with your FMP_KEY")
+  parser.add_argument("--cassette", help="JSON lines file to record to or replay from")
+  parser.add_argument("--output", help="write the results as JSON")
+  parser.add_argument("--profile", help="directory to write per-phase profiles and event loop blocks to, one subdirectory per screener")
+  parser.add_argument("--stream", action="store_true", help="run V2 in streaming mode, evaluating every ticker as its data arrives")
+  parser.add_argument("--verbose", action="store_true", help="show the screeners' output")
+  parser.add_argument("--child", choices=SCREENERS, help=argparse.SUPPRESS)
+  args = parser.parse_args()
+  if args.child:
+    print(json.dumps(asyncio.run(screen(args.child, args.universe, args.profile, args.stream))))
+  else:
+    asyncio.run(main(args))
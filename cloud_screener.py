@@ -1,22 +1,67 @@
 import asyncio
+from screener.FMPClient import FMPClient
+from screener.BulkClient import BulkClient
+from screener.ResponseCache import ResponseCache
+from screener.SharedFetch import SharedFetch
+from screener.RunMetrics import get_run_metrics
+from screener.Profiler import RunProfiler
 from screenerV3.alpha_module import AlphaModule
 from screenerV3.beta_module import BetaModule
-from time import sleep
+from screenerV3.runner import ShardedRunner
 
 service_account = './screener/service_account.json'
 v1_path = './data/cleaned_tickers.json'
 v2_path = './data/non_banking_tickers.json'
 test_path = './data/test_data.json'
+bulk_path = './data/bulk'
+cache_path = './data/fmp_cache.sqlite'
+report_path = './data/reports/run' # run report, written as .json and as .prom (Prometheus text format)
+profile = False # profile every phase (cProfile, tracemalloc) and flag callbacks blocking the event loop; written to ./data/reports/profile
+use_bulk = False # read profiles, statements & key metrics from FMP bulk dumps
+resume = False # pick up an interrupted run from the checkpoint journals in ./data/checkpoints
+processes = 1 # > 1 screens the universe in that many processes, sharded by country, under one rate budget
+combined = False # screen Alpha and Beta together, fetching every response once for both (single process only)
+
+async def run(module) -> None:
+  if processes > 1:
+    await ShardedRunner(module, processes, cache_path= cache_path).run_async(debug= False, resume= resume)
+  else:
+    await module.run_async(debug= False, resume= resume)
+
+async def screen() -> None:
+  cache = ResponseCache(cache_path)
+  async with FMPClient(cache= cache) as client:
+    print(f"{await cache.sync_filings(client)} stored statements invalidated by new filings.")
+    if use_bulk:
+      client = BulkClient(bulk_path, client)
+      await client.ingest()
+    if combined and processes == 1:
+      client = SharedFetch(client)
+      a = AlphaModule(v1_path, sheet_path= service_account, client= client)
+      b = BetaModule(v2_path, sheet_path= service_account, client= client)
+      await asyncio.gather(run(a), run(b))
+      a.update_google_sheet(debug= False)
+      b.update_google_sheet(debug= False)
+    else:
+      a = AlphaModule(v1_path, sheet_path= service_account, client= client)
+      await run(a)
+      a.update_google_sheet(debug= False)
+      b = BetaModule(v2_path, sheet_path= service_account, client= client)
+      await run(b)
+      b.update_google_sheet(debug= False)
+    print(f"Connection stats: {client.get_stats()}")
+    print(client.keys.report())
+  cache.close()
 
 async def main() -> None:
-  a = AlphaModule(v1_path, sheet_path= service_account)
-  await a.run_async(debug= False)
-  a.update_google_sheet(debug= False)
-  print("Sleeping for 1 minute.")
-  sleep(60)
-  b = BetaModule(v2_path, sheet_path= service_account)
-  await b.run_async(debug= False)
-  b.update_google_sheet(debug= False)
+  if profile:
+    async with RunProfiler('./data/reports/profile'):
+      await screen()
+  else:
+    await screen()
+  metrics = get_run_metrics()
+  metrics.write_report(f"{report_path}.json")
+  metrics.write_prometheus(f"{report_path}.prom")
 
 
 if __name__ == "__main__":
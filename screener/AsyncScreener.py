@@ -1,22 +1,31 @@
-from datetime import datetime
 from dotenv import load_dotenv
-from time import sleep
 from screener.Sheet import Sheet
-import pandas as pd
+from screener.RateLimiter import RateLimiter
+from screener.FMPClient import FMPClient, FMPRequestError
+from screener.Results import Results
+from screener import Metrics
+import numpy as np
 import aiohttp
 import asyncio
-import os
+import time
 import json
 
 load_dotenv()
 
 class AsyncScreener:
-    def __init__(self, ticker_path: str, sheet_path:str = "./service_account.json", sheet_name: str = "Screener"):
+    def __init__(self, ticker_path: str, sheet_path:str = "./service_account.json", sheet_name: str = "Screener", rate_limiter: RateLimiter = None, fan_out: bool = True, max_concurrency: int = 50, client: FMPClient = None, sheet_client: Sheet = None):
         self.tickers = self.__process_tickers(ticker_path)
-        self.key = os.environ['FMP_KEY']
-        self.sheet_client = Sheet(sheet_path= sheet_path, file_name=sheet_name)
-        self.results = {}
+        self.client = client or FMPClient(rate_limiter=rate_limiter)
+        self.rate_limiter = self.client.rate_limiter
+        self.__owns_client = client is None
+        self.fan_out = fan_out
+        self.max_concurrency = max_concurrency
+        self.__semaphore = None
+        self.retry_queue = set()
+        self.sheet_client = sheet_client or Sheet(sheet_path= sheet_path, file_name=sheet_name)
+        self.results = Results()
         self.negative_paypack_rating = []
+        self.timings = {}
         self.previous = self.sheet_client.get_all_previously_seen_tickers()
 
     def __read_json_file(self, file_path) -> dict[str:list]:
@@ -78,7 +87,7 @@ class AsyncScreener:
         Sort the results dictionary in place first by "NCAV Ratio" (lowest to highest)
         and then by "Payback Rating" (lowest to highest).
         """
-        self.results = dict(sorted(self.results.items(), key=lambda x: (x[1]["NCAV Ratio"], x[1]["Payback Rating"])))
+        self.results = self.results.sort("NCAV Ratio", "Payback Rating")
     
     def __remove_previously_seen(self) -> list[str]:
         """
@@ -87,12 +96,9 @@ class AsyncScreener:
         Returns:
         - `None`
         """
-        drop = [i for i in self.results.keys() if i in self.previous]
-        for i in drop:
-            try:
-                self.results.pop(i)
-            except:
-                continue
+        self.results = Results.from_dict(self.results)
+        drop = [i for i in self.results if i in self.previous]
+        self.results = self.results.drop(drop)
         return drop
     
     def __calculate_packback_rating(self, debug: bool = False) -> None:
@@ -102,67 +108,63 @@ class AsyncScreener:
         Returns:
         - `None`
         """
-        for k, v in self.results.items():
-            cash_equivalents = v.get("Cash & Equivalents", 0)
-            earnings_average = v.get("5Y average", 0)
-            market_cap = v.get("Market Capitalization", 0)
-            if cash_equivalents > market_cap:
-                v["Payback Rating"] = 0.5
-            elif market_cap <= (cash_equivalents + earnings_average):
-                v["Payback Rating"] = 1
-            elif market_cap <= (cash_equivalents + (earnings_average * 2)):
-                v["Payback Rating"] = 2
-            elif market_cap <= (cash_equivalents + (earnings_average * 3)):
-                v["Payback Rating"] = 3
-            else:
-                self.negative_paypack_rating.append(k)
-
-        for i in self.negative_paypack_rating:
-            self.results.pop(i)
+        rating = Metrics.payback_rating(self.results.column("Cash & Equivalents", 0), self.results.column("5Y average", 0), self.results.column("Market Capitalization", 0))
+        self.results.set_column("Payback Rating", rating)
+        self.negative_paypack_rating.extend(self.results.index[np.isnan(rating)].tolist())
+        self.results = self.results.filter(~np.isnan(rating))
 
         self.__sort_results_dict()
         if debug:
             print(
                 f"Removed {len(self.negative_paypack_rating)} with a negative payback rating.")
 
-    async def __get_data(self, session: aiohttp.ClientSession, ticker: str) -> tuple:
-        profile = await self.__get_profile(session, ticker)
-        cashflow = await self.__get_cashflow(session, ticker)
-        balance_sheet = await self.__get_balance_sheet(session, ticker)
-        return profile, cashflow, balance_sheet
+    async def __get_data(self, ticker: str) -> tuple:
+        """
+        Retrieves the profile, cash flow and balance sheet for a given ticker.
 
-    async def __get_profile(self, session: aiohttp.ClientSession, ticker: str) -> str:
-        async with session.get(f'https://financialmodelingprep.com/api/v3/profile/{ticker}?apikey={self.key}') as response:
-            try:
-                return await response.json()
-            except Exception as e:
-                pass
+        When `fan_out` is enabled the three endpoints are requested concurrently.
 
-    async def __get_cashflow(self, session: aiohttp.ClientSession, ticker: str) -> str:
-        async with session.get(f'https://financialmodelingprep.com/api/v3/cash-flow-statement/{ticker}?period=annual&limit=5&apikey={self.key}') as response:
-            try:
-                return await response.json()
-            except Exception as e:
-                pass
+        Parameters:
+        - `ticker` (str): The stock ticker symbol.
+
+        Returns:
+        - `tuple`: The profile, cash flow and balance sheet data. Endpoints that failed are `None`.
+        """
+        fetchers = [self.__get_profile, self.__get_cashflow, self.__get_balance_sheet]
+        if self.fan_out:
+            return tuple(await asyncio.gather(*[self.__fetch(fetcher, ticker) for fetcher in fetchers]))
+        return tuple([await self.__fetch(fetcher, ticker) for fetcher in fetchers])
 
-    async def __get_balance_sheet(self, session: aiohttp.ClientSession, ticker: str) -> str:
-        async with session.get(f'https://financialmodelingprep.com/api/v3/balance-sheet-statement/{ticker}?period=quarter&limit=5&apikey={self.key}') as response:
+    async def __fetch(self, fetcher, ticker: str):
+        """
+        Runs a single endpoint fetcher under the concurrency limit, returning `None` if it fails.
+        Tickers whose request was still throttled after every retry are added to `retry_queue`.
+        """
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self.__semaphore:
             try:
-                return await response.json()
-            except Exception as e:
-                pass
+                return await fetcher(ticker)
+            except FMPRequestError:
+                self.retry_queue.add(ticker)
+                return None
+            except aiohttp.ClientError:
+                return None
+
+    async def __get_profile(self, ticker: str) -> str:
+        return await self.client.get_json(f'v3/profile/{ticker}')
+
+    async def __get_cashflow(self, ticker: str) -> str:
+        return await self.client.get_json(f'v3/cash-flow-statement/{ticker}', period='annual', limit=5)
+
+    async def __get_balance_sheet(self, ticker: str) -> str:
+        return await self.client.get_json(f'v3/balance-sheet-statement/{ticker}', period='quarter', limit=5)
     
-    async def __get_historical(self, session: aiohttp.ClientSession, ticker: str) -> str:
-        async with session.get(f'https://financialmodelingprep.com/api/v3/historical-price-full/{ticker}?apikey={self.key}') as response:
-            try:
-                return await response.json()
-            except Exception as e:
-                pass
+    async def __get_historical(self, ticker: str) -> str:
+        return await self.client.get_json(f'v3/historical-price-full/{ticker}')
     
     async def get_all_shares_float(self) -> str:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f'https://financialmodelingprep.com/api/v4/shares_float/all?apikey={self.key}') as response:
-                return await response.json()
+        return await self.client.get_json('v4/shares_float/all')
             
 
     def __calculate_5Y_price(self, historical:dict):
@@ -177,90 +179,107 @@ class AsyncScreener:
     async def __handle_tickers(self, tickers: list[str], debug: bool = False) -> None:
         if debug:
             print(
-                f"{len(self.tickers)//2}/{len(len(self.tickers))} tickers processed...")
-        async with aiohttp.ClientSession() as session:
-            tasks = [self.__get_data(session, ticker) for ticker in tickers]
-            results = await asyncio.gather(*tasks)
-            for ticker, (profile, cashflow, balance_sheet) in zip(tickers, results):
-                try:
-                    net_debt = int(balance_sheet[0]["netDebt"])
-                    if net_debt > 0:
-                        continue
-                except:
+                f"{len(self.tickers)//2}/{len(self.tickers)} tickers processed...")
+        tasks = [self.__get_data(ticker) for ticker in tickers]
+        results = await asyncio.gather(*tasks)
+        for ticker, (profile, cashflow, balance_sheet) in zip(tickers, results):
+            if ticker in self.retry_queue:
+                continue
+            try:
+                net_debt = int(balance_sheet[0]["netDebt"])
+                if net_debt > 0:
                     continue
-                try:
-                    div = float(profile[0]["lastDiv"])
-                    if div > 0:
+            except:
+                continue
+            try:
+                div = float(profile[0]["lastDiv"])
+                if div > 0:
+                    has_dividends = True
+                else:
+                    buyback = sum([i["commonStockRepurchased"]
+                                  for i in cashflow])
+                    if buyback < 0:
                         has_dividends = True
                     else:
-                        buyback = sum([i["commonStockRepurchased"]
-                                      for i in cashflow])
-                        if buyback < 0:
-                            has_dividends = True
-                        else:
-                            continue
-                except:
-                    try:
-                        buyback = sum([i["commonStockRepurchased"]
-                                      for i in cashflow])
-                        if buyback < 0:
-                            has_dividends = True
-                        else:
-                            continue
-                    except:
                         continue
+            except:
                 try:
-                    current_assets = int(balance_sheet[0]["totalCurrentAssets"])
-                    total_liabilities = int(balance_sheet[0]["totalLiabilities"])
-                    ncav = current_assets - total_liabilities
-                    if ncav < 0:
-                        continue
-                    market_cap = int(profile[0]["mktCap"])
-                    if market_cap <= 0:
-                        continue
-                    five_year_fcf_average = sum(
-                        [i['freeCashFlow'] for i in cashflow])/5
-                    average_yield = round(
-                        (five_year_fcf_average/market_cap)*100, 2)
-                    if average_yield < 10:
-                        continue
-                    ratio = round(market_cap / ncav, 1)
-                    country = profile[0]["country"]
-                    industry = profile[0]["industry"]
-                    if country == "CN" or country == "HK":
-                        continue
-                    if industry[:5] == "Banks" or industry[:9] == "Insurance" or industry[:10] == "Investment" or industry == "Asset Management":
+                    buyback = sum([i["commonStockRepurchased"]
+                                  for i in cashflow])
+                    if buyback < 0:
+                        has_dividends = True
+                    else:
                         continue
                 except:
                     continue
-                
-                self.results[ticker] = {
-                    "Name": profile[0]["companyName"],
-                    "HQ Location": country,
-                    "Exchange Location": profile[0]["exchange"],
-                    "Industry": industry,
-                    "Has Dividends or Buybacks": has_dividends,
-                    "Net Debt": net_debt,
-                    "Cash & Equivalents": cashflow[0]["cashAtEndOfPeriod"],
-                    "5Y average yield > 10%": average_yield,
-                    "5Y average": five_year_fcf_average,
-                    "Positive NCAV": True,
-                    "Market Capitalization": market_cap,
-                    "NCAV Ratio": ratio,
-                }
+            try:
+                current_assets = int(balance_sheet[0]["totalCurrentAssets"])
+                total_liabilities = int(balance_sheet[0]["totalLiabilities"])
+                ncav = current_assets - total_liabilities
+                if ncav < 0:
+                    continue
+                market_cap = int(profile[0]["mktCap"])
+                if market_cap <= 0:
+                    continue
+                five_year_fcf_average = sum(
+                    [i['freeCashFlow'] for i in cashflow])/5
+                average_yield = round(
+                    (five_year_fcf_average/market_cap)*100, 2)
+                if average_yield < 10:
+                    continue
+                ratio = round(market_cap / ncav, 1)
+                country = profile[0]["country"]
+                industry = profile[0]["industry"]
+                if country == "CN" or country == "HK":
+                    continue
+                if industry[:5] == "Banks" or industry[:9] == "Insurance" or industry[:10] == "Investment" or industry == "Asset Management":
+                    continue
+            except:
+                continue
+            
+            self.results.append(ticker, {
+                "Name": profile[0]["companyName"],
+                "HQ Location": country,
+                "Exchange Location": profile[0]["exchange"],
+                "Industry": industry,
+                "Has Dividends or Buybacks": has_dividends,
+                "Net Debt": net_debt,
+                "Cash & Equivalents": cashflow[0]["cashAtEndOfPeriod"],
+                "5Y average yield > 10%": average_yield,
+                "5Y average": five_year_fcf_average,
+                "Positive NCAV": True,
+                "Market Capitalization": market_cap,
+                "NCAV Ratio": ratio,
+            })
+
+    async def __drain_retry_queue(self, batch_size: int, retry_delay: float) -> None:
+        if not self.retry_queue:
+            return
+        tickers, self.retry_queue = sorted(self.retry_queue), set()
+        print(f"Retrying {len(tickers)} deferred stocks in {retry_delay} seconds...")
+        await asyncio.sleep(retry_delay)
+        for i in range(0, len(tickers), batch_size):
+            await self.__handle_tickers(tickers=tickers[i:i+batch_size])
+        if self.retry_queue:
+            print(f"{len(self.retry_queue)} stocks could not be fetched.")
 
-    async def run_async(self, batch_size=100) -> None:
+    async def run_async(self, batch_size=100, retry_delay=30.0) -> None:
         ticker_arr = [item for sublist in self.tickers.values()
                       for item in sublist]
-        for i in range(0, len(ticker_arr), batch_size):
-            is_middle = i == len(ticker_arr)//2
-            start = datetime.now()
-            await self.__handle_tickers(tickers=ticker_arr[i:i+batch_size], debug=is_middle)
-            rem = 61-(datetime.now()-start).seconds
-            if rem > 0:
-                sleep(rem)
+        started = time.perf_counter()
+        try:
+            for i in range(0, len(ticker_arr), batch_size):
+                is_middle = i == len(ticker_arr)//2
+                await self.__handle_tickers(tickers=ticker_arr[i:i+batch_size], debug=is_middle)
+            await self.__drain_retry_queue(batch_size, retry_delay)
+        finally:
+            if self.__owns_client:
+                await self.client.close()
 
+        self.timings = {"fetch": time.perf_counter() - started}
+        started = time.perf_counter()
         self.__calculate_packback_rating()
+        self.timings["payback"] = time.perf_counter() - started
         print(f"{len(self.results)} stocks remaining after screening")
 
     def create_xlsx(self, file_path:str) -> None:
@@ -276,7 +295,7 @@ class AsyncScreener:
         if len(self.results) == 0:
             print(f'ERROR: results dictionary is empty. Execute `Screener.run()` to screen the stocks. If you are still seeing this after running `Screener.run()`, there are no new stocks from the previous execution.')
         else:
-            df = pd.DataFrame.from_dict(self.results, orient='index')
+            df = Results.from_dict(self.results).to_frame()
             df.to_excel(file_path)
             print(f"File saved to {file_path}")
     
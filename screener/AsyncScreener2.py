@@ -1,17 +1,24 @@
-from datetime import datetime
 from dotenv import load_dotenv
-from time import sleep
 from .Sheet import Sheet
 from .Utilities import process_tickers
+from .RateLimiter import RateLimiter
+from .FMPClient import FMPClient, FMPRequestError
+from .FloatIndex import FloatIndex
+from .Journal import Journal
+from .Profiler import mark_phase
+from .RunMetrics import RunMetrics, get_run_metrics
+from .Results import Results
+from . import Metrics
+from .Rules import Rules, SCREENER2_RULES
 import pandas as pd
 import aiohttp
 import asyncio
-import os
+import time
 
 load_dotenv()
 
 class AsyncScreener2:
-    def __init__(self, ticker_path: str, sheet_path:str = "./service_account.json", sheet_name: str = "V2 Screener") -> None:
+    def __init__(self, ticker_path: str, sheet_path:str = "./service_account.json", sheet_name: str = "V2 Screener", rate_limiter: RateLimiter = None, fan_out: bool = True, max_concurrency: int = 50, client: FMPClient = None, checkpoint_path: str = "./data/checkpoints/screener2.jsonl", rules = None, sheet_client: Sheet = None, metrics: RunMetrics = None, stream: bool = False, max_pending: int = None) -> None:
         """
         Initializes the AsyncScreener2 instance.
 
@@ -19,17 +26,38 @@ class AsyncScreener2:
         - `ticker_path` (str): Path to the file containing the tickers to be processed.
         - `sheet_path` (str): Path to the Google Sheets service account credentials file.
         - `sheet_name` (str): Name of the Google Sheet to use for storing results.
+        - `rate_limiter` (RateLimiter): Limiter awaited before every FMP request. Defaults to the shared limiter.
+        - `fan_out` (bool): If True, a ticker's endpoints are requested concurrently. Default is True.
+        - `max_concurrency` (int): Maximum number of FMP requests in flight at once. Default is 50.
+        - `client` (FMPClient): Shared FMP client. If omitted, the screener opens its own for the duration of `run_async`.
+        - `checkpoint_path` (str): Path to the journal every screened batch is checkpointed to.
+        - `rules` (dict | str): Screen rule spec, or the path to a JSON/YAML file holding one. Must define `keep`, `isAdded`, `blacklist`, `ncav`, `ev_afcf` and `ptbv`. Defaults to `SCREENER2_RULES`.
+        - `sheet_client` (Sheet): Sheet to read previously seen tickers from and write results to, in place of the one at `sheet_path`. Anything with the same methods works, e.g. an offline stand-in for benchmarks.
+        - `metrics` (RunMetrics): Where the time and tickers in and out of every phase and batch are recorded. Defaults to the shared run metrics.
+        - `stream` (bool): If True, each ticker of a batch is evaluated as soon as its data arrives and its responses are dropped right after, instead of holding the whole batch's responses until the slowest ticker is in. Default is False.
+        - `max_pending` (int): In streaming mode, the maximum number of tickers being fetched at once, which bounds the responses held in memory whatever the batch size. Defaults to as many tickers as `max_concurrency` requests cover.
 
         Returns:
         - `None`
         """
         self.tickers = process_tickers(ticker_path)
-        self.key = os.environ['FMP_KEY']
-        self.industry_blacklist = ['Banks', 'Insurance']
-        self.sheet_client = Sheet(sheet_path= sheet_path, file_name=sheet_name)
-        self.results = dict()
+        self.client = client or FMPClient(rate_limiter=rate_limiter)
+        self.rate_limiter = self.client.rate_limiter
+        self.__owns_client = client is None
+        self.fan_out = fan_out
+        self.max_concurrency = max_concurrency
+        self.stream = stream
+        self.max_pending = max_pending or max(1, max_concurrency // 4 if fan_out else max_concurrency)
+        self.__semaphore = None
+        self.retry_queue = set()
+        self.rules = Rules(rules or SCREENER2_RULES, market_cap="market_cap_ttm")
+        self.sheet_client = sheet_client or Sheet(sheet_path= sheet_path, file_name=sheet_name)
+        self.results = Results()
         self.industry_blacklist_tickers = list()
         self.floats = None
+        self.journal = Journal(checkpoint_path)
+        self.timings = {}
+        self.metrics = metrics or get_run_metrics()
         self.previous = self.sheet_client.get_all_previously_seen_tickers()
     
     def __remove_previously_seen(self) -> list[str]:
@@ -39,113 +67,105 @@ class AsyncScreener2:
         Returns:
         - `None`
         """
-        drop = [i for i in self.results.keys() if i in self.previous]
-        for i in drop:
-            try:
-                self.results.pop(i)
-            except:
-                continue
+        self.results = Results.from_dict(self.results)
+        drop = [i for i in self.results if i in self.previous]
+        self.results = self.results.drop(drop)
         return drop
     
-    async def __get_data(self, session: aiohttp.ClientSession, ticker: str) -> tuple:
+    async def __get_data(self, ticker: str) -> tuple:
         """
         Retrieves various financial data for a given ticker.
 
         Parameters:
-        - `session` (aiohttp.ClientSession): The aiohttp session to use for making requests.
         - `ticker` (str): The stock ticker symbol.
 
         Returns:
-        - `tuple`: A tuple containing the profile, key metrics TTM, balance sheet, and cash flow data.
+        - `tuple`: A tuple containing the profile, key metrics TTM, balance sheet, and cash flow data. Endpoints that failed are `None`.
         """
-        profile = await self.__get_profile(session, ticker)
-        key_metrics_ttm = await self.__get_key_metrics(session, ticker)
-        balance_sheet = await self.__get_balance_sheet(session, ticker)
-        cashflow = await self.__get_cashflow(session, ticker)
-        return profile, key_metrics_ttm, balance_sheet, cashflow
+        fetchers = [self.__get_profile, self.__get_key_metrics, self.__get_balance_sheet, self.__get_cashflow]
+        if self.fan_out:
+            return tuple(await asyncio.gather(*[self.__fetch(fetcher, ticker) for fetcher in fetchers]))
+        return tuple([await self.__fetch(fetcher, ticker) for fetcher in fetchers])
     
-    async def __get_balance_sheet(self, session: aiohttp.ClientSession, ticker: str) -> str:
+    async def __fetch(self, fetcher, ticker: str):
+        """
+        Runs a single endpoint fetcher under the concurrency limit.
+
+        Parameters:
+        - `fetcher` (callable): One of the private `__get_*` coroutines.
+        - `ticker` (str): The stock ticker symbol.
+
+        Returns:
+        - The fetcher's result, or `None` if the request failed. Tickers whose request was still throttled after every retry are added to `retry_queue`.
+        """
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self.__semaphore:
+            try:
+                return await fetcher(ticker)
+            except FMPRequestError:
+                self.retry_queue.add(ticker)
+                return None
+            except aiohttp.ClientError:
+                return None
+    
+    async def __get_balance_sheet(self, ticker: str) -> str:
         """
         Retrieves the balance sheet for a given ticker.
 
         Parameters:
-        - `session` (aiohttp.ClientSession): The aiohttp session to use for making requests.
         - `ticker` (str): The stock ticker symbol.
 
         Returns:
         - `str`: The balance sheet data in JSON format.
         """
-        async with session.get(f'https://financialmodelingprep.com/api/v3/balance-sheet-statement/{ticker}?period=quarter&limit=5&apikey={self.key}') as response:
-            try:
-                return await response.json()
-            except Exception as e:
-                pass
+        return await self.client.get_json(f'v3/balance-sheet-statement/{ticker}', period='quarter', limit=5)
     
-    async def __get_key_metrics(self, session: aiohttp.ClientSession, ticker: str) -> str:
+    async def __get_key_metrics(self, ticker: str) -> str:
         """
         Retrieves the key metrics TTM (Trailing Twelve Months) for a given ticker.
 
         Parameters:
-        - `session` (aiohttp.ClientSession): The aiohttp session to use for making requests.
         - `ticker` (str): The stock ticker symbol.
 
         Returns:
         - `str`: The key metrics TTM data in JSON format.
         """
-        async with session.get(f'https://financialmodelingprep.com/api/v3/key-metrics-ttm/{ticker}?period=quarter&apikey={self.key}') as response:
-            try:
-                return await response.json()
-            except Exception as e:
-                pass
+        return await self.client.get_json(f'v3/key-metrics-ttm/{ticker}', period='quarter')
     
-    async def __get_profile(self, session: aiohttp.ClientSession, ticker: str) -> str:
+    async def __get_profile(self, ticker: str) -> str:
         """
         Retrieves the company profile for a given ticker.
 
         Parameters:
-        - `session` (aiohttp.ClientSession): The aiohttp session to use for making requests.
         - `ticker` (str): The stock ticker symbol.
 
         Returns:
         - `str`: The company profile data in JSON format.
         """
-        async with session.get(f'https://financialmodelingprep.com/api/v3/profile/{ticker}?period=quarter&apikey={self.key}') as response:
-            try:
-                return await response.json()
-            except Exception as e:
-                pass
+        return await self.client.get_json(f'v3/profile/{ticker}', period='quarter')
     
-    async def __get_cashflow(self, session: aiohttp.ClientSession, ticker: str) -> str:
+    async def __get_cashflow(self, ticker: str) -> str:
         """
         Retrieves the cash flow statement for a given ticker.
 
         Parameters:
-        - `session` (aiohttp.ClientSession): The aiohttp session to use for making requests.
         - `ticker` (str): The stock ticker symbol.
 
         Returns:
         - `str`: The cash flow data in JSON format.
         """
-        async with session.get(f'https://financialmodelingprep.com/api/v3/cash-flow-statement/{ticker}?period=annual&limit=4&apikey={self.key}') as response:
-            try:
-                return await response.json()
-            except Exception as e:
-                pass
+        return await self.client.get_json(f'v3/cash-flow-statement/{ticker}', period='annual', limit=4)
     
     async def __get_floats(self) -> None:
         """
-        Retrieves float data for all stocks.
+        Loads the float index for the screener's tickers.
 
         Returns:
         - `None`
         """
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"https://financialmodelingprep.com/api/v4/shares_float/all?apikey={self.key}") as response:
-                try:
-                    self.floats = await response.json()
-                except Exception as e:
-                    print(f"Error fetching floats: {e}")
-                    self.floats = None
+        tickers = [i for sublist in self.tickers.values() for i in sublist]
+        self.floats = await FloatIndex().load(self.client, tickers)
             
     def __find_float_from_ticker(self, ticker) -> int:
         """
@@ -157,11 +177,7 @@ class AsyncScreener2:
         Returns:
         - `int`: The number of outstanding shares, or 0 if not found.
         """
-        for v in self.floats:
-            if v['symbol'] == ticker:
-                return v['outstandingShares']
-        
-        return 0 # if ticker can't be found, return 0
+        return self.floats.get(ticker)
     
     
     async def __handle_screener2(self, tickers: list[str], debug: bool = False) -> None:
@@ -175,68 +191,124 @@ class AsyncScreener2:
         Returns:
         - `None`
         """
-        async with aiohttp.ClientSession() as session:
-            tasks = [self.__get_data(session, ticker) for ticker in tickers]
+        if self.stream:
+            rows = await self.__stream_screener2(tickers)
+        else:
+            tasks = [self.__get_data(ticker) for ticker in tickers]
             results = await asyncio.gather(*tasks)
-            for ticker, (profile, key_metrics_ttm, balance_sheet, cashflow) in zip(tickers, results):
-                res = {"Name":str(),"NCAV Ratio":"N/A", "P/aFCF Ratio":"N/A", "EV/aFCF":"N/A", "P/TBV Ratio":"N/A", "isAdded": False}
-                try:
-                    current_assets = int(balance_sheet[0]["totalCurrentAssets"])
-                    total_liabilities = int(balance_sheet[0]["totalLiabilities"])
-                    market_cap = int(key_metrics_ttm[0]["marketCapTTM"])
-                    ncav = current_assets - total_liabilities
-                    ratio = round(market_cap / ncav, 1)
-                    if ratio > 0 and ratio < 2.5:
-                        res["isAdded"] = True
-                        res["NCAV Ratio"] = ratio
-                    
-                    free_float = self.__find_float_from_ticker(ticker)
-                    y_0_ttm = key_metrics_ttm[0]['freeCashFlowPerShareTTM'] * free_float
-                    rest = [i['freeCashFlow'] for i in cashflow]
-                    total = y_0_ttm + sum(rest)
-                    five_year_fcf_average = total / 5 
-                    pfcfRatio = market_cap/five_year_fcf_average
-                    
-                    res["P/aFCF Ratio"] = round(pfcfRatio, 1)
-                    if pfcfRatio > 0 and pfcfRatio < 10:
-                        res["isAdded"] = True
-                    
-                    negCashflow = 0
-                    for i in rest:
-                        if i < 0:
-                            negCashflow += 1
-                    if negCashflow > 2:
-                        continue
-
-                    ev = key_metrics_ttm[0]["enterpriseValueTTM"]
-                    res["EV"] = round(ev, 1)
-                    evFCF = ev/five_year_fcf_average
-                    
-                    if evFCF > 1 and evFCF < 5:
-                        res["isAdded"] = True
-                        res["EV/aFCF"] = round(evFCF, 1)
-                    
-                    pTBV = market_cap/key_metrics_ttm[0]['tangibleAssetValueTTM']
-                    
-                    if pTBV > 0 and pTBV < 1:
-                        res["isAdded"] = True
-                        res["P/TBV Ratio"] = round(pTBV, 1)
-                    
-                    net_debt = balance_sheet[0]["netDebt"]
-                    if net_debt > 0:
-                        res["isAdded"] = False
-                    
-                    for bli in self.industry_blacklist:
-                        if bli in profile[0]['industry']:
-                            self.industry_blacklist_tickers.append(ticker)
-                    if profile[0]["country"] != "CN" and profile[0]["country"] != "HK":
-                        res["Name"] = profile[0]["companyName"]
-                        res["Country"] = profile[0]["country"]
-                        self.results[ticker] = res
-                except Exception as e:
-                    pass
+            rows = {ticker: self.__evaluate(ticker, data) for ticker, data in zip(tickers, results)}
+        # rows go into the result columns in batch order, whichever ticker came in first
+        for ticker in tickers:
+            if rows.get(ticker) is not None:
+                self.results.append(ticker, rows.pop(ticker))
+        self.__checkpoint(tickers)
+
+    async def __stream_screener2(self, tickers: list[str]) -> dict:
+        """
+        Fetches and evaluates a batch ticker by ticker.
+
+        `max_pending` workers each take the next ticker of the batch, fetch its data,
+        normalize it into a row and drop the responses before taking another ticker, so
+        at most `max_pending` tickers' responses are in flight or held at any time.
+
+        Parameters:
+        - `tickers` (list[str]): The batch.
+
+        Returns:
+        - `dict`: Ticker -> row, for the tickers that weren't deferred to the retry queue.
+        """
+        rows = {}
+        pending = iter(tickers)
+
+        async def worker() -> None:
+            for ticker in pending:
+                row = self.__evaluate(ticker, await self.__get_data(ticker))
+                if row is not None:
+                    rows[ticker] = row
+
+        await asyncio.gather(*[worker() for _ in range(min(self.max_pending, len(tickers)))])
+        return rows
+
+    def __evaluate(self, ticker: str, data: tuple) -> dict:
+        """
+        Normalizes a ticker's responses into a row.
+
+        Parameters:
+        - `ticker` (str): The stock ticker symbol.
+        - `data` (tuple): The profile, key metrics TTM, balance sheet and cash flow responses.
+
+        Returns:
+        - `dict`: The row, or `None` if the ticker's requests were deferred to the retry queue.
+        """
+        if ticker in self.retry_queue:
+            return None
+        profile, key_metrics_ttm, balance_sheet, cashflow = data
+        row = Metrics.new_row(shares=self.__find_float_from_ticker(ticker))
+        row.update(Metrics.profile_fields(profile[0] if profile else None))
+        row.update(Metrics.key_metrics_fields(key_metrics_ttm))
+        row.update(Metrics.balance_sheet_fields(balance_sheet))
+        row.update(Metrics.cashflow_fields(cashflow))
+        return row
+
+    def __checkpoint(self, tickers: list[str]) -> None:
+        """
+        Journals the normalized rows of a fetched batch. Deferred tickers are left out so a resumed run fetches them again.
+
+        Parameters:
+        - `tickers` (list[str]): The batch that was just fetched.
+
+        Returns:
+        - `None`
+        """
+        for ticker in tickers:
+            if ticker in self.results:
+                self.journal.record("ticker", ticker, dict(self.results[ticker]))
+        self.journal.flush()
+
+    def __restore(self) -> set[str]:
+        """
+        Restores the rows of an interrupted run from the journal.
+
+        Returns:
+        - `set[str]`: The tickers that were already fetched.
+        """
+        rows = self.journal.load().get("ticker", {})
+        for ticker, row in rows.items():
+            self.results.append(ticker, row)
+        return set(rows)
+
+    def screen(self) -> None:
+        """
+        Screens every fetched ticker at once over a columnar metric frame.
+
+        Until then `results` holds the normalized rows of the fetched tickers; they are
+        replaced by the reported fields of the tickers the screen keeps. Metrics that
+        can't be computed are NaN. Which tickers are kept, added or blacklisted is
+        decided by the screen's `rules`.
+
+        Returns:
+        - `None`
+        """
+        fetched, self.results = self.results, Results()
+        self.industry_blacklist_tickers = list()
+        if not len(fetched):
+            return
+        frame = Metrics.compute(Metrics.to_frame(fetched), market_cap="market_cap_ttm")
+        masks = self.rules.masks(frame)
+        results = pd.DataFrame({
+            "Name": frame["name"],
+            "NCAV Ratio": frame["ncav_ratio"].round(1).where(masks["ncav"]),
+            "P/aFCF Ratio": frame["pafcf"].round(1),
+            "EV/aFCF": frame["ev_afcf"].round(1).where(masks["ev_afcf"]),
+            "P/TBV Ratio": frame["ptbv"].round(1).where(masks["ptbv"]),
+            "isAdded": masks["isAdded"],
+            "EV": frame["ev_ttm"].round(1),
+            "Country": frame["country"],
+        })
+        self.industry_blacklist_tickers = list(frame.index[masks["keep"] & masks["blacklist"]])
+        self.results = Results.from_frame(results[masks["keep"]])
+
 
-    
     def check_pafcf(self, debug:bool=False) -> None:
         """
         Removes stocks from the results dictionary where the P/aFCF (Price-to-average-Free-Cash-Flow) ratio exceeds 10.
@@ -247,11 +319,11 @@ class AsyncScreener2:
         Returns:
         - `None`
         """
-        bad_pe = [key for key, val in self.results.items() if val['P/aFCF Ratio'] > 10]
-        for bad in bad_pe:
-            self.results.pop(bad, None)
+        self.results = Results.from_dict(self.results)
+        bad_pe = self.results.column('P/aFCF Ratio') > 10 # a ratio that couldn't be computed is NaN, which stays
+        self.results = self.results.filter(~bad_pe)
         if debug:
-            print(f"{len(bad_pe)} removed for P/aFCF Ratio")
+            print(f"{bad_pe.sum()} removed for P/aFCF Ratio")
 
 
     def clean_results(self, debug:bool=False) -> None:
@@ -264,68 +336,113 @@ class AsyncScreener2:
         Returns:
         - `None`
         """
-        to_remove = [key for key, val in self.results.items() if not val["isAdded"]]
-        for i in self.industry_blacklist_tickers:
-            to_remove.append(i)
-        for tr in to_remove:
-            self.results.pop(tr, None)
+        self.results = Results.from_dict(self.results)
+        starting_size = len(self.results)
+        self.results = self.results.filter(self.results.column("isAdded", False).astype(bool)).drop(self.industry_blacklist_tickers)
+        if debug:
+            print(f"{starting_size - len(self.results)} removed during cleaning.")
 
     
-    def __calculate_runtime(self, number_of_batches:int, batch_size:int) -> int:
+    def __time(self, phase: str, started: float, tickers_in: int = None, tickers_out: int = None) -> float:
+        # records the wall-clock seconds of a phase that started at `started`, returns when the next phase starts
+        now = time.perf_counter()
+        self.timings[phase] = now - started
+        self.metrics.record_phase("screener2", phase, now - started, tickers_in, tickers_out)
+        mark_phase("screener2", phase)
+        return now
+
+    def __calculate_runtime(self, number_of_tickers:int) -> int:
         """
-        Estimates the runtime for the screening process based on the number of batches and batch size.
+        Estimates the runtime for the screening process based on the rate limiter's plan.
 
         Parameters:
-        - `number_of_batches` (int): The number of batches to process.
-        - `batch_size` (int): The size of each batch.
+        - `number_of_tickers` (int): The number of tickers to screen (four requests each).
 
         Returns:
         - `int`: The estimated runtime in minutes.
         """
-        est_seconds = number_of_batches * 61
-        minutes, seconds = divmod(est_seconds, 60)
-
-        return minutes
+        return self.rate_limiter.estimate_minutes(number_of_tickers * 4)
     
     
-    async def run_async(self, batch_size:int=100) -> None:
+    async def __drain_retry_queue(self, batch_size: int, retry_delay: float) -> None:
+        """
+        Screens the tickers whose requests failed with a transient error once more.
+
+        Parameters:
+        - `batch_size` (int): The number of stocks to process in each batch.
+        - `retry_delay` (float): Seconds to wait before retrying, giving the rate limit time to recover.
+
+        Returns:
+        - `None`
+        """
+        if not self.retry_queue:
+            return
+        tickers, self.retry_queue = sorted(self.retry_queue), set()
+        print(f"Retrying {len(tickers)} deferred stocks in {retry_delay} seconds...")
+        await asyncio.sleep(retry_delay)
+        for i in range(0, len(tickers), batch_size):
+            await self.__handle_screener2(tickers=tickers[i:i+batch_size])
+        if self.retry_queue:
+            print(f"{len(self.retry_queue)} stocks could not be fetched.")
+
+    async def run_async(self, batch_size:int=100, retry_delay:float=30.0, resume:bool=False) -> None:
         """
         Runs the asynchronous screening process in batches.
 
         Parameters:
         - `batch_size` (int): The number of stocks to process in each batch. Default is 100.
+        - `retry_delay` (float): Seconds to wait before retrying stocks whose requests were throttled. Default is 30.
+        - `resume` (bool): If True, restores the data fetched by an interrupted run from the checkpoint journal and only fetches the remaining stocks. Default is False.
 
         Returns:
         - `None`
         """
         print("Setting up the screener...")
+        self.timings = {}
+        started = time.perf_counter()
         await self.__get_floats()
+        started = self.__time("floats", started)
         tickers_arr = [i for sublist in self.tickers.values() for i in sublist]
+        if resume:
+            done = self.__restore()
+            tickers_arr = [i for i in tickers_arr if i not in done]
+            print(f"Resuming: {len(done)} stocks restored from checkpoint.")
+        else:
+            self.journal.reset()
         remaining = len(tickers_arr)
-        print(f"Screening {remaining} stocks...\nEstimated run time: ~{self.__calculate_runtime(remaining//batch_size, batch_size)+1} minute(s)...\n")
+        print(f"Screening {remaining} stocks...\nEstimated run time: ~{self.__calculate_runtime(remaining)+1} minute(s)...\n")
         screened = 0
         b = 1
-        tot = remaining//batch_size
-        tot += 1
-        sleep(61)
-        for i in range(0, len(tickers_arr), batch_size):
-            is_middle = i == len(tickers_arr)//2
-            start = datetime.now()
-            await self.__handle_screener2(tickers=tickers_arr[i:i+batch_size], debug=is_middle)
-            screened+=len(tickers_arr[i:i+batch_size])
-            remaining -= batch_size
-            rem = 61-(datetime.now()-start).seconds
-            if rem > 0 and b != tot:
-                print(f"Batch {b}/{tot} complete. Waiting {rem} seconds for next batch (API limit reached).")
-                sleep(rem)
+        tot = -(-remaining//batch_size)
+        try:
+            for i in range(0, len(tickers_arr), batch_size):
+                is_middle = i == len(tickers_arr)//2
+                start = time.perf_counter()
+                rows = len(self.results)
+                await self.__handle_screener2(tickers=tickers_arr[i:i+batch_size], debug=is_middle)
+                seconds = time.perf_counter() - start
+                self.metrics.observe("screener_batch_seconds", seconds, module="screener2")
+                self.metrics.record_phase("screener2", "batch", seconds, len(tickers_arr[i:i+batch_size]), len(self.results) - rows)
+                screened+=len(tickers_arr[i:i+batch_size])
+                remaining -= batch_size
+                print(f"Batch {b}/{tot} complete in {int(seconds)} seconds.")
                 b+=1
-            else:
-                print(f"Batch {b}/{tot} complete.")
+            await self.__drain_retry_queue(batch_size, retry_delay)
+        finally:
+            if self.__owns_client:
+                await self.client.close()
         
+        fetched = len(self.results)
+        started = self.__time("fetch", started, screened, fetched)
+        self.screen()
         self.clean_results()
         self.check_pafcf(True)
+        self.__time("screen", started, fetched, len(self.results))
+        stats = self.client.get_stats()
         print(f"{screened} stocks screened.")
         print(f"{len(self.results)} stocks remaining after screening.")
+        print(f"{stats['requests']} requests sent, {stats['connections_created']} connections opened ({stats['reuse_ratio']:.0%} reused).")
+        print(self.client.keys.report())
     
     
     def create_xlsx(self, file_path:str) -> None:
@@ -341,7 +458,7 @@ class AsyncScreener2:
         if len(self.results) == 0:
             print(f'ERROR: results dictionary is empty. Execute `await AsyncScreener2.run_async()` to screen the stocks. If you are still seeing this after running `Screener.run()`, there are no new stocks from the previous execution.')
             return None
-        df = pd.DataFrame.from_dict(self.results, orient='index')
+        df = Results.from_dict(self.results).to_frame()
         df.to_excel(file_path)
         print(f"File saved to {file_path}")
     
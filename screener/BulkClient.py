@@ -0,0 +1,230 @@
+from datetime import datetime
+from .FMPClient import FMPClient
+import pandas as pd
+import glob
+import time
+import os
+
+# table -> (bulk endpoint, query parameters, whether the dump is split by year)
+BULK_ENDPOINTS = {
+    "profile": ("v4/profile/all", {}, False),
+    "balance_sheet": ("v4/balance-sheet-statement-bulk", {"period": "quarter"}, True),
+    "cashflow": ("v4/cash-flow-statement-bulk", {"period": "annual"}, True),
+    "key_metrics": ("v4/key-metrics-ttm-bulk", {}, False),
+}
+
+# the only columns the screeners read from each table
+BULK_FIELDS = {
+    "profile": ["symbol", "companyName", "mktCap", "lastDiv", "country", "industry", "exchange"],
+    "balance_sheet": ["symbol", "date", "fillingDate", "totalCurrentAssets", "totalLiabilities", "netDebt"],
+    "cashflow": ["symbol", "date", "fillingDate", "freeCashFlow", "commonStockRepurchased", "cashAtEndOfPeriod"],
+    "key_metrics": ["symbol", "marketCapTTM", "enterpriseValueTTM", "freeCashFlowPerShareTTM", "tangibleAssetValueTTM"],
+}
+
+# per-ticker endpoint -> table that can answer it
+BULK_ROUTES = {
+    "v3/profile": "profile",
+    "v3/balance-sheet-statement": "balance_sheet",
+    "v3/cash-flow-statement": "cashflow",
+    "v3/key-metrics-ttm": "key_metrics",
+}
+
+class BulkClient:
+    def __init__(self, data_dir: str = "./data/bulk", client: FMPClient = None, years: int = 6) -> None:
+        """
+        Serves profile, statement and key metric requests from FMP bulk dumps.
+
+        The dumps are downloaded once, stream-parsed into one columnar frame per
+        table (only the columns the screeners use) and answered locally. Any other
+        request (historical prices, floats, ...) is passed on to `client`, so a
+        `BulkClient` can be handed to any module in place of an `FMPClient`.
+
+        Parameters:
+        - `data_dir` (str): Directory holding the downloaded dumps and parsed tables.
+        - `client` (FMPClient): Client used for downloads and for requests the dumps can't answer. Defaults to a new `FMPClient`.
+        - `years` (int): Number of fiscal years of statements to download. Default is 6.
+
+        Returns:
+        - `None`
+        """
+        self.data_dir = data_dir
+        self.client = client or FMPClient()
+        self.years = years
+        self.tables = {}
+        self.__index = {}
+        self.hits = 0
+
+    @property
+    def rate_limiter(self):
+        return self.client.rate_limiter
+
+    @property
+    def keys(self):
+        return self.client.keys
+
+    @property
+    def api_key(self):
+        return self.client.api_key
+
+    async def __aenter__(self) -> "BulkClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def __table_path(self, table: str) -> str:
+        return os.path.join(self.data_dir, f"{table}.pkl")
+
+    def is_fresh(self, max_age_days: float = 7) -> bool:
+        """
+        Checks whether every parsed table exists and is younger than `max_age_days`.
+
+        Parameters:
+        - `max_age_days` (float): Maximum age of the parsed tables in days. Default is 7.
+
+        Returns:
+        - `bool`: True if the local dataset can be used as is.
+        """
+        for table in BULK_ENDPOINTS:
+            path = self.__table_path(table)
+            if not os.path.exists(path) or time.time() - os.path.getmtime(path) > max_age_days * 86400:
+                return False
+        return True
+
+    async def download(self) -> bool:
+        """
+        Downloads every bulk dump into `data_dir`, stopping at the first one that fails.
+
+        Every dump is written next to its destination and only moved into place once it
+        is complete, so a failed download leaves the previous dump untouched.
+
+        Returns:
+        - `bool`: True if every dump was downloaded.
+        """
+        os.makedirs(self.data_dir, exist_ok=True)
+        this_year = datetime.now().year
+        for table, (path, params, yearly) in BULK_ENDPOINTS.items():
+            files = [(f"{table}_{year}.csv", {"year": year}) for year in range(this_year - self.years + 1, this_year + 1)] if yearly else [(f"{table}.csv", {})]
+            for name, extra in files:
+                file_path = os.path.join(self.data_dir, name)
+                if not await self.client.download(path, file_path + ".part", **extra, **params):
+                    if os.path.exists(file_path + ".part"):
+                        os.remove(file_path + ".part")
+                    return False
+                os.replace(file_path + ".part", file_path)
+        return True
+
+    def parse(self, chunk_size: int = 100_000) -> list[str]:
+        """
+        Stream-parses the downloaded CSV dumps into columnar tables and saves them to `data_dir`.
+
+        A table whose dumps hold no rows isn't saved, so a previously parsed table is kept
+        and, without one, its requests go to the API.
+
+        Parameters:
+        - `chunk_size` (int): Rows parsed at a time. Default is 100,000.
+
+        Returns:
+        - `list[str]`: The tables that were saved.
+        """
+        parsed = []
+        for table, fields in BULK_FIELDS.items():
+            wanted = {field.lower(): field for field in fields}
+            frames = []
+            for path in sorted(glob.glob(os.path.join(self.data_dir, f"{table}*.csv"))):
+                try:
+                    for chunk in pd.read_csv(path, usecols=lambda c: c.lower() in wanted, chunksize=chunk_size):
+                        if len(chunk) and "symbol" in chunk.columns.str.lower():
+                            frames.append(chunk.rename(columns=lambda c: wanted[c.lower()]))
+                except (ValueError, pd.errors.EmptyDataError) as e:
+                    print(f"Skipping {path}: {e}")
+            if not frames:
+                print(f"No {table} rows in the bulk dumps, {table} table not updated.")
+                continue
+            frame = pd.concat(frames, ignore_index=True)
+            if "date" in frame.columns:
+                frame = frame.sort_values(["symbol", "date"], ascending=[True, False]).drop_duplicates(["symbol", "date"])
+            frame.reset_index(drop=True).to_pickle(self.__table_path(table))
+            parsed.append(table)
+        return parsed
+
+    def load(self) -> None:
+        """
+        Loads the parsed tables and indexes them by symbol. Tables that are missing or empty
+        aren't loaded, so their requests are passed on to the underlying client.
+
+        Returns:
+        - `None`
+        """
+        for table in BULK_FIELDS:
+            path = self.__table_path(table)
+            frame = pd.read_pickle(path) if os.path.exists(path) else None
+            if frame is None or frame.empty:
+                print(f"No bulk {table} table, {table} requests go to the API.")
+                continue
+            self.tables[table] = frame
+            self.__index[table] = frame.groupby("symbol", sort=False).indices
+
+    async def ingest(self, max_age_days: float = 7) -> None:
+        """
+        Makes the local dataset ready, downloading and parsing the dumps only if they are stale.
+
+        Parameters:
+        - `max_age_days` (float): Maximum age of the local dataset in days. Default is 7.
+
+        Returns:
+        - `None`
+        """
+        if not self.is_fresh(max_age_days):
+            print("Downloading bulk data...")
+            if await self.download():
+                self.parse()
+            else:
+                print("Bulk download failed, keeping the previously parsed tables.")
+        self.load()
+        print(f"Bulk data loaded: {', '.join(f'{len(v)} {k} rows' for k, v in self.tables.items())}.")
+
+    def get_rows(self, table: str, ticker: str, limit: int = None) -> list[dict]:
+        """
+        Returns a ticker's rows from a table in the same shape as the FMP API.
+
+        Parameters:
+        - `table` (str): Name of the table.
+        - `ticker` (str): The stock ticker symbol.
+        - `limit` (int): Maximum number of rows (most recent first). Default is all rows.
+
+        Returns:
+        - `list[dict]`: The ticker's rows, or an empty list if it is not in the dump.
+        """
+        positions = self.__index[table].get(ticker)
+        if positions is None:
+            return []
+        rows = self.tables[table].iloc[positions[:limit]]
+        return rows.astype(object).where(rows.notna(), None).to_dict('records')
+
+    async def get_json(self, path: str, **params):
+        """
+        Answers a request from the bulk tables, or passes it on to the underlying client.
+
+        Parameters:
+        - `path` (str): Endpoint path below `/api`, e.g. `v3/profile/AAPL` or `v3/profile/AAPL,MSFT`.
+        - `params` (dict): Query parameters.
+
+        Returns:
+        - The rows in the same shape as the FMP API response.
+        """
+        endpoint, _, tickers = path.rpartition('/')
+        table = BULK_ROUTES.get(endpoint)
+        if table is None or table not in self.tables:
+            return await self.client.get_json(path, **params)
+        self.hits += 1
+        limit = int(params["limit"]) if "limit" in params else None
+        return [row for ticker in tickers.split(',') for row in self.get_rows(table, ticker, limit)]
+
+    def get_stats(self) -> dict:
+        stats = self.client.get_stats()
+        stats["bulk_hits"] = self.hits
+        return stats
+
+    async def close(self) -> None:
+        await self.client.close()
@@ -0,0 +1,315 @@
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from .KeyPool import KeyPool, get_shared_key_pool
+from .RateLimiter import RateLimiter, get_shared_limiter
+from .ResponseCache import ResponseCache
+from .RunMetrics import RunMetrics, get_run_metrics
+from . import Records
+import contextvars
+import aiohttp
+import asyncio
+import random
+import time
+import os
+
+load_dotenv()
+
+BASE_URL = os.environ.get("FMP_BASE_URL", "https://financialmodelingprep.com/api") # point at a local `FMPStandIn` to benchmark offline
+
+# seconds the requests of the current `rate_limit_waits` block spent waiting for a key
+_waits = contextvars.ContextVar("rate_limit_waits", default=None)
+
+@contextmanager
+def rate_limit_waits():
+    """
+    Measures how long the requests sent inside the block, including those of tasks it starts, waited for the rate limit.
+
+    Returns:
+    - `list`: A one-item list holding the seconds waited, updated as requests are sent.
+    """
+    waited = [0.0]
+    token = _waits.set(waited)
+    try:
+        yield waited
+    finally:
+        _waits.reset(token)
+
+def _endpoint(path: str) -> str:
+    # `v3/profile/AAPL` -> `v3/profile`, while `v3/earning_calendar` stays whole
+    return path.rpartition('/')[0] if path.count('/') > 1 else path
+
+class FMPRequestError(Exception):
+    def __init__(self, path: str, reason: str) -> None:
+        """
+        Raised when a request still fails with a transient error (throttling, 5xx, timeout) after every retry.
+
+        Callers should defer the ticker and try again later rather than drop it.
+
+        Parameters:
+        - `path` (str): The endpoint path that failed.
+        - `reason` (str): Description of the last failure.
+
+        Returns:
+        - `None`
+        """
+        super().__init__(f"{path}: {reason}")
+        self.path = path
+        self.reason = reason
+
+class _TransientError(Exception):
+    def __init__(self, reason: str, retry_after: float = None) -> None:
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+class _KeyExcluded(Exception):
+    pass
+
+class FMPClient:
+    def __init__(self, api_key: str = None, rate_limiter: RateLimiter = None, limit_per_host: int = 50, dns_ttl: int = 600, keepalive_timeout: float = 60.0, timeout: float = 60.0, cache: ResponseCache = None, max_retries: int = 4, backoff: float = 1.0, max_backoff: float = 60.0, keys: KeyPool = None, metrics: RunMetrics = None) -> None:
+        """
+        A long-lived FMP API client shared by every module in a run.
+
+        All requests go through one `aiohttp.ClientSession` with a tuned connector,
+        so TLS handshakes, DNS lookups and keep-alive connections are reused
+        across tickers, batches and modules.
+
+        Parameters:
+        - `api_key` (str): FMP API key. Defaults to every key in the environment (`FMP_KEY`, `FMP_KEY_1`, ...).
+        - `rate_limiter` (RateLimiter): Limiter of the first key. Defaults to the shared limiter.
+        - `limit_per_host` (int): Maximum number of open connections to the FMP host. Default is 50.
+        - `dns_ttl` (int): Seconds a DNS lookup is cached for. Default is 600.
+        - `keepalive_timeout` (float): Seconds an idle connection is kept open. Default is 60.
+        - `timeout` (float): Total timeout for a single request in seconds. Default is 60.
+        - `cache` (ResponseCache): Optional on-disk response cache consulted before every request.
+        - `max_retries` (int): Retries for throttled, 5xx and timed-out requests. Default is 4.
+        - `backoff` (float): Base delay of the jittered exponential backoff in seconds. Default is 1.
+        - `max_backoff` (float): Longest delay between two retries in seconds. Default is 60.
+        - `keys` (KeyPool): Pool of API keys requests are spread over. Overrides `api_key` and `rate_limiter`.
+        - `metrics` (RunMetrics): Where request counts, bytes, latencies, throttling and waits are recorded. Defaults to the shared run metrics.
+
+        Returns:
+        - `None`
+        """
+        if keys is None and api_key:
+            keys = KeyPool([api_key], [rate_limiter or get_shared_limiter()])
+        elif keys is None:
+            keys = KeyPool.from_env(rate_limiter) if rate_limiter else get_shared_key_pool()
+        self.keys = keys
+        self.api_key = keys.keys[0]
+        self.rate_limiter = keys # quacks like a RateLimiter for callers sizing their work
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.cache = cache
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.metrics = metrics or get_run_metrics()
+        self.stats = {
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0,
+            "retries": 0,
+            "throttled": 0,
+            "failed": 0,
+        }
+        self.__session = None
+
+    async def __aenter__(self) -> "FMPClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        The underlying session, created on first use.
+        """
+        if self.__session is None or self.__session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive_timeout)
+            self.__session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trace_configs=[self.__trace_config()])
+        return self.__session
+
+    def __trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        def count(stat: str):
+            async def handler(session, context, params) -> None:
+                self.stats[stat] += 1
+            return handler
+
+        trace_config.on_request_start.append(count("requests"))
+        trace_config.on_connection_create_end.append(count("connections_created"))
+        trace_config.on_connection_reuseconn.append(count("connections_reused"))
+        trace_config.on_dns_cache_hit.append(count("dns_cache_hits"))
+        trace_config.on_dns_cache_miss.append(count("dns_cache_misses"))
+        return trace_config
+
+    async def get_json(self, path: str, **params):
+        """
+        Sends a rate-limited GET request to the FMP API.
+
+        Throttled (429 or FMP's "Limit Reach" message), 5xx and timed-out requests are
+        retried with jittered exponential backoff, honoring `Retry-After`. A key that is
+        rejected or out of quota is excluded from the pool and the request is sent
+        again right away with another key.
+
+        Parameters:
+        - `path` (str): Endpoint path below `/api`, e.g. `v3/profile/AAPL`.
+        - `params` (dict): Query parameters. The API key is added automatically.
+
+        Returns:
+        - The decoded JSON response, with the records of the endpoints the screeners read projected into `Records`, or `None` if the request failed permanently (e.g. 404 or a malformed body).
+
+        Raises:
+        - `FMPRequestError`: If the request still fails with a transient error after every retry.
+        """
+        endpoint, _, ticker = path.rpartition('/')
+        if self.cache is not None:
+            cached = self.cache.get(endpoint, ticker, params)
+            if cached is not None:
+                self.metrics.inc("screener_fmp_cache_hits_total", endpoint=_endpoint(path))
+                return Records.project(_endpoint(path), cached, self.metrics)
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            key = await self.keys.acquire()
+            wait = time.perf_counter() - started
+            self.metrics.inc("screener_rate_limit_wait_seconds_total", wait)
+            if _waits.get() is not None:
+                _waits.get()[0] += wait
+            try:
+                data = await self.__request(path, params, key)
+                break
+            except _KeyExcluded:
+                continue
+            except _TransientError as e:
+                if attempt == self.max_retries:
+                    self.stats["failed"] += 1
+                    raise FMPRequestError(path, str(e))
+                self.stats["retries"] += 1
+                delay = max(min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.5), e.retry_after or 0)
+                self.metrics.inc("screener_retry_wait_seconds_total", delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+        if self.cache is not None:
+            self.cache.put(endpoint, ticker, params, data)
+        return data
+
+    async def __request(self, path: str, params: dict, key: str):
+        endpoint = _endpoint(path)
+        started = time.perf_counter()
+        status = "error"
+        try:
+            async with self.session.get(f"{BASE_URL}/{path}", params={**params, "apikey": key}) as response:
+                status = response.status
+                if response.status == 429:
+                    self.stats["throttled"] += 1
+                    self.metrics.inc("screener_fmp_throttled_total", endpoint=endpoint)
+                    self.keys.record(key, "throttled")
+                    raise _TransientError("429 Too Many Requests", self.__retry_after(response))
+                if response.status >= 500:
+                    raise _TransientError(f"{response.status} {response.reason}", self.__retry_after(response))
+                if response.status == 401:
+                    self.__reject(key, "401 Unauthorized")
+                    return None
+                if response.status >= 400:
+                    return None
+                body = await response.read()
+                self.metrics.inc("screener_fmp_response_bytes_total", len(body), endpoint=endpoint)
+                data = Records.decode(endpoint, body, self.metrics)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise _TransientError(repr(e))
+        except ValueError:
+            self.metrics.inc("screener_decode_errors_total", endpoint=endpoint)
+            return None
+        finally:
+            self.metrics.inc("screener_fmp_requests_total", endpoint=endpoint, status=status)
+            self.metrics.observe("screener_fmp_request_seconds", time.perf_counter() - started, endpoint=endpoint)
+        message = str(data.get("Error Message", "")) if isinstance(data, dict) else ""
+        if "Invalid API KEY" in message:
+            self.__reject(key, message)
+            return None
+        if "Limit Reach" in message:
+            self.stats["throttled"] += 1
+            self.metrics.inc("screener_fmp_throttled_total", endpoint=endpoint)
+            self.keys.record(key, "throttled")
+            if self.keys.exclude(key, message):
+                raise _KeyExcluded()
+            raise _TransientError(message)
+        return data
+
+    def __reject(self, key: str, reason: str) -> None:
+        # a 401 is the key's fault, not the request's: try it with another key
+        self.keys.record(key, "auth_errors")
+        if self.keys.exclude(key, reason):
+            raise _KeyExcluded()
+
+    @staticmethod
+    def __retry_after(response: aiohttp.ClientResponse) -> float:
+        try:
+            return float(response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            return None
+
+    async def download(self, path: str, file_path: str, chunk_size: int = 1 << 16, **params) -> bool:
+        """
+        Streams a large FMP response (e.g. a bulk CSV dump) straight to disk.
+
+        Parameters:
+        - `path` (str): Endpoint path below `/api`.
+        - `file_path` (str): Where to write the response body.
+        - `chunk_size` (int): Bytes read per chunk. Default is 64 KiB.
+        - `params` (dict): Query parameters. The API key is added automatically.
+
+        Returns:
+        - `bool`: True if the file was written.
+        """
+        key = await self.keys.acquire()
+        try:
+            async with self.session.get(f"{BASE_URL}/{path}", params={**params, "apikey": key}, timeout=aiohttp.ClientTimeout(total=None)) as response:
+                response.raise_for_status()
+                with open(file_path, 'wb') as file:
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        file.write(chunk)
+            return True
+        except Exception as e:
+            print(f"Error downloading {path}: {e}")
+            return False
+
+    def get_stats(self) -> dict:
+        """
+        Returns connection-reuse statistics for the client.
+
+        Returns:
+        - `dict`: Request, connection and DNS cache counters, the share of requests served on a reused connection, per-key usage, and response cache counters if a cache is attached.
+        """
+        stats = dict(self.stats)
+        connections = stats["connections_created"] + stats["connections_reused"]
+        stats["reuse_ratio"] = round(stats["connections_reused"] / connections, 3) if connections else 0.0
+        stats["keys"] = self.keys.get_stats()
+        if self.cache is not None:
+            stats.update(self.cache.get_stats())
+        return stats
+
+    async def close(self) -> None:
+        """
+        Closes the underlying session.
+
+        Returns:
+        - `None`
+        """
+        if self.__session is not None and not self.__session.closed:
+            await self.__session.close()
+        if self.cache is not None:
+            self.cache.flush()
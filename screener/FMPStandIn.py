@@ -0,0 +1,372 @@
+from datetime import date, timedelta
+from collections import deque
+from aiohttp import web
+import argparse
+import aiohttp
+import asyncio
+import random
+import json
+import time
+import csv
+import io
+import os
+
+UPSTREAM = "https://financialmodelingprep.com/api"
+
+COUNTRIES = ["US", "US", "US", "JP", "JP", "GB", "CA", "DE", "CN", "HK"]
+INDUSTRIES = ["Software", "Semiconductors", "Retail", "Industrial Machinery", "Banks—Regional", "Insurance—Life", "Asset Management", "Auto Parts"]
+
+def _rng(*parts) -> random.Random:
+    return random.Random("-".join(str(i) for i in parts))
+
+def _quarters(count: int, months: int, today: date) -> list[date]:
+    # statement dates, most recent first
+    dates = []
+    end = date(today.year, (today.month - 1) // 3 * 3 + 1, 1) - timedelta(days=1)
+    for _ in range(count):
+        dates.append(end)
+        month = end.month - months
+        year = end.year + (month - 1) // 12
+        month = (month - 1) % 12 + 1
+        end = (date(year, month, 1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return dates
+
+class FMPStandIn:
+    def __init__(self, tickers: list[str] = None, latency: float = 0.0, jitter: float = 0.5, rate_limit: int = None, period: float = 60.0, throttle_rate: float = 0.0, error_rate: float = 0.0, mode: str = "synthetic", cassette: str = None, upstream: str = UPSTREAM, seed: int = 0) -> None:
+        """
+        A local stand-in for the FMP API, for measuring throughput without spending quota.
+
+        Every endpoint the screeners use is served under `/api`, with payloads in the
+        API's shapes. In `synthetic` mode they are generated deterministically from
+        the ticker and `seed`. In `record` mode requests are forwarded to the real API
+        (with the caller's key) and every response is appended to `cassette`; in
+        `replay` mode they are served from it, and requests it doesn't hold get a 404.
+
+        Latency, the plan's rate limit and random 429 and 5xx answers are simulated,
+        so retries and throttling take the same paths as against the real API.
+
+        Parameters:
+        - `tickers` (list[str]): Universe returned by the `all` and bulk endpoints (floats, bulk dumps, earnings calendar). Default is none.
+        - `latency` (float): Mean seconds before a response is sent. Default is 0.
+        - `jitter` (float): Latency varies uniformly by this fraction around the mean. Default is 0.5.
+        - `rate_limit` (int): Requests allowed per key every `period` seconds; more are answered with 429. Default is unlimited.
+        - `period` (float): Length of the rate limit window in seconds. Default is 60.
+        - `throttle_rate` (float): Share of requests answered with a random 429. Default is 0.
+        - `error_rate` (float): Share of requests answered with a random 500, 502 or 503. Default is 0.
+        - `mode` (str): `synthetic`, `record` or `replay`. Default is `synthetic`.
+        - `cassette` (str): JSON lines file of recorded responses, required by `record` and `replay`.
+        - `upstream` (str): Base URL requests are forwarded to when recording. Default is the FMP API.
+        - `seed` (int): Seed of the synthetic payloads and of the injected faults. Default is 0.
+
+        Returns:
+        - `None`
+        """
+        if mode not in ("synthetic", "record", "replay"):
+            raise ValueError(f"Unknown mode '{mode}', expected 'synthetic', 'record' or 'replay'")
+        if mode != "synthetic" and not cassette:
+            raise ValueError(f"The {mode} mode needs a cassette")
+        self.tickers = list(tickers or [])
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.period = period
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.mode = mode
+        self.cassette = cassette
+        self.upstream = upstream
+        self.seed = seed
+        self.today = date.today()
+        self.stats = {"requests": 0, "served": 0, "throttled": 0, "errors": 0, "missed": 0, "endpoints": {}}
+        self.__faults = random.Random(seed)
+        self.__sent = {} # key -> send times in the window
+        self.__recorded = {}
+        self.__runner = None
+        self.__session = None
+        if mode == "replay" or (mode == "record" and os.path.exists(cassette)):
+            self.__load_cassette()
+
+    async def __aenter__(self) -> "FMPStandIn":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    @staticmethod
+    def key(path: str, params: dict) -> str:
+        """
+        Returns the cassette key of a request: its path and sorted query parameters, without the API key.
+        """
+        return f"{path}?{json.dumps({k: v for k, v in params.items() if k != 'apikey'}, sort_keys=True)}"
+
+    def __load_cassette(self) -> None:
+        with open(self.cassette, 'r') as file:
+            for line in file:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.__recorded[entry["key"]] = entry
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Starts serving.
+
+        Parameters:
+        - `host` (str): Interface to listen on. Default is localhost.
+        - `port` (int): Port to listen on. Default is any free port.
+
+        Returns:
+        - `str`: The base URL to use in place of the FMP API's, e.g. `http://127.0.0.1:8080/api`.
+        """
+        app = web.Application()
+        app.router.add_get('/api/{path:.*}', self.__handle)
+        self.__runner = web.AppRunner(app, access_log=None)
+        await self.__runner.setup()
+        site = web.TCPSite(self.__runner, host, port)
+        await site.start()
+        self.url = f"http://{host}:{site._server.sockets[0].getsockname()[1]}/api"
+        return self.url
+
+    async def stop(self) -> None:
+        """
+        Stops serving.
+
+        Returns:
+        - `None`
+        """
+        if self.__session is not None:
+            await self.__session.close()
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+
+    def get_stats(self) -> dict:
+        """
+        Returns the number of requests received, served, throttled, failed on purpose and missing from the cassette, and the requests per endpoint.
+        """
+        return {**self.stats, "endpoints": dict(self.stats["endpoints"])}
+
+    def __throttled(self, key: str) -> float:
+        # seconds until the key's window has room again, 0 if the request is allowed
+        if self.rate_limit is None:
+            return 0.0
+        now = time.monotonic()
+        sent = self.__sent.setdefault(key, deque())
+        while sent and now - sent[0] >= self.period:
+            sent.popleft()
+        if len(sent) >= self.rate_limit:
+            return self.period - (now - sent[0])
+        sent.append(now)
+        return 0.0
+
+    async def __handle(self, request: web.Request) -> web.StreamResponse:
+        path = request.match_info['path']
+        params = dict(request.query)
+        endpoint = path.rpartition('/')[0] if path.count('/') > 1 else path
+        self.stats["requests"] += 1
+        self.stats["endpoints"][endpoint] = self.stats["endpoints"].get(endpoint, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency * self.__faults.uniform(1 - self.jitter, 1 + self.jitter))
+        wait = self.__throttled(params.get("apikey", ""))
+        if wait or self.__faults.random() < self.throttle_rate:
+            self.stats["throttled"] += 1
+            return web.json_response({"Error Message": "Too Many Requests"}, status=429, headers={"Retry-After": f"{wait:.3f}"})
+        if self.__faults.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=self.__faults.choice([500, 502, 503]))
+        if self.mode == "synthetic":
+            response = self.__synthetic(path, params)
+        elif self.mode == "record":
+            response = await self.__record(path, params)
+        else:
+            response = self.__replay(path, params)
+        if response.status < 400:
+            self.stats["served"] += 1
+        return response
+
+    async def __record(self, path: str, params: dict) -> web.Response:
+        key = self.key(path, params)
+        if key not in self.__recorded:
+            if self.__session is None:
+                self.__session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None))
+            async with self.__session.get(f"{self.upstream}/{path}", params=params) as upstream:
+                entry = {"key": key, "status": upstream.status, "content_type": upstream.content_type, "body": await upstream.text()}
+            if entry["status"] == 429 or entry["status"] >= 500:
+                return web.Response(status=entry["status"], text=entry["body"], content_type=entry["content_type"])
+            self.__recorded[key] = entry
+            with open(self.cassette, 'a') as file:
+                file.write(json.dumps(entry, separators=(',', ':')) + "\n")
+        return self.__replay(path, params)
+
+    def __replay(self, path: str, params: dict) -> web.Response:
+        entry = self.__recorded.get(self.key(path, params))
+        if entry is None:
+            self.stats["missed"] += 1
+            return web.json_response({"Error Message": f"{path} is not in the cassette"}, status=404)
+        return web.Response(status=entry["status"], text=entry["body"], content_type=entry["content_type"])
+
+    def __synthetic(self, path: str, params: dict) -> web.Response:
+        endpoint, _, ticker = path.rpartition('/')
+        limit = int(params.get("limit", 5))
+        if endpoint == "v3/profile":
+            return web.json_response([self.profile(i) for i in ticker.split(',') if i])
+        if endpoint == "v3/balance-sheet-statement":
+            return web.json_response(self.balance_sheet(ticker, limit, params.get("period", "annual")))
+        if endpoint == "v3/cash-flow-statement":
+            return web.json_response(self.cashflow(ticker, limit, params.get("period", "annual")))
+        if endpoint == "v3/key-metrics-ttm":
+            return web.json_response([self.key_metrics(ticker)])
+        if endpoint == "v3/historical-price-full":
+            return web.json_response(self.historical(ticker, params.get("from"), params.get("to"), params.get("serietype")))
+        if path == "v4/shares_float/all":
+            return web.json_response([self.shares_float(i) for i in self.tickers])
+        if path == "v3/earning_calendar":
+            return web.json_response(self.earnings(params.get("from"), params.get("to")))
+        if path == "v4/profile/all":
+            return self.__csv([self.profile(i) for i in self.tickers])
+        if path == "v4/balance-sheet-statement-bulk":
+            return self.__csv(self.__bulk(self.balance_sheet, params))
+        if path == "v4/cash-flow-statement-bulk":
+            return self.__csv(self.__bulk(self.cashflow, params))
+        if path == "v4/key-metrics-ttm-bulk":
+            return self.__csv([{"symbol": i, **self.key_metrics(i)} for i in self.tickers])
+        return web.json_response({"Error Message": f"{path} is not served by the stand-in"}, status=404)
+
+    def __bulk(self, statements, params: dict) -> list[dict]:
+        year = int(params.get("year", self.today.year))
+        rows = []
+        for ticker in self.tickers:
+            rows.extend(i for i in statements(ticker, 8, params.get("period", "annual")) if i["date"].startswith(str(year)))
+        return rows
+
+    @staticmethod
+    def __csv(rows: list[dict]) -> web.Response:
+        buffer = io.StringIO()
+        if rows:
+            writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        return web.Response(text=buffer.getvalue(), content_type="text/csv")
+
+    # Synthetic payloads. Values are drawn per ticker, so every endpoint tells a consistent story
+    # and roughly as many tickers pass each screen as in a real universe.
+
+    def __size(self, ticker: str) -> float:
+        return _rng(self.seed, ticker, "size").choice([2e7, 8e7, 3e8, 1e9, 5e9, 4e10])
+
+    def profile(self, ticker: str) -> dict:
+        rng = _rng(self.seed, ticker, "profile")
+        return {
+            "symbol": ticker,
+            "companyName": f"{ticker} Holdings",
+            "price": round(rng.uniform(1, 300), 2),
+            "mktCap": int(self.__size(ticker) * rng.uniform(0.3, 1.2)),
+            "lastDiv": rng.choice([0, 0, 0.1, 0.5, 1.2]),
+            "country": rng.choice(COUNTRIES),
+            "industry": rng.choice(INDUSTRIES),
+            "exchange": rng.choice(["NASDAQ", "NYSE", "JPX", "LSE", "TSX"]),
+            "currency": "USD",
+        }
+
+    def balance_sheet(self, ticker: str, limit: int = 5, period: str = "quarter") -> list[dict]:
+        rng = _rng(self.seed, ticker, "balance")
+        size = self.__size(ticker)
+        rows = []
+        for day in _quarters(limit, 3 if period == "quarter" else 12, self.today):
+            assets = size * rng.uniform(0.2, 1.5)
+            rows.append({
+                "date": day.isoformat(),
+                "symbol": ticker,
+                "fillingDate": (day + timedelta(days=40)).isoformat(),
+                "totalCurrentAssets": int(assets),
+                "totalLiabilities": int(assets * rng.uniform(0.2, 1.4)),
+                "netDebt": int(size * rng.uniform(-0.3, 0.3)),
+            })
+        return rows
+
+    def cashflow(self, ticker: str, limit: int = 5, period: str = "annual") -> list[dict]:
+        rng = _rng(self.seed, ticker, "cashflow")
+        size = self.__size(ticker)
+        margin = rng.uniform(-0.05, 0.25)
+        rows = []
+        for day in _quarters(limit, 3 if period == "quarter" else 12, self.today):
+            rows.append({
+                "date": day.isoformat(),
+                "symbol": ticker,
+                "fillingDate": (day + timedelta(days=60)).isoformat(),
+                "freeCashFlow": int(size * margin * rng.uniform(0.5, 1.5)),
+                "commonStockRepurchased": -int(size * rng.uniform(0, 0.02)) if rng.random() < 0.5 else 0,
+                "cashAtEndOfPeriod": int(size * rng.uniform(0.05, 0.8)),
+            })
+        return rows
+
+    def key_metrics(self, ticker: str) -> dict:
+        rng = _rng(self.seed, ticker, "key_metrics")
+        size = self.__size(ticker)
+        return {
+            "marketCapTTM": int(size),
+            "enterpriseValueTTM": int(size * rng.uniform(0.5, 1.5)),
+            "freeCashFlowPerShareTTM": round(rng.uniform(-2, 6), 2),
+            "tangibleAssetValueTTM": int(size * rng.uniform(0.1, 2.0)),
+        }
+
+    def shares_float(self, ticker: str) -> dict:
+        rng = _rng(self.seed, ticker, "float")
+        shares = int(self.__size(ticker) / rng.uniform(5, 100))
+        return {"symbol": ticker, "date": self.today.isoformat(), "freeFloat": 80.0, "floatShares": int(shares * 0.8), "outstandingShares": shares}
+
+    def historical(self, ticker: str, start: str = None, end: str = None, serietype: str = None) -> dict:
+        end = date.fromisoformat(end) if end else self.today
+        start = date.fromisoformat(start) if start else end.replace(year=end.year - 5)
+        rng = _rng(self.seed, ticker, "price")
+        price, phase = 10 + rng.uniform(0, 90), rng.randrange(365)
+        rows = []
+        day = end
+        while day >= start:
+            if day.weekday() < 5:
+                # a smooth, deterministic path, so overlapping requests agree on every close
+                close = round(price * (1 + 0.3 * ((day.toordinal() + phase) % 365) / 365), 2)
+                if serietype == "line":
+                    rows.append({"date": day.isoformat(), "close": close})
+                else:
+                    rows.append({"date": day.isoformat(), "open": close, "high": round(close * 1.01, 2), "low": round(close * 0.99, 2), "close": close, "volume": 100000})
+            day -= timedelta(days=1)
+        return {"symbol": ticker, "historical": rows} if rows else {}
+
+    def earnings(self, start: str, end: str) -> list[dict]:
+        start, end = date.fromisoformat(start), date.fromisoformat(end)
+        rows = []
+        for ticker in self.tickers:
+            day = date.fromordinal(start.toordinal() + _rng(self.seed, ticker, "earnings").randrange(91))
+            if day <= end:
+                rows.append({"date": day.isoformat(), "symbol": ticker})
+        return rows
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the FMP API. Point a run at it with FMP_BASE_URL.")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--tickers", help="ticker JSON file (country -> tickers) used by the bulk and `all` endpoints")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--mode", choices=["synthetic", "record", "replay"], default="synthetic")
+    parser.add_argument("--cassette")
+    args = parser.parse_args()
+    tickers = []
+    if args.tickers:
+        with open(args.tickers, 'r') as file:
+            tickers = [i for v in json.load(file).values() for i in v]
+
+    async def serve() -> None:
+        async with FMPStandIn(tickers, args.latency, rate_limit=args.rate_limit, throttle_rate=args.throttle_rate, error_rate=args.error_rate, mode=args.mode, cassette=args.cassette) as stand_in:
+            await stand_in.start("127.0.0.1", args.port)
+            print(f"Serving the FMP API stand-in at {stand_in.url} ({args.mode}). Set FMP_BASE_URL={stand_in.url}")
+            await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
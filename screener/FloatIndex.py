@@ -0,0 +1,160 @@
+from datetime import date
+from .FMPClient import FMPRequestError
+import numpy as np
+import json
+import glob
+import os
+
+class FloatIndex:
+    def __init__(self, snapshot_dir: str = "./data/floats", max_age_days: int = 1) -> None:
+        """
+        A symbol -> outstanding shares index built from FMP's `shares_float/all` dataset.
+
+        The full dataset is downloaded at most once per freshness window and saved as a
+        dated snapshot that every module reuses. Only the symbols of the current
+        universe are kept in memory, by the index itself, so the full dataset is freed
+        once `load` returns.
+
+        Parameters:
+        - `snapshot_dir` (str): Directory holding the dated snapshots.
+        - `max_age_days` (int): Age in days up to which a snapshot is fresh: 0 accepts only today's, 1 also yesterday's. Default is 1.
+
+        Returns:
+        - `None`
+        """
+        self.snapshot_dir = snapshot_dir
+        self.max_age_days = max_age_days
+        self.shares = {}
+
+    def __len__(self) -> int:
+        return len(self.shares)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self.shares
+
+    def get(self, ticker: str) -> int:
+        """
+        Finds the float (outstanding shares) for a given ticker.
+
+        Parameters:
+        - `ticker` (str): The stock ticker symbol.
+
+        Returns:
+        - `int`: The number of outstanding shares, or 0 if not found.
+        """
+        return self.shares.get(ticker, 0)
+
+    def __snapshot_path(self, day: date) -> str:
+        return os.path.join(self.snapshot_dir, f"shares_float_{day.isoformat()}.json")
+
+    def __read_snapshot(self) -> dict:
+        today = date.today()
+        for path in sorted(glob.glob(os.path.join(self.snapshot_dir, "shares_float_*.json")), reverse=True):
+            try:
+                day = date.fromisoformat(os.path.basename(path)[len("shares_float_"):-len(".json")])
+            except ValueError:
+                continue
+            if (today - day).days <= self.max_age_days:
+                with open(path, 'r') as file:
+                    return json.load(file)
+            return None # the newest snapshot is stale
+        return None
+
+    def __write_snapshot(self, snapshot: dict) -> None:
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = self.__snapshot_path(date.today())
+        with open(path, 'w') as file:
+            json.dump(snapshot, file, separators=(',', ':'))
+        for old in sorted(glob.glob(os.path.join(self.snapshot_dir, "shares_float_*.json")))[:-2]:
+            os.remove(old)
+
+    async def load(self, client, universe = None) -> "FloatIndex":
+        """
+        Builds the index from a fresh snapshot, downloading a new one if needed.
+
+        Parameters:
+        - `client` (FMPClient): Client used to download `shares_float/all` when no fresh snapshot exists.
+        - `universe` (iterable): Symbols to keep. Default is every symbol.
+
+        Returns:
+        - `FloatIndex`: The index itself.
+        """
+        snapshot = self.__read_snapshot()
+        if snapshot is None:
+            try:
+                floats = await client.get_json('v4/shares_float/all')
+            except FMPRequestError:
+                floats = None
+            if not isinstance(floats, list):
+                print("Error fetching floats.")
+                snapshot = {}
+            else:
+                snapshot = {v['symbol']: v.get('outstandingShares') for v in floats if v.get('symbol')}
+                self.__write_snapshot(snapshot)
+        if universe is None:
+            self.shares = snapshot
+        else:
+            self.shares = {ticker: snapshot[ticker] for ticker in universe if ticker in snapshot}
+        return self
+
+    def save_mapped(self, path: str) -> str:
+        """
+        Writes the index as two sorted arrays that `MappedFloatIndex` memory-maps, so
+        worker processes read one copy of it through the page cache.
+
+        Parameters:
+        - `path` (str): Path prefix of the `.symbols.npy` and `.shares.npy` files.
+
+        Returns:
+        - `str`: The path prefix.
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        symbols = sorted(self.shares)
+        shares = [np.nan if self.shares[symbol] is None else self.shares[symbol] for symbol in symbols]
+        np.save(f"{path}.symbols.npy", np.array(symbols, dtype=str))
+        np.save(f"{path}.shares.npy", np.array(shares, dtype=np.float64))
+        return path
+
+class MappedFloatIndex:
+    def __init__(self, path: str) -> None:
+        """
+        A read-only `FloatIndex` over the memory-mapped arrays written by `FloatIndex.save_mapped`.
+
+        Parameters:
+        - `path` (str): Path prefix of the arrays.
+
+        Returns:
+        - `None`
+        """
+        self.path = path
+        self.symbols = np.load(f"{path}.symbols.npy", mmap_mode='r')
+        self.shares = np.load(f"{path}.shares.npy", mmap_mode='r')
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __find(self, ticker: str) -> int:
+        i = int(np.searchsorted(self.symbols, ticker))
+        return i if i < len(self.symbols) and self.symbols[i] == ticker else -1
+
+    def __contains__(self, ticker: str) -> bool:
+        return self.__find(ticker) >= 0
+
+    def get(self, ticker: str) -> int:
+        """
+        Finds the float (outstanding shares) for a given ticker.
+
+        Parameters:
+        - `ticker` (str): The stock ticker symbol.
+
+        Returns:
+        - `int`: The number of outstanding shares, or 0 if not found.
+        """
+        i = self.__find(ticker)
+        if i < 0:
+            return 0
+        shares = float(self.shares[i])
+        if np.isnan(shares):
+            return None
+        return int(shares) if shares.is_integer() else shares
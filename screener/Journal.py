@@ -0,0 +1,97 @@
+from collections.abc import Mapping
+import json
+import os
+
+def _plain(value):
+    # mappings such as `Records` are journaled as objects, anything else as its string
+    return dict(value) if isinstance(value, Mapping) else str(value)
+
+class Journal:
+    def __init__(self, path: str, flush_every: int = 500) -> None:
+        """
+        An append-only checkpoint journal for long screening runs.
+
+        Every entry is one JSON line (`kind`, `key`, `value`). Entries are buffered and
+        written out every `flush_every` entries and on `flush()`, so checkpointing costs
+        one sequential write per batch or phase. When a journal is replayed, the last
+        entry for a `(kind, key)` pair wins, and a line cut short by a crash is ignored. The
+        next write starts on a new line, so entries appended after the crash are kept.
+
+        Parameters:
+        - `path` (str): Path to the journal file. It and its directory are created on the first write.
+        - `flush_every` (int): Number of buffered entries that triggers a write. Default is 500.
+
+        Returns:
+        - `None`
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self.__buffer = []
+
+    def load(self) -> dict[str, dict]:
+        """
+        Replays the journal.
+
+        Returns:
+        - `dict`: Kind -> {key -> latest value}.
+        """
+        state = {}
+        if not os.path.exists(self.path):
+            return state
+        with open(self.path, 'r') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                state.setdefault(entry["kind"], {})[entry["key"]] = entry["value"]
+        return state
+
+    def record(self, kind: str, key: str, value) -> None:
+        """
+        Appends an entry to the journal.
+
+        Parameters:
+        - `kind` (str): The entry type, e.g. `stage` or `phase`.
+        - `key` (str): The ticker or phase the entry belongs to.
+        - `value`: Any JSON-serializable value.
+
+        Returns:
+        - `None`
+        """
+        self.__buffer.append(json.dumps({"kind": kind, "key": key, "value": value}, separators=(',', ':'), default=_plain))
+        if len(self.__buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes the buffered entries to disk.
+
+        Returns:
+        - `None`
+        """
+        if not self.__buffer:
+            return
+        text = '\n'.join(self.__buffer) + '\n'
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'a+b') as file:
+            if file.seek(0, os.SEEK_END):
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b'\n':
+                    text = '\n' + text # end a line cut short by a crash, so it doesn't swallow the first entry
+            file.write(text.encode())
+            file.flush()
+            os.fsync(file.fileno())
+        self.__buffer = []
+
+    def reset(self) -> None:
+        """
+        Discards every entry, starting a fresh run.
+
+        Returns:
+        - `None`
+        """
+        self.__buffer = []
+        if os.path.exists(self.path):
+            os.remove(self.path)
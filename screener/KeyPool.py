@@ -0,0 +1,185 @@
+from .RateLimiter import RateLimiter, get_shared_limiter, loop_lock
+import asyncio
+import re
+import os
+
+_shared_pool = None
+
+def env_keys() -> list[str]:
+    """
+    Reads the FMP API keys from the environment.
+
+    `FMP_KEY` comes first, followed by `FMP_KEY_1`, `FMP_KEY_2`, ... in numeric order.
+    Blank and repeated keys are skipped.
+
+    Returns:
+    - `list[str]`: The configured keys.
+    """
+    numbered = sorted((int(name[8:]), value) for name, value in os.environ.items() if re.fullmatch(r"FMP_KEY_\d+", name))
+    keys = [os.environ.get('FMP_KEY')] + [value for _, value in numbered]
+    return list(dict.fromkeys(key.strip() for key in keys if key and key.strip()))
+
+def mask(key: str) -> str:
+    """
+    Hides the middle of a key, for logs and reports.
+    """
+    return f"{key[:4]}...{key[-2:]}" if len(key) > 8 else "***"
+
+class KeyPool:
+    def __init__(self, keys: list[str], rate_limiters: list[RateLimiter] = None) -> None:
+        """
+        A pool of FMP API keys, each with its own rate budget.
+
+        Every request is sent with the active key that has the most headroom left in
+        its window, so the pool runs at the sum of the keys' limits. A key that is
+        rejected (invalid key) or whose quota is used up is excluded for the rest of
+        the run, unless it is the last active key.
+
+        The pool exposes the same counters as a `RateLimiter` (`requests_sent`,
+        `seconds_waited`, `limit`, `period`, `estimate_minutes`), so callers that
+        size their work from the limiter keep working.
+
+        Parameters:
+        - `keys` (list[str]): The API keys, in order of preference.
+        - `rate_limiters` (list[RateLimiter]): One limiter per key. Defaults to a new `RateLimiter` per key.
+
+        Returns:
+        - `None`
+        """
+        if not keys:
+            raise ValueError("No FMP API key configured. Set FMP_KEY or FMP_KEY_1 in .env")
+        self.keys = list(keys)
+        rate_limiters = rate_limiters or [RateLimiter() for _ in keys]
+        self.rate_limiters = dict(zip(self.keys, rate_limiters))
+        self.excluded = {}
+        self.usage = {key: {"requests": 0, "throttled": 0, "auth_errors": 0} for key in self.keys}
+        self.seconds_waited = 0.0
+        self.__lock = None # (event loop, asyncio.Lock)
+
+    @classmethod
+    def from_env(cls, rate_limiter: RateLimiter = None) -> "KeyPool":
+        """
+        Builds a pool from the keys in the environment.
+
+        Parameters:
+        - `rate_limiter` (RateLimiter): Limiter of the first key. Defaults to the shared limiter; every other key gets its own.
+
+        Returns:
+        - `KeyPool`: The pool.
+        """
+        keys = env_keys()
+        return cls(keys, [rate_limiter or get_shared_limiter()] + [RateLimiter() for _ in keys[1:]])
+
+    @property
+    def active(self) -> list[str]:
+        """
+        The keys that haven't been excluded.
+        """
+        return [key for key in self.keys if key not in self.excluded]
+
+    @property
+    def limit(self) -> int:
+        """
+        Requests allowed per window across every active key.
+        """
+        return sum(self.rate_limiters[key].limit for key in self.active)
+
+    @property
+    def period(self) -> float:
+        return self.rate_limiters[self.keys[0]].period
+
+    @property
+    def requests_sent(self) -> int:
+        return sum(limiter.requests_sent for limiter in self.rate_limiters.values())
+
+    async def acquire(self) -> str:
+        """
+        Waits until one of the active keys can send a request and reserves it.
+
+        Returns:
+        - `str`: The key to send the request with.
+        """
+        self.__lock = loop_lock(self.__lock)
+        async with self.__lock[1]:
+            while True:
+                key = max(self.active, key=lambda i: self.rate_limiters[i].headroom())
+                if self.rate_limiters[key].headroom() > 0:
+                    break
+                wait = min(self.rate_limiters[i].wait_time() for i in self.active)
+                self.seconds_waited += wait
+                await asyncio.sleep(wait)
+            await self.rate_limiters[key].acquire()
+            self.usage[key]["requests"] += 1
+            return key
+
+    def exclude(self, key: str, reason: str) -> bool:
+        """
+        Stops routing requests to a key.
+
+        Parameters:
+        - `key` (str): The key to exclude.
+        - `reason` (str): Why, shown in the usage report.
+
+        Returns:
+        - `bool`: True if the key was excluded, False if it is the last active key and was kept.
+        """
+        if key in self.excluded:
+            return True
+        if self.active == [key]:
+            return False
+        self.excluded[key] = reason
+        print(f"Excluding FMP key {mask(key)}: {reason}")
+        return True
+
+    def record(self, key: str, event: str) -> None:
+        """
+        Counts a `throttled` or `auth_errors` response for a key.
+        """
+        self.usage[key][event] += 1
+
+    def estimate_minutes(self, requests: int) -> int:
+        """
+        Estimates how long it takes to send a number of requests with every active key.
+
+        Parameters:
+        - `requests` (int): The number of requests to be sent.
+
+        Returns:
+        - `int`: The estimated runtime in minutes.
+        """
+        windows = requests / self.limit
+        return int(windows * self.period // 60)
+
+    def get_stats(self) -> dict:
+        """
+        Returns the usage of every key, keyed by its position in the pool and the masked key.
+
+        Returns:
+        - `dict`: Requests, throttled responses and auth errors per key, and why it was excluded if it was.
+        """
+        return {f"{i + 1}:{mask(key)}": {**self.usage[key], "excluded": self.excluded.get(key)} for i, key in enumerate(self.keys)}
+
+    def report(self) -> str:
+        """
+        Formats the per-key usage for the end-of-run summary.
+
+        Returns:
+        - `str`: One line per key.
+        """
+        lines = []
+        for key, usage in self.get_stats().items():
+            line = f"FMP key {key}: {usage['requests']} requests, {usage['throttled']} throttled, {usage['auth_errors']} auth errors"
+            lines.append(line + (f", excluded ({usage['excluded']})" if usage["excluded"] else ""))
+        return "\n".join(lines)
+
+def get_shared_key_pool() -> KeyPool:
+    """
+    Returns the process-wide key pool shared by every screener module.
+
+    Returns:
+    - `KeyPool`: The shared pool, built from the environment on first use.
+    """
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = KeyPool.from_env()
+    return _shared_pool
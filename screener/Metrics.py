@@ -0,0 +1,261 @@
+from .Results import Results
+import numpy as np
+import pandas as pd
+
+# years of free cash flow averaged by the FCF based metrics
+FCF_YEARS = 5
+
+# raw fields normalized from the FMP responses, NaN when missing
+FIELDS = [
+    "market_cap", "last_div",                                                   # profile
+    "current_assets", "total_liabilities", "net_debt",                          # latest quarterly balance sheet
+    "fcf_sum", "fcf_negative_years", "buybacks", "cash",                        # annual cash flow statements
+    "market_cap_ttm", "fcf_per_share_ttm", "ev_ttm", "tangible_assets_ttm",     # key metrics TTM
+    "shares",                                                                   # float
+    "close", "max_close",                                                       # daily prices
+]
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _divide(a, b):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.divide(a, b)
+    if isinstance(result, pd.Series):
+        return result.where(np.isfinite(result))
+    return float(result) if np.isfinite(result) else np.nan
+
+def new_row(**fields) -> dict:
+    """
+    Returns a row with every raw field set to NaN, updated with `fields`.
+    """
+    row = dict.fromkeys(FIELDS, np.nan)
+    row.update(fields)
+    return row
+
+def profile_fields(profile: dict) -> dict:
+    """
+    Extracts the raw fields of a single company profile.
+
+    Parameters:
+    - `profile` (dict): One entry of a `v3/profile` response.
+
+    Returns:
+    - `dict`: The profile's raw fields, plus its `name`, `country`, `industry` and `exchange`.
+    """
+    if not profile:
+        return {}
+    return {
+        "market_cap": _number(profile.get("mktCap")),
+        "last_div": _number(profile.get("lastDiv", 0)),
+        "name": profile.get("companyName"),
+        "country": profile.get("country"),
+        "industry": profile.get("industry"),
+        "exchange": profile.get("exchange"),
+    }
+
+def balance_sheet_fields(balance_sheet: list) -> dict:
+    """
+    Extracts the raw fields of the latest balance sheet.
+
+    Parameters:
+    - `balance_sheet` (list): A `v3/balance-sheet-statement` response, most recent first.
+
+    Returns:
+    - `dict`: The balance sheet's raw fields.
+    """
+    if not balance_sheet:
+        return {}
+    latest = balance_sheet[0]
+    return {
+        "current_assets": _number(latest.get("totalCurrentAssets")),
+        "total_liabilities": _number(latest.get("totalLiabilities")),
+        "net_debt": _number(latest.get("netDebt")),
+    }
+
+def cashflow_fields(cashflow: list) -> dict:
+    """
+    Extracts the raw fields of the annual cash flow statements.
+
+    Parameters:
+    - `cashflow` (list): A `v3/cash-flow-statement` response, most recent first.
+
+    Returns:
+    - `dict`: The summed free cash flow and buybacks, the number of negative FCF years and the latest cash position.
+    """
+    if cashflow is None:
+        return {}
+    fcf = [_number(i.get("freeCashFlow")) for i in cashflow]
+    return {
+        "fcf_sum": sum(fcf),
+        "fcf_negative_years": sum(1 for i in fcf if i < 0),
+        "buybacks": sum(_number(i.get("commonStockRepurchased")) for i in cashflow),
+        "cash": _number(cashflow[0].get("cashAtEndOfPeriod")) if cashflow else np.nan,
+    }
+
+def key_metrics_fields(key_metrics: list) -> dict:
+    """
+    Extracts the raw fields of the TTM key metrics.
+
+    Parameters:
+    - `key_metrics` (list): A `v3/key-metrics-ttm` response.
+
+    Returns:
+    - `dict`: The key metrics' raw fields.
+    """
+    if not key_metrics:
+        return {}
+    ttm = key_metrics[0]
+    return {
+        "market_cap_ttm": _number(ttm.get("marketCapTTM")),
+        "fcf_per_share_ttm": _number(ttm.get("freeCashFlowPerShareTTM")),
+        "ev_ttm": _number(ttm.get("enterpriseValueTTM")),
+        "tangible_assets_ttm": _number(ttm.get("tangibleAssetValueTTM")),
+    }
+
+def historical_fields(historical: dict) -> dict:
+    """
+    Extracts the latest and the highest close of a price history.
+
+    Parameters:
+    - `historical` (dict): A `v3/historical-price-full` response, most recent first.
+
+    Returns:
+    - `dict`: The latest and highest close.
+    """
+    if not historical or not historical.get("historical"):
+        return {}
+    closes = [_number(i.get("close")) for i in historical["historical"]]
+    return {"close": closes[0], "max_close": max(closes)}
+
+# Every metric takes a row (dict of scalars) or a frame (DataFrame of columns), so the
+# pipeline stages and the whole-universe screen share one implementation.
+
+def _stored(data, name: str, compute):
+    # metrics `derive` already put in the row are reused rather than recomputed
+    value = data.get(name)
+    if value is None:
+        return compute()
+    if isinstance(value, pd.Series):
+        return value.where(value.notna(), compute()) if value.isna().any() else value
+    return compute() if pd.isna(value) else value
+
+def ncav(data, market_cap: str = "market_cap"):
+    return _stored(data, "ncav", lambda: data["current_assets"] - data["total_liabilities"])
+
+def ncav_ratio(data, market_cap: str = "market_cap"):
+    return _divide(data[market_cap], ncav(data))
+
+def fcf_average(data, market_cap: str = "market_cap"):
+    return _stored(data, "fcf_average", lambda: data["fcf_sum"] / FCF_YEARS)
+
+def fcf_average_ttm(data, market_cap: str = "market_cap"):
+    return (data["fcf_per_share_ttm"] * data["shares"] + data["fcf_sum"]) / FCF_YEARS
+
+def fcf_yield(data, market_cap: str = "market_cap"):
+    return _divide(fcf_average(data) * 100, data[market_cap])
+
+def pafcf(data, market_cap: str = "market_cap"):
+    return _divide(data[market_cap], fcf_average_ttm(data))
+
+def ev_afcf(data, market_cap: str = "market_cap"):
+    return _divide(data["ev_ttm"], fcf_average_ttm(data))
+
+def ptbv(data, market_cap: str = "market_cap"):
+    return _divide(data[market_cap], data["tangible_assets_ttm"])
+
+def price_metric(data, market_cap: str = "market_cap"):
+    return _divide((data["max_close"] - data["close"]) * 100, data["close"])
+
+def fv_upside(data, market_cap: str = "market_cap"):
+    return _divide((fcf_average(data) * 7 + data["cash"] - data[market_cap]) * 100, data[market_cap])
+
+def fv_upside_ttm(data, market_cap: str = "market_cap"):
+    return _divide((fcf_average_ttm(data) * 7 + data["cash"] - data[market_cap]) * 100, data[market_cap])
+
+METRICS = {
+    "ncav": ncav,
+    "ncav_ratio": ncav_ratio,
+    "fcf_average": fcf_average,
+    "fcf_average_ttm": fcf_average_ttm,
+    "fcf_yield": fcf_yield,
+    "pafcf": pafcf,
+    "ev_afcf": ev_afcf,
+    "ptbv": ptbv,
+    "price_metric": price_metric,
+    "fv_upside": fv_upside,
+    "fv_upside_ttm": fv_upside_ttm,
+}
+
+# response kind -> field extractor and the metrics that depend on its fields alone
+DERIVATIONS = {
+    "balance_sheet": (balance_sheet_fields, ["ncav"]),
+    "cashflow": (cashflow_fields, ["fcf_average"]),
+    "key_metrics": (key_metrics_fields, []),
+}
+
+def derive(kind: str, payload) -> dict:
+    """
+    Extracts the raw fields of a response together with the metrics computed from them alone.
+
+    Parameters:
+    - `kind` (str): `balance_sheet`, `cashflow` or `key_metrics`.
+    - `payload`: The FMP response.
+
+    Returns:
+    - `dict`: The raw fields and derived metrics, empty if the response has no data.
+    """
+    extract, metrics = DERIVATIONS[kind]
+    fields = extract(payload)
+    if fields:
+        for name in metrics:
+            fields[name] = METRICS[name](fields)
+    return fields
+
+def to_frame(rows: dict) -> pd.DataFrame:
+    """
+    Builds a columnar frame, one row per ticker, from normalized rows.
+
+    Parameters:
+    - `rows` (dict | Results): Ticker -> row, or rows already stored by column. Raw fields that are missing are NaN.
+
+    Returns:
+    - `pd.DataFrame`: The frame, indexed by ticker.
+    """
+    frame = rows.to_frame() if isinstance(rows, Results) else pd.DataFrame(list(rows.values()), index=list(rows))
+    for field in FIELDS:
+        frame[field] = pd.to_numeric(frame[field], errors='coerce') if field in frame else np.nan
+    return frame
+
+def compute(data, market_cap: str = "market_cap"):
+    """
+    Computes every metric in `METRICS`. Metrics that can't be computed (missing data, division by zero) are NaN.
+
+    Parameters:
+    - `data` (dict | pd.DataFrame): A single row or a frame from `to_frame`. Updated in place.
+    - `market_cap` (str): Field used as the market capitalization. Default is the profile's `market_cap`.
+
+    Returns:
+    - The updated row or frame.
+    """
+    for name, metric in METRICS.items():
+        data[name] = metric(data, market_cap)
+    return data
+
+def payback_rating(cash, fcf_average, market_cap) -> np.ndarray:
+    """
+    Rates how fast the cash and the average free cash flow pay back the market capitalization.
+
+    Parameters:
+    - `cash`, `fcf_average`, `market_cap`: One value per ticker.
+
+    Returns:
+    - `np.ndarray`: 0.5 when the cash alone covers the market cap, else 1, 2 or 3 for the years of average FCF it takes on top of the cash, NaN when three years don't.
+    """
+    cash, fcf_average, market_cap = (np.asarray(i, dtype=float) for i in (cash, fcf_average, market_cap))
+    return np.select(
+        [cash > market_cap, market_cap <= cash + fcf_average, market_cap <= cash + fcf_average * 2, market_cap <= cash + fcf_average * 3],
+        [0.5, 1, 2, 3], np.nan)
@@ -0,0 +1,372 @@
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+import asyncio
+import pandas as pd
+import json
+import os
+
+try:
+    import fcntl
+except ImportError: # Windows: saves from several processes aren't serialized
+    fcntl = None
+
+EPOCH = date(1970, 1, 1)
+
+# relative change of an already stored close that means the history was restated (e.g. a split)
+RESTATED = 0.005
+
+# segments per ticker above which the store is rewritten with one segment per ticker
+MAX_SEGMENTS = 16
+
+_stores = {}
+
+def _day(value: str) -> int:
+    return (date.fromisoformat(value[:10]) - EPOCH).days
+
+def _window_start(today: date, years: int) -> date:
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError: # Feb 29
+        return today.replace(year=today.year - years, day=28)
+
+class PriceStore:
+    def __init__(self, path: str = "./data/prices", years: int = 5) -> None:
+        """
+        A local columnar store of daily closes, filled with date-bounded requests.
+
+        Closes live in two contiguous on-disk arrays (day number and close) that are
+        memory-mapped for reading. Every ticker owns a list of `[offset, length]`
+        segments in ascending date order. A ticker's first request covers the last
+        `years` years; after that only the days since its last stored close are
+        requested and appended. If the overlapping day's close changed (a split or
+        other restatement), the ticker's window is fetched again in full.
+
+        New closes are buffered in memory until `save()`, which appends them to the
+        arrays and then rewrites the index, so an interrupted save never corrupts
+        what was stored before. Saves hold a file lock and start from the index on
+        disk, so worker processes screening disjoint tickers can share one store.
+
+        Parameters:
+        - `path` (str): Directory holding the `days`/`closes` arrays and `index.json`. Created if missing.
+        - `years` (int): Length of the price window in years. Default is 5.
+
+        Returns:
+        - `None`
+        """
+        self.path = path
+        self.years = years
+        self.requests = 0
+        self.days_fetched = 0
+        self.__pending = {}
+        self.__updating = {}
+        os.makedirs(path, exist_ok=True)
+        self.__load()
+
+    def __file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def __load(self) -> None:
+        while True:
+            index = {"generation": 0, "size": 0, "tickers": {}}
+            if os.path.exists(self.__file("index.json")):
+                with open(self.__file("index.json"), 'r') as file:
+                    index = json.load(file)
+            self.__generation = index["generation"]
+            self.__size = index["size"]
+            self.__tickers = index["tickers"]
+            self.__release()
+            if not self.__size:
+                return
+            try:
+                self.__days = np.memmap(self.__file(f"days.{self.__generation}.bin"), dtype=np.int32, mode='r', shape=(self.__size,))
+                self.__closes = np.memmap(self.__file(f"closes.{self.__generation}.bin"), dtype=np.float64, mode='r', shape=(self.__size,))
+                return
+            except FileNotFoundError: # another process rewrote the store after the index was read
+                continue
+
+    def __release(self) -> None:
+        # drops the memory maps so their files can be removed, even on Windows
+        self.__days = np.empty(0, dtype=np.int32)
+        self.__closes = np.empty(0, dtype=np.float64)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self.__tickers or ticker in self.__pending
+
+    def series(self, ticker: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns every stored close of a ticker.
+
+        Parameters:
+        - `ticker` (str): The stock ticker symbol.
+
+        Returns:
+        - `tuple`: Day numbers (days since 1970-01-01) and closes, in ascending date order.
+        """
+        days, closes = [], []
+        for offset, length in self.__tickers.get(ticker, {}).get("segments", []):
+            days.append(self.__days[offset:offset + length])
+            closes.append(self.__closes[offset:offset + length])
+        for segment_days, segment_closes in self.__pending.get(ticker, {}).get("segments", []):
+            days.append(segment_days)
+            closes.append(segment_closes)
+        if not days:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+        return np.concatenate(days), np.concatenate(closes)
+
+    def __entry(self, ticker: str) -> dict:
+        return self.__pending.get(ticker) or self.__tickers.get(ticker) or {}
+
+    async def update(self, client, ticker: str, today: date = None) -> bool:
+        """
+        Requests the closes a ticker is missing, up to `today`.
+
+        Concurrent updates of the same ticker, e.g. from two modules screening together,
+        wait for the first one instead of requesting the closes again.
+
+        Parameters:
+        - `client` (FMPClient): Client used for the `historical-price-full` requests.
+        - `ticker` (str): The stock ticker symbol.
+        - `today` (date): The current date. Defaults to today (UTC).
+
+        Returns:
+        - `bool`: True if the ticker has closes in the store.
+
+        Raises:
+        - `FMPRequestError`: If the request was still throttled after every retry.
+        """
+        if ticker in self.__updating:
+            return await asyncio.shield(self.__updating[ticker])
+        future = asyncio.get_running_loop().create_future()
+        self.__updating[ticker] = future
+        try:
+            found = await self.__update(client, ticker, today or datetime.now(timezone.utc).date())
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(found)
+            return found
+        finally:
+            del self.__updating[ticker]
+
+    async def __update(self, client, ticker: str, today: date) -> bool:
+        entry = self.__entry(ticker)
+        if entry.get("checked") == today.isoformat():
+            return entry.get("last") is not None
+        days, closes = self.series(ticker)
+        start = _window_start(today, self.years)
+        if len(days):
+            start = max(start, EPOCH + timedelta(days=int(days[-1]))) # overlap one day to detect restatements
+        fetched_days, fetched_closes = await self.__fetch(client, ticker, start, today)
+        if len(days) and len(fetched_days) and fetched_days[0] == days[-1]:
+            if abs(fetched_closes[0] - closes[-1]) > RESTATED * abs(closes[-1]):
+                self.__drop(ticker)
+                fetched_days, fetched_closes = await self.__fetch(client, ticker, _window_start(today, self.years), today)
+            else:
+                fetched_days, fetched_closes = fetched_days[1:], fetched_closes[1:]
+        pending = self.__pending.setdefault(ticker, {"segments": [], "last": entry.get("last")})
+        if len(fetched_days):
+            pending["segments"].append((fetched_days, fetched_closes))
+            pending["last"] = (EPOCH + timedelta(days=int(fetched_days[-1]))).isoformat()
+        pending["checked"] = today.isoformat()
+        return pending["last"] is not None
+
+    async def __fetch(self, client, ticker: str, start: date, end: date) -> tuple[np.ndarray, np.ndarray]:
+        self.requests += 1
+        res = await client.get_json(f'v3/historical-price-full/{ticker}', serietype='line', **{"from": start.isoformat(), "to": end.isoformat()})
+        rows = res.get("historical") if isinstance(res, dict) else None
+        if not rows:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+        days, closes = [], []
+        for row in reversed(rows): # FMP returns the most recent day first
+            try:
+                days.append(_day(row["date"]))
+                closes.append(float(row["close"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+        self.days_fetched += len(days)
+        return np.array(days, dtype=np.int32), np.array(closes, dtype=np.float64)
+
+    def __drop(self, ticker: str) -> None:
+        self.__tickers.pop(ticker, None)
+        self.__pending[ticker] = {"segments": [], "last": None, "dropped": True}
+
+    def summary(self, tickers: list[str], today: date = None) -> pd.DataFrame:
+        """
+        Computes the latest close and the highest close of the window for many tickers at once.
+
+        The closes of every ticker are laid end to end and reduced per ticker with
+        `np.maximum.reduceat`, after masking the days that fall outside the window.
+
+        Parameters:
+        - `tickers` (list[str]): The stock ticker symbols.
+        - `today` (date): End of the window. Defaults to today (UTC).
+
+        Returns:
+        - `pd.DataFrame`: `close` and `max_close` indexed by ticker, NaN for tickers without closes.
+        """
+        today = today or datetime.now(timezone.utc).date()
+        first = (_window_start(today, self.years) - EPOCH).days
+        series = [self.series(ticker) for ticker in tickers]
+        lengths = np.array([len(days) for days, _ in series], dtype=np.int64)
+        frame = pd.DataFrame(np.nan, index=list(tickers), columns=["close", "max_close"])
+        if not lengths.any():
+            return frame
+        days = np.concatenate([days for days, _ in series])
+        closes = np.concatenate([closes for _, closes in series])
+        has = lengths > 0
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))[has]
+        ends = np.cumsum(lengths)[has] - 1
+        windowed = np.where(days >= first, closes, -np.inf)
+        highest = np.maximum.reduceat(windowed, starts)
+        frame.loc[has, "close"] = closes[ends]
+        frame.loc[has, "max_close"] = np.where(np.isfinite(highest), highest, np.nan)
+        return frame
+
+    def fields(self, ticker: str, today: date = None) -> dict:
+        """
+        Returns the raw `close` and `max_close` fields of one ticker, as `Metrics.historical_fields` does.
+
+        Parameters:
+        - `ticker` (str): The stock ticker symbol.
+        - `today` (date): End of the window. Defaults to today (UTC).
+
+        Returns:
+        - `dict`: The latest and highest close, or an empty dict if the ticker has no closes.
+        """
+        return self.fields_of([ticker], today)[ticker]
+
+    def fields_of(self, tickers: list[str], today: date = None) -> dict:
+        """
+        Returns the raw `close` and `max_close` fields of many tickers from a single `summary`.
+
+        Parameters:
+        - `tickers` (list[str]): The stock ticker symbols.
+        - `today` (date): End of the window. Defaults to today (UTC).
+
+        Returns:
+        - `dict`: Ticker -> fields, an empty dict for tickers without closes.
+        """
+        frame = self.summary(tickers, today)
+        return {ticker: {} if np.isnan(close) else {"close": close, "max_close": max_close}
+                for ticker, close, max_close in zip(tickers, frame["close"].tolist(), frame["max_close"].tolist())}
+
+    def save(self, today: date = None) -> None:
+        """
+        Writes the buffered closes to disk.
+
+        New closes are appended to the arrays. Once tickers are split into more than
+        `MAX_SEGMENTS` segments, or dropped histories make up half of the arrays, the
+        store is rewritten instead: one segment per ticker, trimmed to the window. The
+        arrays of the previous generation are removed while the lock is still held, and
+        any that can't be removed yet (mapped by another process on Windows) by a later save.
+
+        Parameters:
+        - `today` (date): End of the window kept when the store is rewritten. Defaults to today (UTC).
+
+        Returns:
+        - `None`
+        """
+        if not self.__pending:
+            return
+        with self.__locked():
+            self.__load() # pick up what other processes saved since this one loaded
+            for ticker, pending in self.__pending.items():
+                if pending.get("dropped"):
+                    self.__tickers.pop(ticker, None)
+            self.__save(today)
+            self.__pending = {}
+            self.__load()
+            self.__remove_stale()
+
+    @contextmanager
+    def __locked(self):
+        with open(self.__file("index.lock"), 'w') as file:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_EX)
+            yield
+
+    def __save(self, today: date) -> None:
+        live = sum(length for entry in self.__tickers.values() for _, length in entry["segments"])
+        segments = max((len(entry["segments"]) for entry in self.__tickers.values()), default=0)
+        if segments >= MAX_SEGMENTS or self.__size > 2 * live:
+            self.__rewrite(today or datetime.now(timezone.utc).date())
+        else:
+            self.__append()
+
+    def __append(self) -> None:
+        size = self.__size
+        generation = self.__generation
+        with open(self.__file(f"days.{generation}.bin"), 'ab') as days_file, open(self.__file(f"closes.{generation}.bin"), 'ab') as closes_file:
+            days_file.truncate(size * 4) # drop what an interrupted save left behind
+            closes_file.truncate(size * 8)
+            for ticker, pending in self.__pending.items():
+                entry = self.__tickers.setdefault(ticker, {"segments": []})
+                for days, closes in pending["segments"]:
+                    days_file.write(days.astype(np.int32).tobytes())
+                    closes_file.write(closes.astype(np.float64).tobytes())
+                    entry["segments"].append([size, len(days)])
+                    size += len(days)
+                entry["last"] = pending["last"]
+                entry["checked"] = pending["checked"]
+        self.__write_index(generation, size)
+
+    def __rewrite(self, today: date) -> None:
+        first = (_window_start(today, self.years) - EPOCH).days
+        size = 0
+        tickers = {}
+        generation = self.__generation + 1
+        with open(self.__file(f"days.{generation}.bin"), 'wb') as days_file, open(self.__file(f"closes.{generation}.bin"), 'wb') as closes_file:
+            for ticker in set(self.__tickers) | set(self.__pending):
+                days, closes = self.series(ticker)
+                keep = days >= first
+                days, closes = days[keep], closes[keep]
+                entry = self.__entry(ticker)
+                tickers[ticker] = {"segments": [[size, len(days)]] if len(days) else [], "last": entry.get("last"), "checked": entry.get("checked")}
+                days_file.write(days.astype(np.int32).tobytes())
+                closes_file.write(closes.astype(np.float64).tobytes())
+                size += len(days)
+        self.__tickers = tickers
+        self.__write_index(generation, size)
+        self.__release()
+
+    def __remove_stale(self) -> None:
+        # removes the arrays of earlier generations; one still mapped by a reader on Windows is removed by a later save
+        for name in os.listdir(self.path):
+            kind, _, rest = name.partition('.')
+            generation = rest.removesuffix(".bin")
+            if kind in ("days", "closes") and rest.endswith(".bin") and generation.isdigit() and int(generation) < self.__generation:
+                try:
+                    os.remove(self.__file(name))
+                except OSError:
+                    pass
+
+    def __write_index(self, generation: int, size: int) -> None:
+        with open(self.__file("index.json.tmp"), 'w') as file:
+            json.dump({"generation": generation, "size": size, "tickers": self.__tickers}, file, separators=(',', ':'))
+        os.replace(self.__file("index.json.tmp"), self.__file("index.json"))
+
+    def get_stats(self) -> dict:
+        """
+        Returns the number of requests sent and closes fetched since the store was opened.
+        """
+        return {"price_requests": self.requests, "price_days_fetched": self.days_fetched, "price_tickers": len(self.__tickers)}
+
+def get_price_store(path: str = "./data/prices") -> PriceStore:
+    """
+    Returns the process-wide price store for `path`, shared by every screener module.
+
+    Parameters:
+    - `path` (str): Directory of the store. Default is `./data/prices`.
+
+    Returns:
+    - `PriceStore`: The shared store.
+    """
+    if path not in _stores:
+        _stores[path] = PriceStore(path)
+    return _stores[path]
@@ -0,0 +1,226 @@
+from .RunMetrics import RunMetrics, get_run_metrics
+import traceback
+import threading
+import tracemalloc
+import cProfile
+import asyncio
+import pstats
+import time
+import json
+import sys
+import os
+
+_profiler = None
+
+class LoopLagMonitor:
+    def __init__(self, threshold_ms: float = 100.0, interval_ms: float = 20.0, metrics: RunMetrics = None) -> None:
+        """
+        Flags callbacks that block the event loop.
+
+        A heartbeat task on the loop wakes up every `interval_ms`, and a watchdog
+        thread checks that it keeps doing so. When the heartbeat is more than
+        `threshold_ms` late, the block is reported once the loop runs again, with how
+        long it lasted and the stack of the loop's thread the watchdog captured while
+        it was stuck, i.e. the code that blocked it.
+
+        Parameters:
+        - `threshold_ms` (float): Lag above which a block is flagged. Default is 100 ms.
+        - `interval_ms` (float): Heartbeat interval. Default is 20 ms.
+        - `metrics` (RunMetrics): Where the lag histogram and the number of blocks are recorded. Defaults to the shared run metrics.
+
+        Returns:
+        - `None`
+        """
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.metrics = metrics or get_run_metrics()
+        self.blocks = []
+        self.__beat = None
+        self.__stack = None
+        self.__task = None
+        self.__thread = None
+        self.__stopped = threading.Event()
+
+    def start(self) -> None:
+        """
+        Starts watching the running event loop.
+
+        Returns:
+        - `None`
+        """
+        self.__beat = time.perf_counter()
+        self.__stopped.clear()
+        self.__task = asyncio.get_running_loop().create_task(self.__heartbeat())
+        self.__thread = threading.Thread(target=self.__watch, args=(threading.get_ident(),), name="loop-lag-monitor", daemon=True)
+        self.__thread.start()
+
+    async def stop(self) -> None:
+        """
+        Stops watching.
+
+        Returns:
+        - `None`
+        """
+        self.__stopped.set()
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+        if self.__thread is not None:
+            self.__thread.join()
+
+    async def __heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = now - self.__beat - self.interval
+            self.__beat = now
+            stack, self.__stack = self.__stack, None
+            self.metrics.observe("screener_loop_lag_seconds", max(lag, 0.0))
+            if lag > self.threshold:
+                self.metrics.inc("screener_loop_blocked_total")
+                self.blocks.append({"lag_ms": round(lag * 1000, 1), "stack": stack or "(not captured)"})
+                print(f"Event loop blocked for {lag * 1000:.0f} ms")
+
+    def __watch(self, loop_thread: int) -> None:
+        # the loop is stuck when its heartbeat is late: capture what its thread is running, early enough
+        # that a block just over the threshold is still caught in the act
+        while not self.__stopped.wait(self.threshold / 4):
+            if self.__stack is None and time.perf_counter() - self.__beat - self.interval > self.threshold / 2:
+                frame = sys._current_frames().get(loop_thread)
+                if frame is not None:
+                    self.__stack = "".join(traceback.format_stack(frame))
+
+class RunProfiler:
+    def __init__(self, path: str = "./data/reports/profile", lag_threshold_ms: float = 100.0, cprofile: bool = True, memory: bool = True, top: int = 25) -> None:
+        """
+        Opt-in profiling of a screening run.
+
+        The run is cut into phases at the boundaries the screeners report (see
+        `mark_phase`). Each phase gets its own cProfile statistics, written as
+        `<module>.<phase>.prof` (open with `pstats` or snakeviz), and its tracemalloc
+        peak. An event-loop lag monitor flags every callback blocking the loop for
+        more than `lag_threshold_ms`, with its stack trace. `profile.json` sums it up:
+        wall-clock, CPU and peak traced memory per phase, the phase's most expensive
+        functions, and the loop blocks.
+
+        A phase covers everything the process ran since the previous boundary, so
+        when modules screen concurrently (a combined run) a phase's profile also holds
+        the other module's work.
+
+        Parameters:
+        - `path` (str): Directory the profiles are written to, next to the run report. Default is `./data/reports/profile`.
+        - `lag_threshold_ms` (float): Event-loop lag flagged as blocking. Default is 100 ms.
+        - `cprofile` (bool): If True, phases are profiled with cProfile. Default is True.
+        - `memory` (bool): If True, peak allocations are traced with tracemalloc. Default is True.
+        - `top` (int): Functions listed per phase in `profile.json`, by cumulative time. Default is 25.
+
+        Returns:
+        - `None`
+        """
+        self.path = path
+        self.cprofile = cprofile
+        self.memory = memory
+        self.top = top
+        self.monitor = LoopLagMonitor(lag_threshold_ms)
+        self.phases = []
+        self.__profile = None
+        self.__started = None
+
+    async def __aenter__(self) -> "RunProfiler":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    async def start(self) -> None:
+        """
+        Starts profiling and watching the event loop, and makes this the profiler `mark_phase` reports to.
+
+        Returns:
+        - `None`
+        """
+        global _profiler
+        os.makedirs(self.path, exist_ok=True)
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.monitor.start()
+        self.__begin()
+        _profiler = self
+
+    async def stop(self) -> None:
+        """
+        Profiles whatever ran since the last phase as `other`, stops, and writes `profile.json`.
+
+        Returns:
+        - `None`
+        """
+        global _profiler
+        _profiler = None
+        self.mark("run", "other")
+        if self.__profile is not None:
+            self.__profile.disable()
+        await self.monitor.stop()
+        if self.memory:
+            tracemalloc.stop()
+        with open(os.path.join(self.path, "profile.json"), 'w') as file:
+            json.dump({"phases": self.phases, "loop_blocks": self.monitor.blocks}, file, indent=2)
+        print(f"Profiles written to {self.path}: {len(self.phases)} phases, {len(self.monitor.blocks)} event loop blocks.")
+
+    def __begin(self) -> None:
+        self.__started = (time.perf_counter(), time.process_time())
+        if self.memory:
+            tracemalloc.reset_peak()
+        if self.cprofile:
+            self.__profile = cProfile.Profile()
+            self.__profile.enable()
+
+    def mark(self, module: str, phase: str) -> None:
+        """
+        Ends a phase: writes its profile and starts profiling the next one.
+
+        Parameters:
+        - `module` (str): The module whose phase ended, e.g. `alpha`.
+        - `phase` (str): The phase, e.g. `profiles`.
+
+        Returns:
+        - `None`
+        """
+        wall, cpu = time.perf_counter() - self.__started[0], time.process_time() - self.__started[1]
+        entry = {"module": module, "phase": phase, "wall_seconds": round(wall, 3), "cpu_seconds": round(cpu, 3)}
+        if self.memory:
+            entry["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / (1 << 20), 2)
+        if self.__profile is not None:
+            self.__profile.disable()
+            name = f"{module}.{phase.replace(':', '_')}"
+            self.__profile.dump_stats(os.path.join(self.path, f"{name}.prof"))
+            stats = pstats.Stats(self.__profile).stats # (file, line, function) -> (primitive calls, calls, own time, cumulative time, callers)
+            slowest = sorted(stats.items(), key=lambda i: i[1][3], reverse=True)[:self.top]
+            entry["profile"] = f"{name}.prof"
+            entry["top"] = [{"function": f"{file}:{line}({function})", "calls": calls, "own_seconds": round(own, 4), "cumulative_seconds": round(cumulative, 4)}
+                            for (file, line, function), (_, calls, own, cumulative, _) in slowest]
+        self.phases.append(entry)
+        self.__begin()
+
+def get_profiler() -> RunProfiler:
+    """
+    Returns the running profiler, or None when the run isn't profiled.
+    """
+    return _profiler
+
+def mark_phase(module: str, phase: str) -> None:
+    """
+    Tells the running profiler, if any, that a module's phase just ended.
+
+    Parameters:
+    - `module` (str): The module, e.g. `alpha`.
+    - `phase` (str): The phase that ended, e.g. `profiles`.
+
+    Returns:
+    - `None`
+    """
+    if _profiler is not None:
+        _profiler.mark(module, phase)
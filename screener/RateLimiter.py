@@ -0,0 +1,209 @@
+from collections import deque
+import multiprocessing
+import asyncio
+import bisect
+import math
+import time
+import os
+
+def loop_lock(current: tuple) -> tuple:
+    """
+    Returns an `asyncio.Lock` usable on the running event loop, with that loop.
+
+    A lock is bound to the loop it is first contended on, so shared objects that
+    outlive an `asyncio.run` keep `(loop, lock)` and get a new lock on another loop.
+
+    Parameters:
+    - `current` (tuple): The `(loop, lock)` pair kept so far, or `None`.
+
+    Returns:
+    - `tuple`: The pair to keep and use.
+    """
+    loop = asyncio.get_running_loop()
+    if current is None or current[0] is not loop:
+        current = (loop, asyncio.Lock())
+    return current
+
+class RateLimiter:
+    def __init__(self, limit: int = None, period: float = 60.0) -> None:
+        """
+        Initializes a sliding-window rate limiter for the FMP API.
+
+        At most `limit` requests are let through in any `period` second window, so
+        the screeners can run at exactly the plan's ceiling without blocking the
+        event loop.
+
+        Parameters:
+        - `limit` (int): Requests allowed per window. Defaults to the `FMP_RATE_LIMIT` environment variable, or 300.
+        - `period` (float): Length of the window in seconds. Default is 60.
+
+        Returns:
+        - `None`
+        """
+        self.limit = limit or int(os.environ.get('FMP_RATE_LIMIT', 300))
+        self.period = period
+        self.requests_sent = 0
+        self.seconds_waited = 0.0
+        self.__sent = deque()
+        self.__lock = None # (event loop, asyncio.Lock)
+
+    async def acquire(self) -> None:
+        """
+        Waits until a request can be sent without exceeding the plan's limit.
+
+        Callers are served in the order they arrive.
+
+        Returns:
+        - `None`
+        """
+        self.__lock = loop_lock(self.__lock)
+        async with self.__lock[1]:
+            while True:
+                wait = self.wait_time()
+                if wait <= 0:
+                    break
+                self.seconds_waited += wait
+                await asyncio.sleep(wait)
+            self.__sent.append(time.monotonic())
+            self.requests_sent += 1
+
+    def acquire_sync(self) -> None:
+        """
+        Blocking version of `acquire` for synchronous clients, e.g. the Google Sheets API.
+
+        Returns:
+        - `None`
+        """
+        while True:
+            wait = self.wait_time()
+            if wait <= 0:
+                break
+            self.seconds_waited += wait
+            time.sleep(wait)
+        self.__sent.append(time.monotonic())
+        self.requests_sent += 1
+
+    def wait_time(self) -> float:
+        """
+        Returns the seconds until a request can be sent, or 0 if one can be sent now.
+        """
+        now = time.monotonic()
+        while self.__sent and now - self.__sent[0] >= self.period:
+            self.__sent.popleft()
+        if len(self.__sent) < self.limit:
+            return 0.0
+        return self.period - (now - self.__sent[0])
+
+    def headroom(self) -> int:
+        """
+        Returns the number of requests that can be sent right now without waiting.
+        """
+        self.wait_time()
+        return self.limit - len(self.__sent)
+
+    def estimate_minutes(self, requests: int) -> int:
+        """
+        Estimates how long it takes to send a number of requests at the plan's limit.
+
+        Parameters:
+        - `requests` (int): The number of requests to be sent.
+
+        Returns:
+        - `int`: The estimated runtime in minutes.
+        """
+        windows = requests / self.limit
+        return int(windows * self.period // 60)
+
+class SharedRateLimiter(RateLimiter):
+    def __init__(self, limit: int = None, period: float = 60.0, context = None) -> None:
+        """
+        A sliding-window rate limiter whose budget is shared by several processes.
+
+        The send times of the last `limit` requests live in a ring buffer in shared
+        memory, so every worker process of a sharded run draws from one global budget.
+        The limiter must be handed to the workers when they are started (e.g. through a
+        pool initializer), like any other `multiprocessing` synchronized object.
+
+        Parameters:
+        - `limit` (int): Requests allowed per window. Defaults to the `FMP_RATE_LIMIT` environment variable, or 300.
+        - `period` (float): Length of the window in seconds. Default is 60.
+        - `context` (multiprocessing.context.BaseContext): Context the shared memory is created from. Default is the current one.
+
+        Returns:
+        - `None`
+        """
+        super().__init__(limit, period)
+        context = context or multiprocessing.get_context()
+        self.__sent = context.Array('d', [-math.inf] * self.limit) # send times, oldest at `head`
+        self.__head = context.Value('i', 0, lock=False)
+
+    def __reserve(self, reserve: bool = True) -> float:
+        with self.__sent.get_lock():
+            now = time.monotonic()
+            elapsed = now - self.__sent[self.__head.value]
+            if elapsed < self.period:
+                return self.period - elapsed
+            if reserve:
+                self.__sent[self.__head.value] = now
+                self.__head.value = (self.__head.value + 1) % self.limit
+            return 0.0
+
+    async def acquire(self) -> None:
+        """
+        Waits until a request can be sent without exceeding the global limit.
+
+        Returns:
+        - `None`
+        """
+        while True:
+            wait = self.__reserve()
+            if wait <= 0:
+                break
+            self.seconds_waited += wait
+            await asyncio.sleep(wait)
+        self.requests_sent += 1
+
+    def acquire_sync(self) -> None:
+        """
+        Blocking version of `acquire`.
+
+        Returns:
+        - `None`
+        """
+        while True:
+            wait = self.__reserve()
+            if wait <= 0:
+                break
+            self.seconds_waited += wait
+            time.sleep(wait)
+        self.requests_sent += 1
+
+    def wait_time(self) -> float:
+        """
+        Returns the seconds until a request can be sent, or 0 if one can be sent now.
+        """
+        return self.__reserve(reserve=False)
+
+    def headroom(self) -> int:
+        """
+        Returns the number of requests that can be sent right now without waiting.
+        """
+        with self.__sent.get_lock():
+            head = self.__head.value
+            times = self.__sent[head:] + self.__sent[:head]
+            return bisect.bisect_right(times, time.monotonic() - self.period)
+
+
+_shared_limiter = None
+
+def get_shared_limiter() -> RateLimiter:
+    """
+    Returns the process-wide rate limiter shared by every screener module.
+
+    Returns:
+    - `RateLimiter`: The shared rate limiter.
+    """
+    global _shared_limiter
+    if _shared_limiter is None:
+        _shared_limiter = RateLimiter()
+    return _shared_limiter
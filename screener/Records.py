@@ -0,0 +1,183 @@
+from collections.abc import Mapping
+from .RunMetrics import RunMetrics, get_run_metrics
+import json
+
+try:
+    import orjson
+except ImportError: # the standard library parses the same payloads, only slower
+    orjson = None
+
+_UNSET = object()
+_NUMBER = (int, float)
+_STRING = (str,)
+
+class DecodeError(ValueError):
+    """
+    Raised when an FMP record doesn't have the shape the screeners rely on.
+    """
+
+class Record(Mapping):
+    """
+    A compact, read-only view of one FMP record that keeps only the fields the screeners read.
+
+    Fields live in `__slots__`, so a record holds no per-instance dict. A field the
+    payload didn't have is left unset and reads as missing (`get` returns the default),
+    while an explicit `null` reads as `None`, exactly as with the decoded dict. Records
+    behave as mappings, so code written against the raw dicts keeps working.
+    """
+    __slots__ = ()
+    numbers = () # fields that must hold a number or null
+
+    def __init__(self, data: dict) -> None:
+        if type(data) is not dict:
+            raise DecodeError(f"{type(self).__name__}: expected an object, got {type(data).__name__}")
+        numbers = self.numbers
+        for name in self.__slots__:
+            value = data.get(name, _UNSET)
+            if value is _UNSET:
+                continue
+            # exact type checks keep the common case cheap; `bool` isn't a number here
+            if value is not None and type(value) not in (_NUMBER if name in numbers else _STRING):
+                value = self.__check(name, value)
+            setattr(self, name, value)
+
+    def __check(self, name: str, value):
+        if name in self.numbers and isinstance(value, str):
+            # some statements carry numbers as strings: "" is a missing value, anything else must parse
+            if not value.strip():
+                return None
+            try:
+                return float(value)
+            except ValueError:
+                pass
+        expected = "a number" if name in self.numbers else "a string"
+        raise DecodeError(f"{type(self).__name__}.{name}: expected {expected}, got {value!r}")
+
+    def __getitem__(self, key: str):
+        if key in self.__slots__:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __iter__(self):
+        return (name for name in self.__slots__ if hasattr(self, name))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)})"
+
+class Profile(Record):
+    __slots__ = ("symbol", "companyName", "mktCap", "lastDiv", "country", "industry", "exchange")
+    numbers = ("mktCap", "lastDiv")
+
+class BalanceSheet(Record):
+    __slots__ = ("symbol", "date", "fillingDate", "totalCurrentAssets", "totalLiabilities", "netDebt")
+    numbers = ("totalCurrentAssets", "totalLiabilities", "netDebt")
+
+class Cashflow(Record):
+    __slots__ = ("symbol", "date", "fillingDate", "freeCashFlow", "commonStockRepurchased", "cashAtEndOfPeriod")
+    numbers = ("freeCashFlow", "commonStockRepurchased", "cashAtEndOfPeriod")
+
+class KeyMetrics(Record):
+    __slots__ = ("symbol", "marketCapTTM", "enterpriseValueTTM", "freeCashFlowPerShareTTM", "tangibleAssetValueTTM")
+    numbers = ("marketCapTTM", "enterpriseValueTTM", "freeCashFlowPerShareTTM", "tangibleAssetValueTTM")
+
+class Price(Record):
+    __slots__ = ("date", "close", "high")
+    numbers = ("close", "high")
+
+class SharesFloat(Record):
+    __slots__ = ("symbol", "outstandingShares")
+    numbers = ("outstandingShares",)
+
+class Earnings(Record):
+    __slots__ = ("symbol", "date")
+
+# endpoint -> record of the list it answers; `historical-price-full` answers an object holding a list of prices
+RECORDS = {
+    "v3/profile": Profile,
+    "v3/balance-sheet-statement": BalanceSheet,
+    "v3/cash-flow-statement": Cashflow,
+    "v3/key-metrics-ttm": KeyMetrics,
+    "v3/historical-price-full": Price,
+    "v4/shares_float": SharesFloat,
+    "v3/earning_calendar": Earnings,
+}
+
+def loads(body: bytes):
+    """
+    Parses a JSON body, with orjson when it is installed.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            pass # e.g. a NaN literal, which only the standard library accepts
+    return json.loads(body)
+
+def project(endpoint: str, data, metrics: RunMetrics = None):
+    """
+    Turns a decoded FMP payload into records holding only the fields the screeners read.
+
+    Anything that isn't a list of records (error messages, empty objects, endpoints
+    without a record type) is returned as is. Records that don't have the expected
+    shape are dropped and counted in `screener_decode_errors_total`, so one malformed
+    record doesn't cost the other tickers of a batch. A payload with dropped records
+    prints a single line for all of them.
+
+    Parameters:
+    - `endpoint` (str): Endpoint the payload came from, e.g. `v3/profile` or `v4/shares_float`.
+    - `data`: The decoded payload. Records in it are kept as they are.
+    - `metrics` (RunMetrics): Where dropped records are counted. Defaults to the shared run metrics.
+
+    Returns:
+    - The projected payload: a list of records, or for `historical-price-full` an object whose `historical` list holds records.
+    """
+    kind = RECORDS.get(endpoint)
+    if kind is None:
+        return data
+    if kind is Price:
+        if isinstance(data, dict) and isinstance(data.get("historical"), list):
+            return {"symbol": data.get("symbol"), "historical": _records(kind, data["historical"], endpoint, metrics)}
+        return data
+    if not isinstance(data, list):
+        return data
+    return _records(kind, data, endpoint, metrics)
+
+def _records(kind: type, items: list, endpoint: str, metrics: RunMetrics) -> list:
+    records = []
+    dropped, first = 0, None
+    for item in items:
+        if isinstance(item, kind):
+            records.append(item)
+            continue
+        try:
+            records.append(kind(item))
+        except DecodeError as e:
+            dropped += 1
+            first = first or e
+    if dropped:
+        (metrics or get_run_metrics()).inc("screener_decode_errors_total", dropped, endpoint=endpoint)
+        print(f"Dropped {dropped} malformed {endpoint} records, the first: {first}")
+    return records
+
+def decode(endpoint: str, body: bytes, metrics: RunMetrics = None):
+    """
+    Parses an FMP response body straight into records, see `project`.
+
+    Parameters:
+    - `endpoint` (str): Endpoint the body came from.
+    - `body` (bytes): The raw response body.
+    - `metrics` (RunMetrics): Where dropped records are counted. Defaults to the shared run metrics.
+
+    Returns:
+    - The projected payload.
+
+    Raises:
+    - `ValueError`: If the body isn't JSON.
+    """
+    return project(endpoint, loads(body), metrics)
@@ -0,0 +1,290 @@
+from datetime import date, datetime, timedelta, timezone
+import sqlite3
+import json
+import time
+import zlib
+import os
+
+DAY = 86400
+
+# endpoint -> seconds a response stays fresh, "close" to keep it until the next market close,
+# or "filing" to keep it until the company's next filing is probably due
+DEFAULT_TTLS = {
+    "v3/profile": DAY,
+    "v3/balance-sheet-statement": "filing",
+    "v3/cash-flow-statement": "filing",
+    "v3/key-metrics-ttm": DAY,
+    "v3/historical-price-full": "close",
+}
+
+# statement period -> days between two filings
+FILING_CADENCE = {"quarter": 91, "annual": 365}
+
+def next_close(now: datetime = None) -> datetime:
+    """
+    Returns the next weekday market close, taken as 21:00 UTC (after the US close all year round).
+
+    Parameters:
+    - `now` (datetime): The current time in UTC. Defaults to now.
+
+    Returns:
+    - `datetime`: The next close in UTC.
+    """
+    now = now or datetime.now(timezone.utc)
+    close = now.replace(hour=21, minute=0, second=0, microsecond=0)
+    if close <= now:
+        close += timedelta(days=1)
+    while close.weekday() >= 5:
+        close += timedelta(days=1)
+    return close
+
+def next_filing(statements: list[dict], period: str = "quarter", now: datetime = None) -> datetime:
+    """
+    Estimates when a company's next statement is probably filed, a week ahead of its usual cadence.
+
+    Parameters:
+    - `statements` (list[dict]): The statements as returned by FMP (with `fillingDate` and/or `date`).
+    - `period` (str): `quarter` or `annual`. Default is `quarter`.
+    - `now` (datetime): The current time in UTC. Defaults to now.
+
+    Returns:
+    - `datetime`: The time the stored statements should be refetched, never earlier than one day from `now`.
+    """
+    now = now or datetime.now(timezone.utc)
+    cadence = FILING_CADENCE.get(period, FILING_CADENCE["annual"])
+    latest = None
+    for statement in statements:
+        try:
+            filed = statement.get("fillingDate") or statement.get("date")
+            filed = datetime.fromisoformat(filed[:10]).replace(tzinfo=timezone.utc)
+        except (AttributeError, TypeError, ValueError):
+            continue
+        latest = filed if latest is None or filed > latest else latest
+    if latest is None:
+        return now + timedelta(days=7)
+    return max(latest + timedelta(days=cadence - 7), now + timedelta(days=1))
+
+class ResponseCache:
+    def __init__(self, path: str = "./data/fmp_cache.sqlite", ttls: dict = None, max_bytes: int = 2 * 1024 ** 3) -> None:
+        """
+        A persistent on-disk cache of FMP responses, keyed by endpoint, ticker and query parameters.
+
+        Parameters:
+        - `path` (str): Path to the SQLite database. Created if missing.
+        - `ttls` (dict): Endpoint -> seconds, or "close", overriding `DEFAULT_TTLS`. Endpoints without a TTL are not cached.
+        - `max_bytes` (int): Size of stored (compressed) responses above which the least recently used entries are evicted. Default is 2 GiB.
+
+        Returns:
+        - `None`
+        """
+        self.path = path
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.__db = sqlite3.connect(path)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("PRAGMA synchronous=NORMAL")
+        self.__db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT,
+                ticker TEXT,
+                body BLOB,
+                size INTEGER,
+                expires REAL,
+                accessed REAL)""")
+        self.__db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.__db.execute("CREATE INDEX IF NOT EXISTS responses_ticker ON responses (ticker)")
+        self.__db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.__db.execute("DELETE FROM responses WHERE expires <= ?", (time.time(),))
+        self.__db.commit()
+        self.__size = self.__db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def __key(endpoint: str, ticker: str, params: dict) -> str:
+        return f"{endpoint}/{ticker}?{json.dumps(params, sort_keys=True, default=str)}"
+
+    def __expires(self, endpoint: str, params: dict, value) -> float:
+        ttl = self.ttls.get(endpoint)
+        if ttl is None:
+            return None
+        if ttl == "close":
+            return next_close().timestamp()
+        if ttl == "filing":
+            return next_filing(value if isinstance(value, list) else [], params.get("period", "annual")).timestamp()
+        return time.time() + ttl
+
+    def get(self, endpoint: str, ticker: str, params: dict = None):
+        """
+        Returns a cached response if it is still fresh.
+
+        Parameters:
+        - `endpoint` (str): Endpoint path, e.g. `v3/profile`.
+        - `ticker` (str): The stock ticker symbol (or comma-separated symbols).
+        - `params` (dict): Query parameters, excluding the API key.
+
+        Returns:
+        - The cached response, or `None` on a miss.
+        """
+        if endpoint not in self.ttls:
+            return None
+        key = self.__key(endpoint, ticker, params or {})
+        row = self.__db.execute("SELECT body, expires FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or row[1] <= now:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.__db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, endpoint: str, ticker: str, params: dict, value) -> None:
+        """
+        Stores a response. Failed requests and FMP error messages are never cached.
+
+        Parameters:
+        - `endpoint` (str): Endpoint path, e.g. `v3/profile`.
+        - `ticker` (str): The stock ticker symbol (or comma-separated symbols).
+        - `params` (dict): Query parameters, excluding the API key.
+        - `value`: The decoded JSON response.
+
+        Returns:
+        - `None`
+        """
+        params = params or {}
+        if value is None or (isinstance(value, dict) and "Error Message" in value):
+            return
+        expires = self.__expires(endpoint, params, value)
+        if expires is None:
+            return
+        key = self.__key(endpoint, ticker, params)
+        body = zlib.compress(json.dumps(value, separators=(',', ':'), default=dict).encode()) # `Records` are mappings
+        old = self.__db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self.__db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, endpoint, ticker, body, len(body), expires, time.time()))
+        self.__size += len(body) - (old[0] if old else 0)
+        if self.__size > self.max_bytes:
+            self.__evict()
+        self.__db.commit()
+
+    def __evict(self) -> None:
+        target = self.max_bytes * 0.9
+        rows = self.__db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+        drop = []
+        for key, size in rows:
+            if self.__size <= target:
+                break
+            drop.append((key,))
+            self.__size -= size
+        self.__db.executemany("DELETE FROM responses WHERE key = ?", drop)
+        self.evictions += len(drop)
+
+    def invalidate(self, tickers: list[str], endpoints: list[str] = None) -> int:
+        """
+        Removes the cached responses of the given tickers.
+
+        Parameters:
+        - `tickers` (list[str]): The stock ticker symbols.
+        - `endpoints` (list[str]): Endpoints to invalidate. Default is every endpoint with a `filing` TTL.
+
+        Returns:
+        - `int`: The number of responses removed.
+        """
+        endpoints = endpoints or [k for k, v in self.ttls.items() if v == "filing"]
+        removed = 0
+        for endpoint in endpoints:
+            rows = self.__db.executemany(
+                "DELETE FROM responses WHERE endpoint = ? AND ticker = ?",
+                [(endpoint, ticker) for ticker in tickers])
+            removed += rows.rowcount
+        self.__db.commit()
+        self.__size = self.__db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.invalidations += removed
+        return removed
+
+    async def sync_filings(self, client, today: date = None) -> int:
+        """
+        Invalidates the stored statements of every company that reported since the last sync.
+
+        One `earning_calendar` request per 90 days since the last sync replaces a statement
+        check per ticker. Tickers whose next filing is only probably due are handled by the
+        `filing` TTL itself.
+
+        Parameters:
+        - `client` (FMPClient): Client used to request the earnings calendar.
+        - `today` (date): The current date. Defaults to today.
+
+        Returns:
+        - `int`: The number of responses removed.
+        """
+        today = today or datetime.now(timezone.utc).date()
+        row = self.__db.execute("SELECT value FROM meta WHERE key = 'filings_synced'").fetchone()
+        removed = 0
+        if row is not None:
+            start = date.fromisoformat(row[0]) - timedelta(days=7) # filings can land a few days after the report
+            reported = set()
+            while start <= today:
+                end = min(start + timedelta(days=89), today)
+                calendar = await client.get_json('v3/earning_calendar', **{"from": start.isoformat(), "to": end.isoformat()})
+                if not isinstance(calendar, list):
+                    print("Error fetching the earnings calendar.")
+                    return removed
+                reported.update(i['symbol'] for i in calendar if i.get('symbol'))
+                start = end + timedelta(days=1)
+            removed = self.invalidate(sorted(reported))
+        self.__db.execute("INSERT OR REPLACE INTO meta VALUES ('filings_synced', ?)", (today.isoformat(),))
+        self.__db.commit()
+        return removed
+
+    def clear(self, endpoint: str = None) -> None:
+        """
+        Removes every cached response, or only those of one endpoint.
+
+        Parameters:
+        - `endpoint` (str): Endpoint to clear. Default is all endpoints.
+
+        Returns:
+        - `None`
+        """
+        if endpoint is None:
+            self.__db.execute("DELETE FROM responses")
+        else:
+            self.__db.execute("DELETE FROM responses WHERE endpoint = ?", (endpoint,))
+        self.__db.commit()
+        self.__size = self.__db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get_stats(self) -> dict:
+        """
+        Returns hit/miss counters and the size of the cache.
+
+        Returns:
+        - `dict`: Cache statistics.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "cache_evictions": self.evictions,
+            "cache_invalidations": self.invalidations,
+            "cache_bytes": self.__size,
+        }
+
+    def flush(self) -> None:
+        """
+        Commits pending writes (such as access times recorded on cache hits).
+
+        Returns:
+        - `None`
+        """
+        self.__db.commit()
+
+    def close(self) -> None:
+        self.__db.commit()
+        self.__db.close()
@@ -0,0 +1,295 @@
+from collections.abc import Mapping, MutableMapping
+import numpy as np
+import pandas as pd
+
+_UNSET = object()
+
+def _column(values) -> np.ndarray:
+    # numbers stay in fixed-width arrays (NaN where missing), flags in bool arrays, anything else is an object array
+    values = np.asarray(values)
+    if values.dtype.kind not in "biuf":
+        values = values.astype(object)
+    return values
+
+def _wider(dtype: np.dtype, value) -> np.dtype:
+    # the type a column needs to also hold `value`
+    if dtype == object:
+        return dtype
+    if isinstance(value, (bool, int, float, np.number, np.bool_)):
+        return np.result_type(dtype, type(value))
+    return np.dtype(object)
+
+def _native(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+class ResultRow(MutableMapping):
+    """
+    One ticker of `Results`, read and written through as a dict.
+
+    A row reads its values from the columns, so it doesn't hold a copy of them. Writing a
+    field no column has yet adds the column, NaN for every other ticker. A row is only
+    valid until tickers are removed from its results.
+    """
+    __slots__ = ("_results", "_position")
+
+    def __init__(self, results: "Results", position: int) -> None:
+        self._results = results
+        self._position = position
+
+    def __getitem__(self, key: str):
+        return _native(self._results.columns[key][self._position])
+
+    def __setitem__(self, key: str, value) -> None:
+        self._results.set(key, self._position, value)
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError("fields of a result row can't be removed")
+
+    def __iter__(self):
+        return iter(self._results.columns)
+
+    def __len__(self) -> int:
+        return len(self._results.columns)
+
+    def __repr__(self) -> str:
+        return f"ResultRow({dict(self)})"
+
+class Results(Mapping):
+    def __init__(self, columns: dict = None, index: list = None) -> None:
+        """
+        Screening results stored by column: one NumPy array per reported field, one position per ticker.
+
+        Numeric fields are float64 or int64 arrays, with NaN where a metric couldn't be
+        computed, and flags are bool arrays. Only text fields hold Python objects. A
+        large universe therefore costs a few bytes per field and ticker, where a dict
+        per ticker costs hundreds of bytes.
+
+        `Results` is a mapping of ticker -> row (`ResultRow`), so code written against
+        the former dict of dicts (`results[ticker]["NCAV Ratio"]`, `results.items()`)
+        keeps working. `to_frame` hands the columns to pandas without copying them, and
+        `filter`, `drop` and `sort` select tickers over whole columns. Screeners `append`
+        each ticker as it is evaluated, straight into the column buffers.
+
+        Parameters:
+        - `columns` (dict): Field -> values, one per ticker, in the order of `index`.
+        - `index` (list): The tickers.
+
+        Returns:
+        - `None`
+        """
+        self.index = np.asarray(index if index is not None else [], dtype=object)
+        self.columns = {name: _column(values) for name, values in (columns or {}).items()}
+        for name, values in self.columns.items():
+            if len(values) != len(self.index):
+                raise ValueError(f"column {name!r} has {len(values)} values for {len(self.index)} tickers")
+        self.__positions = None
+        self.__buffers = None # (index, field -> values) with room to append, `index` and `columns` are views of them
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_Results__buffers"] = None # only the views are pickled, not the spare room
+        return state
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "Results":
+        """
+        Builds results from a frame indexed by ticker, one column per field.
+        """
+        return cls({name: frame[name].to_numpy() for name in frame.columns}, list(frame.index))
+
+    @classmethod
+    def from_dict(cls, rows: dict) -> "Results":
+        """
+        Builds results from ticker -> fields, e.g. results saved as a dict of dicts.
+        """
+        if isinstance(rows, Results):
+            return rows
+        if not rows:
+            return cls()
+        return cls.from_frame(pd.DataFrame.from_dict({ticker: dict(row) for ticker, row in rows.items()}, orient='index'))
+
+    @classmethod
+    def concat(cls, parts: list) -> "Results":
+        """
+        Chains several results, e.g. those of the shards of a universe, in the given order.
+
+        Parameters:
+        - `parts` (list): `Results` or dicts of ticker -> fields. A field missing from a part is NaN for its tickers.
+
+        Returns:
+        - `Results`: The chained results.
+        """
+        parts = [cls.from_dict(part) for part in parts]
+        parts = [part for part in parts if len(part)]
+        if len(parts) == 1:
+            return parts[0].copy()
+        if not parts:
+            return cls()
+        return cls.from_frame(pd.concat([part.to_frame() for part in parts]))
+
+    def __positions_by_ticker(self) -> dict:
+        if self.__positions is None:
+            self.__positions = {ticker: i for i, ticker in enumerate(self.index)}
+        return self.__positions
+
+    def __getitem__(self, ticker: str) -> ResultRow:
+        return ResultRow(self, self.__positions_by_ticker()[ticker])
+
+    def __contains__(self, ticker) -> bool:
+        return ticker in self.__positions_by_ticker()
+
+    def __iter__(self):
+        return iter(self.index.tolist())
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __repr__(self) -> str:
+        return f"Results({len(self)} tickers, {len(self.columns)} fields)"
+
+    def column(self, name: str, default = np.nan) -> np.ndarray:
+        """
+        Returns a field's values in ticker order, or `default` for every ticker if no column has the field.
+        """
+        if name in self.columns:
+            return self.columns[name]
+        return np.full(len(self.index), default)
+
+    def set(self, name: str, position: int, value) -> None:
+        """
+        Sets one ticker's field, widening the column's type if the value doesn't fit it.
+
+        Parameters:
+        - `name` (str): The field.
+        - `position` (int): The ticker's position in `index`.
+        - `value`: The new value.
+
+        Returns:
+        - `None`
+        """
+        values = self.columns.get(name)
+        if values is None:
+            values = self.columns[name] = np.full(len(self.index), np.nan)
+            self.__buffers = None
+        wider = _wider(values.dtype, value)
+        if wider != values.dtype:
+            values = self.columns[name] = values.astype(wider)
+            self.__buffers = None
+        values[position] = value
+
+    def append(self, ticker: str, fields: Mapping) -> None:
+        """
+        Adds a ticker after the others, or replaces its fields if it is already there.
+
+        The columns live in buffers with spare room, doubled whenever they fill up, so
+        appending a ticker writes one value per column instead of copying the columns. A
+        field no column has yet adds the column, NaN for the tickers before, and a column
+        the ticker has no value for gets NaN.
+
+        Parameters:
+        - `ticker` (str): The stock ticker symbol.
+        - `fields` (Mapping): Field -> value.
+
+        Returns:
+        - `None`
+        """
+        position = self.__positions_by_ticker().get(ticker)
+        if position is not None:
+            for name in list(self.columns) + [name for name in fields if name not in self.columns]:
+                self.set(name, position, fields.get(name, np.nan))
+            return
+        size = len(self.index)
+        if self.__buffers is None or len(self.__buffers[0]) == size:
+            capacity = max(16, 2 * size)
+            index = np.empty(capacity, dtype=object)
+            index[:size] = self.index
+            buffers = {}
+            for name, values in self.columns.items():
+                buffers[name] = np.empty(capacity, dtype=values.dtype)
+                buffers[name][:size] = values
+            self.__buffers = (index, buffers)
+        index, buffers = self.__buffers
+        for name in fields:
+            if name not in buffers:
+                buffers[name] = np.full(len(index), np.nan)
+        for name, values in buffers.items():
+            value = fields.get(name, np.nan)
+            wider = _wider(values.dtype, value)
+            if wider != values.dtype:
+                values = buffers[name] = values.astype(wider)
+            values[size] = value
+        index[size] = ticker
+        self.index = index[:size + 1]
+        self.columns = {name: values[:size + 1] for name, values in buffers.items()}
+        self.__positions[ticker] = size
+
+    def set_column(self, name: str, values) -> None:
+        """
+        Sets a field for every ticker at once.
+        """
+        values = _column(values)
+        if len(values) != len(self.index):
+            raise ValueError(f"column {name!r} has {len(values)} values for {len(self.index)} tickers")
+        self.columns[name] = values
+        self.__buffers = None
+
+    def filter(self, keep) -> "Results":
+        """
+        Returns the tickers where `keep` is True.
+
+        Parameters:
+        - `keep` (np.ndarray): A bool per ticker, in ticker order.
+
+        Returns:
+        - `Results`: The kept tickers, in the same order.
+        """
+        keep = np.asarray(keep, dtype=bool)
+        return Results({name: values[keep] for name, values in self.columns.items()}, self.index[keep])
+
+    def drop(self, tickers) -> "Results":
+        """
+        Returns the results without `tickers`. Tickers that aren't in the results are ignored.
+        """
+        return self.filter(~np.isin(self.index, list(tickers)))
+
+    def pop(self, ticker: str, default = _UNSET):
+        """
+        Removes a ticker and returns its fields as a dict. Removing several tickers at once is cheaper with `drop`.
+        """
+        if ticker not in self:
+            if default is _UNSET:
+                raise KeyError(ticker)
+            return default
+        row = dict(self[ticker])
+        keep = self.index != ticker
+        self.columns = {name: values[keep] for name, values in self.columns.items()}
+        self.index = self.index[keep]
+        self.__positions = None
+        self.__buffers = None
+        return row
+
+    def sort(self, *fields: str) -> "Results":
+        """
+        Returns the results sorted on `fields`, lowest first, the first field deciding first. NaN sorts last and ties keep their order.
+        """
+        order = np.lexsort([self.columns[name] for name in reversed(fields)]) if len(self) else np.arange(0)
+        return Results({name: values[order] for name, values in self.columns.items()}, self.index[order])
+
+    def copy(self) -> "Results":
+        """
+        Returns results with copies of the columns.
+        """
+        return Results({name: values.copy() for name, values in self.columns.items()}, self.index.copy())
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the results as a frame indexed by ticker. The frame shares the columns' memory.
+        """
+        return pd.DataFrame(self.columns, index=pd.Index(self.index, dtype=object), copy=False)
+
+    def to_dict(self) -> dict:
+        """
+        Returns ticker -> fields as plain Python values, as the screeners used to store their results.
+        """
+        columns = {name: values.tolist() for name, values in self.columns.items()}
+        return {ticker: {name: values[i] for name, values in columns.items()} for i, ticker in enumerate(self.index.tolist())}
@@ -0,0 +1,232 @@
+from . import Metrics
+import pandas as pd
+import numpy as np
+import json
+import re
+
+# Each rule is a condition over a row or a metric frame:
+# - `{"field": name, <op>: value, ...}` compares a raw field or a metric from `Metrics.METRICS`.
+#   Ops: gt, ge, lt, le, eq, ne, in, not_in, startswith, contains, notna, isna. Several ops are ANDed.
+#   `"round": n` rounds the value first.
+# - `{"all": [...]}`, `{"any": [...]}` and `{"not": ...}` combine conditions.
+# - `{"rule": name}` reuses another rule of the same spec.
+
+_PROFILE = {"all": [
+    {"field": "market_cap", "gt": 0},
+    {"field": "country", "not_in": ["CN", "HK"]},
+    {"field": "industry", "notna": True},
+    {"not": {"field": "industry", "startswith": ["Banks", "Insurance", "Financial", "Investment"]}},
+    {"field": "industry", "ne": "Asset Management"},
+    {"field": "last_div", "notna": True},
+]}
+
+_ADDED = {
+    "ncav": {"field": "ncav_ratio", "round": 1, "gt": 0, "lt": 2.5},
+    "pafcf": {"field": "pafcf", "gt": 0, "lt": 10},
+    "ev_afcf": {"field": "ev_afcf", "gt": 1, "lt": 5},
+    "ptbv": {"field": "ptbv", "gt": 0, "lt": 1},
+}
+
+SCREENER2_RULES = {
+    "keep": {"all": [
+        {"field": "ncav_ratio", "notna": True},
+        {"field": "pafcf", "notna": True},
+        {"field": "ev_afcf", "notna": True},
+        {"field": "ptbv", "notna": True},
+        {"field": "net_debt", "notna": True},
+        {"field": "name", "notna": True},
+        {"field": "industry", "notna": True},
+        {"field": "fcf_negative_years", "le": 2},
+        {"field": "country", "notna": True, "not_in": ["CN", "HK"]},
+    ]},
+    **_ADDED,
+    "isAdded": {"all": [
+        {"any": [{"rule": "ncav"}, {"rule": "pafcf"}, {"rule": "ev_afcf"}, {"rule": "ptbv"}]},
+        {"not": {"field": "net_debt", "gt": 0}},
+    ]},
+    "blacklist": {"field": "industry", "contains": ["Banks", "Insurance"]},
+}
+
+ALPHA_RULES = {
+    "profile": _PROFILE,
+    "cashflow": {"all": [
+        {"field": "fcf_yield", "round": 2, "ge": 10},
+        {"not": {"all": [{"field": "last_div", "eq": 0}, {"not": {"field": "buybacks", "lt": 0}}]}},
+    ]},
+    "balance_sheet": {"all": [
+        {"field": "net_debt", "le": 0},
+        {"field": "ncav", "ge": 0},
+        {"field": "ncav_ratio", "notna": True},
+    ]},
+    "historical": {"field": "price_metric", "notna": True},
+    "fv_upside": {"field": "fv_upside", "notna": True},
+}
+
+BETA_RULES = {
+    "profile": _PROFILE,
+    "balance_sheet": {"all": [{"field": "ncav_ratio", "notna": True}, {"field": "net_debt", "notna": True}]},
+    "key_metrics_cashflow": {"all": [
+        {"field": "cash", "notna": True},
+        {"field": "pafcf", "notna": True},
+        {"field": "ev_afcf", "notna": True},
+        {"field": "ptbv", "notna": True},
+        {"field": "fcf_negative_years", "le": 2},
+    ]},
+    "historical": {"field": "price_metric", "notna": True},
+    "fv_upside": {"field": "fv_upside_ttm", "notna": True},
+    **_ADDED,
+    "isAdded": {"any": [{"rule": "ncav"}, {"rule": "pafcf"}, {"rule": "ev_afcf"}, {"rule": "ptbv"}]},
+}
+
+def _not(mask):
+    return ~mask if isinstance(mask, (pd.Series, np.bool_)) else not mask
+
+def _isin(value, values: list):
+    if isinstance(value, pd.Series):
+        return value.isin(values)
+    return value in values
+
+def _startswith(value, prefixes: list):
+    if isinstance(value, pd.Series):
+        return value.str.startswith(tuple(prefixes), na=False)
+    return isinstance(value, str) and value.startswith(tuple(prefixes))
+
+def _contains(value, parts: list):
+    if isinstance(value, pd.Series):
+        return value.str.contains("|".join(re.escape(i) for i in parts), na=False)
+    return isinstance(value, str) and any(i in value for i in parts)
+
+_OPS = {
+    "gt": lambda value, arg: value > arg,
+    "ge": lambda value, arg: value >= arg,
+    "lt": lambda value, arg: value < arg,
+    "le": lambda value, arg: value <= arg,
+    "eq": lambda value, arg: value == arg,
+    "ne": lambda value, arg: value != arg,
+    "in": _isin,
+    "not_in": lambda value, arg: _not(_isin(value, arg)),
+    "startswith": _startswith,
+    "contains": _contains,
+    "notna": lambda value, arg: pd.notna(value) if arg else pd.isna(value),
+    "isna": lambda value, arg: pd.isna(value) if arg else pd.notna(value),
+}
+
+class Rules:
+    def __init__(self, spec, market_cap: str = "market_cap") -> None:
+        """
+        A declarative screen, compiled once into functions that return boolean masks.
+
+        Every compiled rule accepts either a single row (dict of scalars) or a metric frame,
+        so the same spec gates tickers inside the pipeline and screens a whole universe
+        with vectorized column operations.
+
+        Parameters:
+        - `spec` (dict | str): Rule name -> condition, or the path to a JSON/YAML file holding one.
+        - `market_cap` (str): Field metrics use as the market capitalization. Default is the profile's `market_cap`.
+
+        Returns:
+        - `None`
+        """
+        self.spec = self.load(spec) if isinstance(spec, str) else spec
+        self.market_cap = market_cap
+        self.__rules = {}
+        for name, condition in self.spec.items():
+            self.__rules[name] = self.__compile(condition)
+
+    @staticmethod
+    def load(path: str) -> dict:
+        """
+        Reads a rule spec from a JSON or YAML file.
+
+        Parameters:
+        - `path` (str): Path to the spec. YAML files need PyYAML.
+
+        Returns:
+        - `dict`: The spec.
+        """
+        with open(path, 'r') as file:
+            if path.endswith(('.yaml', '.yml')):
+                import yaml
+                return yaml.safe_load(file)
+            return json.load(file)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__rules
+
+    def __compile(self, condition: dict):
+        if "all" in condition:
+            parts = [self.__compile(i) for i in condition["all"]]
+            def evaluate(data):
+                mask = True
+                for part in parts:
+                    mask = mask & part(data)
+                return mask
+            return evaluate
+        if "any" in condition:
+            parts = [self.__compile(i) for i in condition["any"]]
+            def evaluate(data):
+                mask = False
+                for part in parts:
+                    mask = mask | part(data)
+                return mask
+            return evaluate
+        if "not" in condition:
+            part = self.__compile(condition["not"])
+            return lambda data: _not(part(data))
+        if "rule" in condition:
+            name = condition["rule"]
+            if name not in self.spec:
+                raise ValueError(f"Unknown rule: {name}")
+            return lambda data: self.__rules[name](data)
+        if "field" not in condition:
+            raise ValueError(f"Invalid condition: {condition}")
+        field = condition["field"]
+        digits = condition.get("round")
+        for op in condition:
+            if op not in _OPS and op not in ("field", "round"):
+                raise ValueError(f"Unknown operator: {op}")
+        ops = [(_OPS[op], arg) for op, arg in condition.items() if op in _OPS]
+        def evaluate(data):
+            value = self.__value(data, field)
+            if digits is not None:
+                value = value.round(digits) if isinstance(value, pd.Series) else round(value, digits)
+            mask = True
+            for op, arg in ops:
+                mask = mask & op(value, arg)
+            return mask
+        return evaluate
+
+    def __value(self, data, field: str):
+        if field in data:
+            return data[field]
+        if field in Metrics.METRICS:
+            return Metrics.METRICS[field](data, self.market_cap)
+        return np.nan
+
+    def evaluate(self, name: str, data):
+        """
+        Evaluates one rule.
+
+        Parameters:
+        - `name` (str): The rule's name.
+        - `data` (dict | pd.DataFrame): A single row or a metric frame.
+
+        Returns:
+        - `bool` for a row, or a boolean `pd.Series` for a frame.
+        """
+        mask = self.__rules[name](data)
+        if isinstance(data, pd.DataFrame) and not isinstance(mask, pd.Series):
+            return pd.Series(bool(mask), index=data.index)
+        return bool(mask) if not isinstance(mask, pd.Series) else mask.fillna(False).astype(bool)
+
+    def masks(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Evaluates every rule over a metric frame.
+
+        Parameters:
+        - `data` (pd.DataFrame): A metric frame.
+
+        Returns:
+        - `pd.DataFrame`: One boolean column per rule.
+        """
+        return pd.DataFrame({name: self.evaluate(name, data) for name in self.__rules}, index=data.index)
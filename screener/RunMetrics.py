@@ -0,0 +1,296 @@
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import bisect
+import json
+import time
+import os
+
+# upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+# name -> (type, help) of every metric the screeners record
+METRICS = {
+    "screener_fmp_requests_total": ("counter", "FMP responses received, by endpoint and HTTP status (`error` when no response arrived)."),
+    "screener_fmp_response_bytes_total": ("counter", "Bytes of FMP response bodies, by endpoint."),
+    "screener_fmp_request_seconds": ("histogram", "Latency of FMP requests, by endpoint."),
+    "screener_fmp_throttled_total": ("counter", "Throttled FMP responses (429 or `Limit Reach`), by endpoint."),
+    "screener_fmp_cache_hits_total": ("counter", "Requests answered by the response cache, by endpoint."),
+    "screener_rate_limit_wait_seconds_total": ("counter", "Seconds spent waiting for the rate limit before sending requests."),
+    "screener_retry_wait_seconds_total": ("counter", "Seconds spent backing off before retrying failed requests."),
+    "screener_queue_depth_max": ("gauge", "Largest number of tickers waiting in front of a pipeline stage, by module and stage."),
+    "screener_phase_seconds_total": ("counter", "Wall-clock seconds per phase, by module and phase."),
+    "screener_phase_tickers_in_total": ("counter", "Tickers entering a phase, by module and phase."),
+    "screener_phase_tickers_out_total": ("counter", "Tickers passing a phase, by module and phase."),
+    "screener_batch_seconds": ("histogram", "Wall-clock seconds per screening batch, by module."),
+    "screener_price_update_seconds": ("histogram", "Seconds to bring a ticker's stored closes up to date."),
+    "screener_derived_total": ("counter", "Fields extracted and derived from responses, by kind."),
+    "screener_decode_errors_total": ("counter", "Malformed FMP response bodies and records dropped while decoding, by endpoint."),
+    "screener_loop_lag_seconds": ("histogram", "How late the event loop's heartbeat ran, when profiling."),
+    "screener_loop_blocked_total": ("counter", "Callbacks that blocked the event loop longer than the profiler's threshold."),
+}
+
+_run_metrics = None
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class RunMetrics:
+    def __init__(self) -> None:
+        """
+        Counters, gauges and latency histograms of a screening run.
+
+        The FMP client, the V3 `Handler`, pipelines and screeners record into the
+        process-wide instance (see `get_run_metrics`). At the end of a run the metrics
+        are exported as a JSON run report (`report`, `write_report`) and in the
+        Prometheus text exposition format (`to_prometheus`, `write_prometheus`), e.g.
+        for node_exporter's textfile collector.
+
+        Every metric is identified by its name and labels; the names are listed in `METRICS`.
+
+        Returns:
+        - `None`
+        """
+        self.started = datetime.now(timezone.utc)
+        self.__cpu = time.process_time()
+        self.__clock = time.perf_counter()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {} # name -> labels -> [bucket counts, sum, count]
+        self.phases = []
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Adds `value` to a counter.
+        """
+        series = self.counters.setdefault(name, {})
+        key = _labels(labels)
+        series[key] = series.get(key, 0) + value
+
+    def set_max(self, name: str, value: float, **labels) -> None:
+        """
+        Raises a gauge to `value` if it is lower.
+        """
+        series = self.gauges.setdefault(name, {})
+        key = _labels(labels)
+        series[key] = max(series.get(key, value), value)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """
+        Records a value, e.g. a latency in seconds, in a histogram.
+        """
+        series = self.histograms.setdefault(name, {})
+        histogram = series.setdefault(_labels(labels), [[0] * len(BUCKETS), 0.0, 0])
+        histogram[0][bisect.bisect_left(BUCKETS, value)] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """
+        Records the seconds spent in a `with` block in a histogram.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def record_phase(self, module: str, phase: str, seconds: float, tickers_in: int = None, tickers_out: int = None) -> None:
+        """
+        Records a phase of a screening module.
+
+        Parameters:
+        - `module` (str): The module, e.g. `alpha`.
+        - `phase` (str): The phase, e.g. `profiles` or `stage:cashflow`.
+        - `seconds` (float): Wall-clock seconds the phase took.
+        - `tickers_in` (int): Tickers that entered the phase, if it filters tickers.
+        - `tickers_out` (int): Tickers that passed the phase.
+
+        Returns:
+        - `None`
+        """
+        self.inc("screener_phase_seconds_total", seconds, module=module, phase=phase)
+        if tickers_in is not None:
+            self.inc("screener_phase_tickers_in_total", tickers_in, module=module, phase=phase)
+            self.inc("screener_phase_tickers_out_total", tickers_out, module=module, phase=phase)
+        self.phases.append({"module": module, "phase": phase, "seconds": round(seconds, 3), "tickers_in": tickers_in, "tickers_out": tickers_out})
+
+    def merge(self, other: "RunMetrics") -> None:
+        """
+        Adds the metrics recorded by another process, e.g. a worker of a `ShardedRunner`.
+
+        Parameters:
+        - `other` (RunMetrics): The metrics to add. Counters and histograms are summed, gauges keep the maximum.
+
+        Returns:
+        - `None`
+        """
+        for name, values in other.counters.items():
+            for key, value in values.items():
+                self.inc(name, value, **dict(key))
+        for name, values in other.gauges.items():
+            for key, value in values.items():
+                self.set_max(name, value, **dict(key))
+        for name, values in other.histograms.items():
+            series = self.histograms.setdefault(name, {})
+            for key, (buckets, total, count) in values.items():
+                histogram = series.setdefault(key, [[0] * len(BUCKETS), 0.0, 0])
+                histogram[0] = [a + b for a, b in zip(histogram[0], buckets)]
+                histogram[1] += total
+                histogram[2] += count
+        self.phases.extend(other.phases)
+
+    @staticmethod
+    def quantile(buckets: list[int], q: float) -> float:
+        """
+        Estimates a quantile from histogram bucket counts, interpolating linearly within the bucket.
+
+        Parameters:
+        - `buckets` (list[int]): Non-cumulative counts per bucket of `BUCKETS`.
+        - `q` (float): The quantile, between 0 and 1.
+
+        Returns:
+        - `float`: The estimate, or None if the histogram is empty. Values in the last bucket are reported as its lower bound.
+        """
+        total = sum(buckets)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(buckets):
+            if count and seen + count >= rank:
+                lower = BUCKETS[i - 1] if i else 0.0
+                if BUCKETS[i] == float("inf"):
+                    return lower
+                return lower + (BUCKETS[i] - lower) * (rank - seen) / count
+            seen += count
+        return BUCKETS[-2]
+
+    def report(self) -> dict:
+        """
+        Returns the run report.
+
+        Returns:
+        - `dict`: Start time, wall-clock and CPU seconds, every counter and gauge, every histogram with its cumulative buckets and p50/p95/p99 estimates, and the phases in the order they were recorded.
+        """
+        def series(metrics: dict) -> dict:
+            return {name: [{"labels": dict(k), "value": v} for k, v in values.items()] for name, values in metrics.items()}
+
+        histograms = {}
+        for name, values in self.histograms.items():
+            histograms[name] = []
+            for key, (buckets, total, count) in values.items():
+                cumulative, running = {}, 0
+                for bound, n in zip(BUCKETS, buckets):
+                    running += n
+                    cumulative[_format(bound)] = running
+                histograms[name].append({
+                    "labels": dict(key), "count": count, "sum": round(total, 6), "buckets": cumulative,
+                    **{f"p{int(q * 100)}": self.quantile(buckets, q) for q in (0.5, 0.95, 0.99)}})
+        return {
+            "started": self.started.isoformat(timespec="seconds"),
+            "wall_seconds": round(time.perf_counter() - self.__clock, 3),
+            "cpu_seconds": round(time.process_time() - self.__cpu, 3),
+            "counters": series(self.counters),
+            "gauges": series(self.gauges),
+            "histograms": histograms,
+            "phases": self.phases,
+        }
+
+    def to_prometheus(self) -> str:
+        """
+        Formats every metric in the Prometheus text exposition format.
+
+        Returns:
+        - `str`: The exposition, including the run's wall-clock and CPU seconds.
+        """
+        lines = []
+
+        def header(name: str, kind: str, help: str) -> None:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def sample(name: str, labels: tuple, value) -> None:
+            escaped = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            lines.append(f"{name}{{{escaped}}} {_format(value)}" if escaped else f"{name} {_format(value)}")
+
+        report = self.report()
+        header("screener_run_wall_seconds", "gauge", "Wall-clock seconds since the run started.")
+        sample("screener_run_wall_seconds", (), report["wall_seconds"])
+        header("screener_run_cpu_seconds", "gauge", "CPU seconds the process used since the run started.")
+        sample("screener_run_cpu_seconds", (), report["cpu_seconds"])
+        for metrics in (self.counters, self.gauges):
+            for name, values in sorted(metrics.items()):
+                header(name, *METRICS.get(name, ("untyped", name)))
+                for key, value in sorted(values.items()):
+                    sample(name, key, value)
+        for name, values in sorted(self.histograms.items()):
+            header(name, *METRICS.get(name, ("histogram", name)))
+            for key, (buckets, total, count) in sorted(values.items()):
+                running = 0
+                for bound, n in zip(BUCKETS, buckets):
+                    running += n
+                    sample(f"{name}_bucket", key + (("le", _format(bound)),), running)
+                sample(f"{name}_sum", key, total)
+                sample(f"{name}_count", key, count)
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path: str) -> None:
+        """
+        Writes the JSON run report.
+
+        Parameters:
+        - `path` (str): Path of the JSON file.
+
+        Returns:
+        - `None`
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent=2)
+
+    def write_prometheus(self, path: str) -> None:
+        """
+        Writes the Prometheus exposition, replacing the file atomically so a collector never reads half of it.
+
+        Parameters:
+        - `path` (str): Path of the `.prom` file.
+
+        Returns:
+        - `None`
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", 'w') as file:
+            file.write(self.to_prometheus())
+        os.replace(path + ".tmp", path)
+
+def get_run_metrics() -> RunMetrics:
+    """
+    Returns the process-wide metrics every component records into.
+
+    Returns:
+    - `RunMetrics`: The shared instance, created on first use.
+    """
+    global _run_metrics
+    if _run_metrics is None:
+        _run_metrics = RunMetrics()
+    return _run_metrics
+
+def reset_run_metrics() -> RunMetrics:
+    """
+    Starts recording into fresh shared metrics.
+
+    Returns:
+    - `RunMetrics`: The metrics recorded so far.
+    """
+    global _run_metrics
+    previous, _run_metrics = get_run_metrics(), RunMetrics()
+    return previous
@@ -0,0 +1,180 @@
+from collections.abc import Mapping
+from .FMPClient import FMPClient
+import asyncio
+import json
+
+# endpoints that take comma-separated tickers and answer one object per `symbol`
+BATCHED_ENDPOINTS = {"v3/profile"}
+
+class SharedFetch:
+    def __init__(self, client: FMPClient = None) -> None:
+        """
+        One fetch layer for several modules screening in the same run.
+
+        Every request (endpoint, ticker and query parameters) is sent at most once:
+        its response is kept for the rest of the run, and callers asking for a request
+        that is already in flight wait for it instead of sending their own
+        (single-flight). Comma-batched profile requests are split by ticker, so two
+        modules batching overlapping universes differently still share profiles.
+        Failures that may succeed later (`FMPRequestError`) are passed to every waiter
+        but not kept.
+
+        Values derived from a response (e.g. NCAV, the FCF average) are kept per
+        ticker too, see `derive`. Anything else is passed on to `client`, so a
+        `SharedFetch` can be handed to any module in place of an `FMPClient`.
+
+        Parameters:
+        - `client` (FMPClient | BulkClient): Client the requests are sent with. Defaults to a new `FMPClient`.
+
+        Returns:
+        - `None`
+        """
+        self.client = client or FMPClient()
+        self.stats = {"fetched": 0, "deduplicated": 0, "coalesced": 0, "derived": 0, "derived_reused": 0}
+        self.__responses = {}
+        self.__inflight = {}
+        self.__batched = {} # (endpoint, params) -> ticker -> object, None if the API doesn't know the ticker
+        self.__derived = {}
+
+    @property
+    def rate_limiter(self):
+        return self.client.rate_limiter
+
+    @property
+    def keys(self):
+        return self.client.keys
+
+    @property
+    def api_key(self):
+        return self.client.api_key
+
+    async def __aenter__(self) -> "SharedFetch":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def __single_flight(self, key, fetch):
+        if key in self.__inflight:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(self.__inflight[key])
+        future = asyncio.get_running_loop().create_future()
+        self.__inflight[key] = future
+        try:
+            data = await fetch()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception() # don't warn when nobody else was waiting
+            raise
+        else:
+            future.set_result(data)
+            return data
+        finally:
+            del self.__inflight[key]
+
+    async def get_json(self, path: str, **params):
+        """
+        Returns the response of a request, sending it only if no module of the run did.
+
+        Parameters:
+        - `path` (str): Endpoint path below `/api`, e.g. `v3/profile/AAPL` or `v3/profile/AAPL,MSFT`.
+        - `params` (dict): Query parameters.
+
+        Returns:
+        - The decoded JSON response, as `FMPClient.get_json` returns it.
+
+        Raises:
+        - `FMPRequestError`: If the request still fails with a transient error after every retry.
+        """
+        endpoint, _, tickers = path.rpartition('/')
+        if endpoint in BATCHED_ENDPOINTS:
+            return await self.__get_batched(endpoint, list(dict.fromkeys(tickers.split(','))), params)
+        key = (path, json.dumps(params, sort_keys=True, default=str))
+        if key in self.__responses:
+            self.stats["deduplicated"] += 1
+            return self.__responses[key]
+
+        async def fetch():
+            data = await self.client.get_json(path, **params)
+            self.stats["fetched"] += 1
+            self.__responses[key] = data
+            return data
+        return await self.__single_flight(key, fetch)
+
+    async def __get_batched(self, endpoint: str, tickers: list[str], params: dict) -> list:
+        query = json.dumps(params, sort_keys=True, default=str)
+        known = self.__batched.setdefault((endpoint, query), {})
+        missing = [ticker for ticker in tickers if ticker not in known and (endpoint, query, ticker) not in self.__inflight]
+        waiting = [self.__inflight[(endpoint, query, ticker)] for ticker in tickers if (endpoint, query, ticker) in self.__inflight]
+        self.stats["deduplicated"] += sum(1 for ticker in tickers if ticker in known)
+        self.stats["coalesced"] += len(waiting)
+        if missing:
+            future = asyncio.get_running_loop().create_future()
+            for ticker in missing:
+                self.__inflight[(endpoint, query, ticker)] = future
+            try:
+                data = await self.client.get_json(f"{endpoint}/{','.join(missing)}", **params)
+                self.stats["fetched"] += 1
+                if isinstance(data, list):
+                    requested = set(missing)
+                    for item in data:
+                        if isinstance(item, Mapping) and item.get("symbol") in requested:
+                            known[item["symbol"]] = item
+                    for ticker in missing:
+                        known.setdefault(ticker, None)
+                future.set_result(None)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                future.set_exception(e)
+                future.exception()
+                raise
+            finally:
+                for ticker in missing:
+                    del self.__inflight[(endpoint, query, ticker)]
+        for future in set(waiting):
+            await asyncio.shield(future)
+        if not any(ticker in known for ticker in tickers):
+            return None
+        return [known[ticker] for ticker in tickers if known.get(ticker) is not None]
+
+    def derive(self, kind: str, ticker: str, compute) -> dict:
+        """
+        Returns the values derived from one of a ticker's responses, computing them only once per run.
+
+        Parameters:
+        - `kind` (str): Name of the derivation, e.g. `cashflow`.
+        - `ticker` (str): The stock ticker symbol.
+        - `compute` (callable): Computes the values if no module did yet.
+
+        Returns:
+        - `dict`: The derived values. Shared between modules, so callers copy rather than modify it.
+        """
+        key = (kind, ticker)
+        if key in self.__derived:
+            self.stats["derived_reused"] += 1
+        else:
+            self.stats["derived"] += 1
+            self.__derived[key] = compute()
+        return self.__derived[key]
+
+    async def download(self, *args, **kwargs) -> bool:
+        return await self.client.download(*args, **kwargs)
+
+    def get_stats(self) -> dict:
+        """
+        Returns the underlying client's statistics plus how many requests and derivations were shared.
+
+        Returns:
+        - `dict`: The client's counters and the `fetched`, `deduplicated`, `coalesced`, `derived` and `derived_reused` counters.
+        """
+        stats = self.client.get_stats()
+        stats.update({f"shared_{k}": v for k, v in self.stats.items()})
+        return stats
+
+    async def close(self) -> None:
+        await self.client.close()
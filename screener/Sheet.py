@@ -1,12 +1,57 @@
 from datetime import datetime
+from .SheetWriter import SheetWriter
 import gspread
-from time import sleep
+import json
+import os
 import re
 
+HEADER = ["Ticker", "Company Name", "NCAV Ratio", "Payback Rating", "Average Yield", "HQ Country", "Exchange Country"]
+HEADER_V2 = ["Ticker", "Company Name", "NCAV Ratio",  "EV/aFCF", "P/TBV Ratio", "Enterprise Value", "P/aFCF Ratio", "Country"]
+
+def read_seen_tickers(file: gspread.Spreadsheet, worksheets: list[gspread.Worksheet], writer: SheetWriter, cache_path: str) -> set[str]:
+    """
+    Reads the tickers (column A) of many tabs with a single `values_batch_get` request.
+
+    Tabs other than the newest one no longer change, so their tickers are cached in
+    `cache_path` by tab title and only read again if the cache doesn't know them.
+
+    Parameters:
+    - `file` (gspread.Spreadsheet): The spreadsheet.
+    - `worksheets` (list[gspread.Worksheet]): The tabs to read, oldest first.
+    - `writer` (SheetWriter): Writer whose rate limiter and retries the request goes through.
+    - `cache_path` (str): Path to the JSON cache of tab title -> tickers.
+
+    Returns:
+    - `set[str]`: Every ticker found in the tabs.
+    """
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r') as cache_file:
+            cache = json.load(cache_file)
+    titles = [sheet.title for sheet in worksheets]
+    newest = titles[-1:]
+    missing = [title for title in titles if title not in cache or title in newest]
+    if missing:
+        ranges = ["'{}'!A2:A1000".format(title.replace("'", "''")) for title in missing]
+        try:
+            res = writer.request(file.values_batch_get, ranges)
+        except gspread.exceptions.APIError as e:
+            print(f"Unable to read previously seen tickers: {e}")
+            res = {}
+        for title, value_range in zip(missing, res.get("valueRanges", [])):
+            cache[title] = [row[0] for row in value_range.get("values", []) if row and row[0]]
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        with open(cache_path, 'w') as cache_file:
+            json.dump({title: cache[title] for title in titles if title in cache}, cache_file)
+    return {ticker for title in titles for ticker in cache.get(title, [])}
+
 class Sheet:
-    def __init__(self, sheet_path:str = "./service_account.json", file_name:str = 'Screener') -> None:
+    def __init__(self, sheet_path:str = "./service_account.json", file_name:str = 'Screener', diff_only: bool = False, seen_cache_dir: str = "./data/sheets") -> None:
         self.service_account = gspread.service_account(filename = sheet_path)
         self.file = self.service_account.open(file_name)
+        self.writer = SheetWriter(diff_only=diff_only)
+        self.seen_cache_path = os.path.join(seen_cache_dir, f"{file_name}_seen.json")
+        self.__worksheet = None
         self.today = datetime.now()
         self._was_sheet_added_today = False
         self.month_dict = {
@@ -37,63 +82,21 @@ class Sheet:
             return date_str
         return None
     
-    def __add_header(self) -> None:
-        sheet = self.__get_worksheet_names()[-1]
-        sheet.append_row(values= ["Ticker", "Company Name", "NCAV Ratio", "Payback Rating", "Average Yield", "HQ Country", "Exchange Country"],table_range='A1:G1')
-
-    def __add_alpha_header(self) -> None:
-        sheet = self.__get_worksheet_names()[-1]
-        sheet.append_row(values= ["Ticker", "Company Name",  "FV Upside", "5Y Price Metric", " ", "NCAV Ratio","EV/aFCF", "Payback Rating", "Average Yield", "HQ Country"],table_range='A1:J1')
-
-    def __add_beta_header(self) -> None:
-        sheet = self.__get_worksheet_names()[-1]
-        sheet.append_row(values= ["Ticker", "Company Name", "NCAV Ratio",  "EV/aFCF", "P/TBV Ratio", "HQ Location", " ", "FV Upside", "5Y Price Metric"],table_range='A1:I1')
-    
-    def __add_header_v2(self) -> None:
-        sheet = self.__get_worksheet_names()[-1]
-        sheet.append_row(values= ["Ticker", "Company Name", "NCAV Ratio",  "EV/aFCF", "P/TBV Ratio", "Enterprise Value", "P/aFCF Ratio", "Country"],table_range='A1:G1')
+    def __target(self) -> gspread.Worksheet:
+        # the tab created by this run, or the most recent one if it already existed
+        if self.__worksheet is None:
+            self.__worksheet = self.__get_worksheet_names()[-1]
+        return self.__worksheet
     
     def add_row_data(self, data: dict) -> None:
-        sheet = self.__get_worksheet_names()[-1]
-        itr = 2
-        for k, v in data.items():
-            payload = [k, str(v['Name']), v["NCAV Ratio"], v["Payback Rating"], v["5Y average"], str(v['HQ Location']), v["Exchange Location"]]
-            sheet.append_row(values= payload, table_range=f'A{itr}:G{itr}')
-            itr+=1
-
+        rows = [[k, str(v['Name']), v["NCAV Ratio"], v["Payback Rating"], v["5Y average"], str(v['HQ Location']), v["Exchange Location"]] for k, v in data.items()]
+        self.writer.write(self.__target(), [HEADER] + rows)
         print("data added to spreadsheet.")
     
     def add_row_data_v2(self, data: dict) -> None:
-        sheet = self.__get_worksheet_names()[-1]
-        itr = 2
-        for k, v in data.items():
-            payload = [k, str(v['Name']), v["NCAV Ratio"], v["EV/aFCF"], v["P/TBV Ratio"], v["EV"], v["P/aFCF Ratio"],str(v['Country'])]
-            sheet.append_row(values= payload, table_range=f'A{itr}:G{itr}')
-            itr+= 1
-            sleep(2)
-            # if itr % 30 == 0:
-            #     print("Waiting 60 seconds to avoid exceeding API limit.")
-            #     sleep(60)
-
-        print(f"{itr-2} companies added to spreadsheet.")
-    
-    def add_alpha_row_data(self, data: dict):
-        sheet = self.__get_worksheet_names()[-1]
-        itr = 2
-        for k, v in data.items():
-            payload = [k, str(v['Name']), f"{v['FV Upside Metric']}%", f"{v['5Y Price Metric']}%", " ", v["NCAV Ratio"], v["EV/aFCF"], v["Payback Rating"], v["5Y average"], str(v['HQ Location'])]
-            sheet.append_row(values= payload, table_range=f'A{itr}:J{itr}')
-            itr+= 1
-            sleep(2)
-    
-    def add_beta_row_data(self, data: dict):
-        sheet = self.__get_worksheet_names()[-1]
-        itr = 2
-        for k, v in data.items():
-            payload = [k, str(v['Name']), v["NCAV Ratio"], v["EV/aFCF"], v["P/TBV Ratio"], str(v['HQ Location']), " ", f"{v['FV Upside Metric']}%", f"{v['5Y Price Metric']}%"]
-            sheet.append_row(values= payload, table_range=f'A{itr}:I{itr}')
-            itr+= 1
-            sleep(2)
+        rows = [[k, str(v['Name']), v["NCAV Ratio"], v["EV/aFCF"], v["P/TBV Ratio"], v["EV"], v["P/aFCF Ratio"],str(v['Country'])] for k, v in data.items()]
+        self.writer.write(self.__target(), [HEADER_V2] + rows)
+        print(f"{len(rows)} companies added to spreadsheet.")
     
     def get_all_worksheets(self) -> list[gspread.Worksheet]:
         try:
@@ -104,8 +107,7 @@ class Sheet:
     def create_new_tab(self) -> None:
         try:
             name = f"{self.today.day}-{self.month_dict[self.today.month]}-{self.today.year}"
-            self.file.add_worksheet(title = name, rows = 0, cols = 0)
-            self.__add_header()
+            self.__worksheet = self.file.add_worksheet(title = name, rows = 0, cols = 0)
             print(f"Sheet {name} added.")
             self._was_sheet_added_today = True
         except:
@@ -114,8 +116,7 @@ class Sheet:
     def create_alpha_module_tab(self):
         try:
             name = f"{self.today.day}-{self.month_dict[self.today.month]}-{self.today.year}"
-            self.file.add_worksheet(title = name, rows = 0, cols = 0)
-            self.__add_alpha_header()
+            self.__worksheet = self.file.add_worksheet(title = name, rows = 0, cols = 0)
             print(f"Sheet {name} added.")
             self._was_sheet_added_today = True
         except:
@@ -124,8 +125,7 @@ class Sheet:
     def create_beta_module_tab(self):
         try:
             name = f"{self.today.day}-{self.month_dict[self.today.month]}-{self.today.year}"
-            self.file.add_worksheet(title = name, rows = 0, cols = 0)
-            self.__add_beta_header()
+            self.__worksheet = self.file.add_worksheet(title = name, rows = 0, cols = 0)
             print(f"Sheet {name} added.")
             self._was_sheet_added_today = True
         except:
@@ -134,8 +134,7 @@ class Sheet:
     def create_new_tab_v2(self) -> None:
         try:
             name = f"{self.today.day}-{self.month_dict[self.today.month]}-{self.today.year}"
-            self.file.add_worksheet(title = name, rows = 0, cols = 0)
-            self.__add_header_v2()
+            self.__worksheet = self.file.add_worksheet(title = name, rows = 0, cols = 0)
             print(f"Sheet {name} added.")
             self._was_sheet_added_today = True
         except:
@@ -152,24 +151,8 @@ class Sheet:
         except:
             return []
     
-    def get_all_previously_seen_tickers(self) -> list[str]:
+    def get_all_previously_seen_tickers(self) -> set[str]:
         '''
         Returns all tickers seen in the last year (52 weeks).
         '''
-        seen = []
-        sheets = []
-        all_sheets = self.get_all_worksheets()
-        weeks = len(all_sheets)
-        if weeks > 52:
-            sheets = all_sheets[-52:]
-        else:
-            sheets = all_sheets
-        try:
-            for sheet in sheets:
-                seen.append(sheet.get_values("A2:A1000"))
-        except:
-            print("Google Sheets API limit exceeded. Waiting 30 seconds before trying again.")
-            sleep(31)
-            self.get_all_previously_seen_tickers()
-        
-        return [i[0] for sub in seen for i in sub if i]
+        return read_seen_tickers(self.file, self.get_all_worksheets()[-52:], self.writer, self.seen_cache_path)
@@ -0,0 +1,146 @@
+from .RateLimiter import RateLimiter
+from gspread.exceptions import APIError
+from gspread.utils import rowcol_to_a1, ValueRenderOption
+from time import sleep
+import math
+
+# Google Sheets allows 60 write requests per minute per user
+SHEETS_WRITES_PER_MINUTE = 60
+
+# cells sent in a single request, well below the API's recommended 2 MB payload
+MAX_CELLS = 40_000
+
+_sheets_limiter = None
+
+def get_sheets_limiter() -> RateLimiter:
+    """
+    Returns the process-wide Google Sheets rate limiter.
+
+    Returns:
+    - `RateLimiter`: The shared limiter.
+    """
+    global _sheets_limiter
+    if _sheets_limiter is None:
+        _sheets_limiter = RateLimiter(SHEETS_WRITES_PER_MINUTE, 60.0)
+    return _sheets_limiter
+
+def _cell(value):
+    # metrics that couldn't be computed are NaN, which the Sheets API rejects
+    if hasattr(value, "item"): # numpy scalars
+        value = value.item()
+    return "N/A" if isinstance(value, float) and math.isnan(value) else value
+
+def _same(old, new) -> bool:
+    if isinstance(old, (int, float)) and isinstance(new, (int, float)) and not isinstance(new, bool):
+        return float(old) == float(new)
+    return str(old) == str(new)
+
+class SheetWriter:
+    def __init__(self, rate_limiter: RateLimiter = None, max_cells: int = MAX_CELLS, diff_only: bool = False, retries: int = 3) -> None:
+        """
+        Writes a whole table to a worksheet in as few Sheets API requests as possible.
+
+        The table goes out as one `update` call, split into row chunks only when it has
+        more than `max_cells` cells. Requests wait on a rate limiter sized to the Sheets
+        write quota, and a request that is throttled anyway is retried after a backoff.
+
+        In diff-only mode the worksheet is read once and only the cells that changed
+        are sent, as one `batch_update` of row ranges; cells left over from a longer
+        previous table are cleared.
+
+        Parameters:
+        - `rate_limiter` (RateLimiter): Limiter awaited before every request. Defaults to the shared Sheets limiter.
+        - `max_cells` (int): Maximum number of cells per request. Default is 40,000.
+        - `diff_only` (bool): If True, only changed cells are written. Default is False.
+        - `retries` (int): Retries of a throttled request. Default is 3.
+
+        Returns:
+        - `None`
+        """
+        self.rate_limiter = rate_limiter or get_sheets_limiter()
+        self.max_cells = max_cells
+        self.diff_only = diff_only
+        self.retries = retries
+        self.requests = 0
+
+    def request(self, method, *args, **kwargs):
+        """
+        Sends one Sheets API request through the rate limiter, retrying it if it is throttled.
+
+        Parameters:
+        - `method` (callable): The gspread method to call.
+        - `args`, `kwargs`: Its arguments.
+
+        Returns:
+        - The method's return value.
+        """
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.acquire_sync()
+            self.requests += 1
+            try:
+                return method(*args, **kwargs)
+            except APIError as e:
+                if attempt == self.retries or getattr(e, "code", None) != 429:
+                    raise
+                sleep(self.rate_limiter.period / 2 * 2 ** attempt)
+
+    def write(self, worksheet, values: list[list]) -> int:
+        """
+        Writes a table starting at `A1`.
+
+        Parameters:
+        - `worksheet` (gspread.Worksheet): The target worksheet.
+        - `values` (list[list]): The rows, header included.
+
+        Returns:
+        - `int`: The number of cells written.
+        """
+        width = max((len(row) for row in values), default=0)
+        values = [[_cell(i) for i in row] + [""] * (width - len(row)) for row in values]
+        if not values or not width:
+            return 0
+        if self.diff_only:
+            return self.__write_diff(worksheet, values, width)
+        self.__fit(worksheet, len(values), width)
+        rows = max(1, self.max_cells // width)
+        for start in range(0, len(values), rows):
+            self.request(worksheet.update, values[start:start + rows], rowcol_to_a1(start + 1, 1))
+        return len(values) * width
+
+    def __fit(self, worksheet, rows: int, cols: int) -> None:
+        # unlike append_row, update doesn't grow the grid
+        if worksheet.row_count < rows or worksheet.col_count < cols:
+            self.request(worksheet.resize, max(rows, worksheet.row_count), max(cols, worksheet.col_count))
+
+    def __write_diff(self, worksheet, values: list[list], width: int) -> int:
+        old = self.request(worksheet.get_values, value_render_option=ValueRenderOption.unformatted)
+        old_width = max((len(row) for row in old), default=0)
+        cols = max(width, old_width)
+        ranges = []
+        for r in range(max(len(values), len(old))):
+            new_row = values[r] if r < len(values) else []
+            old_row = old[r] if r < len(old) else []
+            new_row = new_row + [""] * (cols - len(new_row))
+            old_row = old_row + [""] * (cols - len(old_row))
+            run = None # first column of the current run of changed cells
+            for c in range(cols + 1):
+                changed = c < cols and not _same(old_row[c], new_row[c])
+                if changed and run is None:
+                    run = c
+                elif not changed and run is not None:
+                    ranges.append({"range": f"{rowcol_to_a1(r + 1, run + 1)}:{rowcol_to_a1(r + 1, c)}", "values": [new_row[run:c]]})
+                    run = None
+        if not ranges:
+            return 0
+        self.__fit(worksheet, len(values), width)
+        batch, cells, written = [], 0, 0
+        for i in ranges:
+            size = len(i["values"][0])
+            if batch and cells + size > self.max_cells:
+                self.request(worksheet.batch_update, batch)
+                batch, cells = [], 0
+            batch.append(i)
+            cells += size
+            written += size
+        self.request(worksheet.batch_update, batch)
+        return written
@@ -1,15 +1,22 @@
 import asyncio
 from screener.AsyncScreener import AsyncScreener
+from screener.FMPClient import FMPClient
+from screener.ResponseCache import ResponseCache
 
 ticker_path = "./data/cleaned_tickers.json"
 service_account_path = "./screener/service_account.json"
 sheet_name = "Screener"
+cache_path = "./data/fmp_cache.sqlite"
 
 
 async def main() -> None:
-    screener = AsyncScreener(ticker_path, service_account_path, sheet_name)
-    await screener.run_async()
+    cache = ResponseCache(cache_path)
+    async with FMPClient(cache=cache) as client:
+        print(f"{await cache.sync_filings(client)} stored statements invalidated by new filings.")
+        screener = AsyncScreener(ticker_path, service_account_path, sheet_name, client=client)
+        await screener.run_async()
     screener.update_google_sheet()
+    cache.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -1,13 +1,20 @@
 import asyncio
 from screener.AsyncScreener2 import AsyncScreener2
+from screener.FMPClient import FMPClient
+from screener.ResponseCache import ResponseCache
 
 service_account = './screener/service_account.json'
 path = './data/non_banking_tickers.json'
+cache_path = './data/fmp_cache.sqlite'
 
 async def main() -> None:
-    screener2 =  AsyncScreener2(path, sheet_path = service_account)
-    await screener2.run_async(batch_size= 75)
+    cache = ResponseCache(cache_path)
+    async with FMPClient(cache = cache) as client:
+        print(f"{await cache.sync_filings(client)} stored statements invalidated by new filings.")
+        screener2 =  AsyncScreener2(path, sheet_path = service_account, client = client, stream = True)
+        await screener2.run_async(batch_size= 75)
     screener2.update_google_sheet()
+    cache.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
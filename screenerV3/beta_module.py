@@ -2,24 +2,48 @@ from dotenv import load_dotenv
 import pandas as pd
 from .sheet import Sheet
 from .utilities import Handler
-from time import sleep
-import aiohttp
-import os
+from .pipeline import Pipeline, Stage
+from .planner import Planner
+from screener.FMPClient import FMPClient, FMPRequestError
+from screener.BulkClient import BULK_FIELDS
+from screener.Journal import Journal
+from screener.Profiler import mark_phase
+from screener.Results import Results
+from screener import Metrics
+from screener.Rules import Rules, BETA_RULES
+import asyncio
+import time
 
 load_dotenv()
 
 
 class BetaModule:
-    def __init__(self, ticker_path: str, sheet_path:str = "./service_account.json", sheet_name: str = "V2 Screener") -> None:
-        self.sheet_client = Sheet(sheet_path= sheet_path, file_name=sheet_name)
-        self.handler = Handler()
-        self.tickers = self.handler.process_tickers(self.sheet_client, ticker_path)
+    def __init__(self, ticker_path: str, sheet_path:str = "./service_account.json", sheet_name: str = "V2 Screener", client: FMPClient = None, rules = None, checkpoint_path: str = "./data/checkpoints/beta_module.jsonl", plan_path: str = "./data/plans/beta_module.json", tickers: dict = None, floats = None) -> None:
+        # `tickers` is an already filtered universe, e.g. one shard of a `ShardedRunner`: no sheet is opened
+        self.sheet_client = Sheet(sheet_path= sheet_path, file_name=sheet_name) if tickers is None else None
+        self.handler = Handler(client)
+        self.__owns_client = client is None
+        self.tickers = self.handler.process_tickers(self.sheet_client, ticker_path) if tickers is None else tickers
         self.profile_fstr_arr = self.__format_request_str(1000)
         self.hist_fstr_arr = self.__format_request_str(300)
-        self.key = os.environ['FMP_KEY']
-        self.results = {}
-        self.floats = None
+        self.results = Results()
+        self.floats = floats
+        self.journal = Journal(checkpoint_path)
+        self.planner = Planner(plan_path)
+        self.timings = {}
+        self.rules = Rules(rules or BETA_RULES)
            
+    def __record_phase(self, phase: str, seconds: float, tickers_in: int = None, tickers_out: int = None) -> None:
+        self.timings[phase] = seconds
+        self.handler.metrics.record_phase("beta", phase, seconds, tickers_in, tickers_out)
+
+    def __time(self, phase: str, started: float, tickers_in: int = None, tickers_out: int = None) -> float:
+        # records the wall-clock seconds of a phase that started at `started`, returns when the next phase starts
+        now = time.perf_counter()
+        self.__record_phase(phase, now - started, tickers_in, tickers_out)
+        mark_phase("beta", phase)
+        return now
+
     def __get_ticker_count(self) -> int:
         num = 0
         for k, v in self.tickers.items():
@@ -58,206 +82,258 @@ class BetaModule:
         Returns:
         - `int`: The number of outstanding shares, or 0 if not found.
         """
-        for v in self.floats:
-            if v['symbol'] == ticker:
-                return v['outstandingShares']
-        
-        return 0 # if ticker can't be found, return 0
+        return self.floats.get(ticker)
     
-    def __check_reqs(self, requests_sent:int) -> None:
-        if requests_sent % 299 == 0:
-            print("Sleeping for 55 seconds to avoid hitting API limit.")
-            sleep(55)
-    
-    def __clean_results(self, d:dict):
-        ret = {}
-        rem = 0
-        for k, v in d.items():
-            try:
-                if v["Net Debt"] > 0:
-                    rem +=1
-                    continue # screen out stocks with net debt
-                elif v["isAdded"]:
-                    ret[k] = v
-            except:
-                rem+=1
-                continue 
-        
-        for k, v in ret.items():
-            try:
-                if v["EV/aFCF"] == "N/A":
-                    v["EV/aFCF"] = 1
-            except:
-                continue
-        
-        print(f"{rem}/{len(d.keys())} stocks removed during cleaning.")
+    def __clean_results(self, d: Results) -> Results:
+        # screen out stocks with net debt and those the rules didn't add
+        ret = d.filter(~(d.column("Net Debt") > 0) & d.column("isAdded", False).astype(bool))
+        print(f"{len(d) - len(ret)}/{len(d)} stocks removed during cleaning.")
         return ret
     
+    def merge_results(self, parts: list[Results]) -> Results:
+        """
+        Merges the results of several shards of the universe, in the given order, and sorts them as a single run would.
+
+        Parameters:
+        - `parts` (list[Results]): The `results` of every shard.
+
+        Returns:
+        - `Results`: The merged results.
+        """
+        self.results = Results.concat(parts)
+        self.__sort_results()
+        return self.results
+
     def __sort_results(self) -> None:
         # sort first on NCAV (lowest -> highest)
         # second on upside (highest -> lowest)
-        self.results = dict(sorted(self.results.items(), key=lambda x: (x[1]["P/TBV Ratio"], x[1]["FV Upside Metric"])))
+        self.results = self.results.sort("P/TBV Ratio", "FV Upside Metric")
        
-    async def run_async(self, debug:bool=False) -> dict:
+    async def __get_key_metrics_and_cashflow(self, ticker: str) -> tuple:
+        return await asyncio.gather(self.handler.get_key_metrics(ticker), self.handler.get_cashflow(ticker))
+
+    def __screen_balance_sheet(self, ticker: str, v: dict, bs: list) -> bool:
+        v.update(self.handler.fields("balance_sheet", ticker, bs))
+        return self.rules.evaluate("balance_sheet", v)
+
+    def __screen_key_metrics_and_cashflow(self, ticker: str, v: dict, payload: tuple) -> bool:
+        km, cf = payload
+        v.update(self.handler.fields("key_metrics", ticker, km))
+        v.update(self.handler.fields("cashflow", ticker, cf))
+        v['shares'] = self.__find_float_from_ticker(ticker)
+        return self.rules.evaluate("key_metrics_cashflow", v)
+
+    def __screen_historical(self, ticker: str, v: dict, hist: dict) -> bool:
+        v.update(hist)
+        return self.rules.evaluate("historical", v)
+
+    def __screen_fv_upside(self, ticker: str, v: dict, payload = None) -> bool:
+        return self.rules.evaluate("fv_upside", v)
+
+    def __format_results(self, stk_res: dict) -> dict:
+        """
+        Computes the reported metrics of every surviving ticker at once over a columnar frame.
+
+        Parameters:
+        - `stk_res` (dict): Ticker -> record holding the Phase I fields and the raw fields collected by the pipeline.
+
+        Returns:
+        - `Results`: The reported fields of every ticker.
+        """
+        if not stk_res:
+            return Results()
+        frame = Metrics.compute(Metrics.to_frame(stk_res))
+        masks = self.rules.masks(frame)
+        results = pd.DataFrame({
+            "Name": frame["Name"],
+            "Market Cap": frame["Market Cap"],
+            "HQ Location": frame["HQ Location"],
+            "Exchange Location": frame["Exchange Location"],
+            "Industry": frame["Industry"],
+            "Net Debt": frame["net_debt"],
+            "NCAV Ratio": frame["ncav_ratio"].round(1).where(masks["ncav"], 1),
+            "isAdded": masks["isAdded"],
+            "5Y average": frame["fcf_average_ttm"],
+            "Cash & Equivalents": frame["cash"],
+            "P/aFCF Ratio": frame["pafcf"].round(1),
+            "EV": frame["ev_ttm"].round().astype(int),
+            "EV/aFCF": frame["ev_afcf"].round(1).where(masks["ev_afcf"], 100),
+            "P/TBV Ratio": frame["ptbv"].round().astype(int),
+            "5Y Price Metric": frame["price_metric"].round().astype(int),
+            "Current Price": frame["close"].round(2),
+            "5Y Max": frame["max_close"].round(2),
+            "FV Upside Metric": frame["fv_upside_ttm"].round().astype(int),
+        })
+        return Results.from_frame(results)
+
+    def __screen_profiles(self, profiles: dict) -> dict:
+        """
+        Phase I: screens every profile at once with the `profile` rule.
+
+        Parameters:
+        - `profiles` (dict): Symbol -> profile.
+
+        Returns:
+        - `dict`: Symbol -> record of the profiles that passed.
+        """
+        if not profiles:
+            return {}
+        rows = {symbol: Metrics.new_row(**Metrics.profile_fields(profile)) for symbol, profile in profiles.items()}
+        keep = self.rules.evaluate("profile", Metrics.to_frame(rows))
         stk_res = {}
-        blacklist = ["CN", "HK"]
-        issues = []
-        requests_sent = 2
+        for symbol, profile in profiles.items():
+            if not keep[symbol]:
+                continue
+            row = rows[symbol]
+            stk_res[symbol] = {
+                "Name": profile["companyName"],
+                "Market Cap": profile['mktCap'],
+                "HQ Location": profile["country"],
+                "Exchange Location": profile["exchange"],
+                "Industry": profile["industry"],
+                **Metrics.new_row(market_cap=row["market_cap"], last_div=row["last_div"])
+            }
+        return stk_res
+
+    async def __get_profiles(self, retry_delay: float, checkpoint: list[list] = None) -> list[list]:
+        """
+        Requests the profiles for every comma-batched ticker string.
+
+        Batches that are still throttled after the client's retries are deferred and
+        requested once more after `retry_delay` seconds. The profiles are journaled so
+        a resumed run doesn't request them again.
+
+        Parameters:
+        - `retry_delay` (float): Seconds to wait before retrying deferred batches.
+        - `checkpoint` (list[list]): Journaled profiles of an interrupted run, returned as is.
+
+        Returns:
+        - `list[list]`: The profile responses.
+        """
+        if checkpoint is not None:
+            return checkpoint
+        responses = []
+        deferred = []
+        for string in self.profile_fstr_arr:
+            try:
+                res = await self.handler.get_profile(string)
+            except FMPRequestError:
+                deferred.append(string)
+                continue
+            if res is not None:
+                responses.append(res)
+        if deferred:
+            print(f"Retrying {len(deferred)} deferred profile batches in {retry_delay} seconds...")
+            await asyncio.sleep(retry_delay)
+            for string in deferred:
+                try:
+                    res = await self.handler.get_profile(string)
+                except FMPRequestError as e:
+                    print(f"Profiles could not be fetched: {e}")
+                    continue
+                if res is not None:
+                    responses.append(res)
+        fields = BULK_FIELDS["profile"]
+        self.journal.record("phase", "profiles", [[{k: v for k, v in profile.items() if k in fields} for profile in res] for res in responses])
+        self.journal.flush()
+        return responses
+
+    def __build_pipeline(self, concurrency: dict[str:int], queue_size: int, retry_delay: float, plan: list[str] = None) -> Pipeline:
+        """
+        Builds the Phase II - V screening pipeline.
+
+        Parameters:
+        - `concurrency` (dict): Stage name -> number of concurrent workers. Stages not listed use 10.
+        - `queue_size` (int): Maximum number of tickers waiting between two stages.
+        - `retry_delay` (float): Seconds to wait before retrying throttled tickers.
+        - `plan` (list[str]): Stage names in the order to run them, e.g. from a checkpoint. Default is the planner's order.
+
+        Returns:
+        - `Pipeline`: The screening pipeline.
+        """
+        concurrency = concurrency or {}
+        stages = [
+            Stage("balance_sheet", self.__screen_balance_sheet, self.handler.get_balance_sheet),
+            Stage("key_metrics_cashflow", self.__screen_key_metrics_and_cashflow, self.__get_key_metrics_and_cashflow),
+            Stage("historical", self.__screen_historical, self.handler.get_historical),
+            Stage("fv_upside", self.__screen_fv_upside, requires=["key_metrics_cashflow"]),
+        ]
+        for stage in stages:
+            stage.concurrency = concurrency.get(stage.name, stage.concurrency)
+        if plan is not None:
+            stages.sort(key=lambda stage: plan.index(stage.name))
+        else:
+            stages = self.planner.plan(stages)
+        return Pipeline(stages, queue_size, retry_delay=retry_delay, journal=self.journal, name="beta")
+       
+    async def run_async(self, debug:bool=False, concurrency: dict[str:int] = None, queue_size: int = 100, retry_delay: float = 30.0, resume: bool = False) -> Results:
+        """
+        Screens the tickers.
+
+        Phase I requests profiles in comma-batched strings. The remaining phases run as a
+        streaming pipeline, so a ticker moves on to the next phase as soon as it passes
+        the previous one. The planner orders those phases from the pass rates and fetch
+        costs observed in earlier runs, cheapest and most selective first.
+
+        Parameters:
+        - `debug` (bool): If True, prints per-phase statistics. Default is False.
+        - `concurrency` (dict): Stage name (`balance_sheet`, `key_metrics_cashflow`, `historical`, `fv_upside`) -> number of concurrent workers. Default is 10 per stage.
+        - `queue_size` (int): Maximum number of tickers waiting between two stages. Default is 100.
+        - `retry_delay` (float): Seconds to wait before retrying tickers whose requests were throttled. Default is 30.
+        - `resume` (bool): If True, picks up an interrupted run from its checkpoint journal, skipping completed phases and tickers. Default is False.
+
+        Returns:
+        - `Results`: The screening results, before cleaning.
+        """
+        requests_before = self.handler.client.rate_limiter.requests_sent
         starting_stocks = self.__get_ticker_count()
-        self.floats = await self.handler.get_floats()
-        requests_sent +=1
         print(f"Screening {starting_stocks} stocks...")
-        async with aiohttp.ClientSession() as session:
-            for string in self.profile_fstr_arr:
-                res = await self.handler.get_profile(session, string)
-                requests_sent += 1
-                if res is None:
-                    continue
-                for profile in res:
-                    try:
-                        if int(profile['mktCap']) <= 0:
-                            issues.append(profile['symbol'])
-                            continue
-                        if profile['country'] in blacklist:
-                            issues.append(profile['symbol'])
-                            continue
-                    
-                    
-                        if profile['industry'][:5] == "Banks" or profile['industry'][:9] == "Insurance" or profile["industry"][:9] == "Financial" or profile['industry'][:10] == "Investment" or profile['industry'] == "Asset Management":
-                            issues.append(profile['symbol'])
-                            continue
-    
-                        div = float(profile.get("lastDiv", 0))
-                    except (IndexError, ValueError, TypeError):
-                        issues.append(profile['symbol'])
-                        continue
-
-                    stk_res[profile['symbol']] = {
-                        "Name": profile["companyName"],
-                        "Market Cap": profile['mktCap'],
-                        "HQ Location": profile["country"],
-                        "Exchange Location": profile["exchange"],
-                        "Industry": profile["industry"]
-                    }
-
-            # get all balance sheet
+        if not resume:
+            self.journal.reset()
+        checkpoint = self.journal.load()
+        phases = checkpoint.get("phase", {})
+        self.timings = {}
+        started = time.perf_counter()
+        try:
+            profiles = {profile['symbol']: profile for res in await self.__get_profiles(retry_delay, phases.get("profiles")) for profile in res}
+            stk_res = self.__screen_profiles(profiles)
+            issues = [i for i in profiles if i not in stk_res]
+            started = self.__time("profiles", started, starting_stocks, len(stk_res))
+
             starting_stocks = starting_stocks-len(issues)
             print(f"Phase I complete.\n{len(issues)} stocks removed.\n{starting_stocks} remaining.") if debug else None
-            issues = []
-            for k, v in stk_res.items():
-                self.__check_reqs(requests_sent)
-                bs = await self.handler.get_balance_sheet(session, k)
-                requests_sent += 1
-                try: 
-                    current_assets = int(bs[0]["totalCurrentAssets"])
-                    total_liabilities = int(bs[0]["totalLiabilities"])
-                    ncav = current_assets - total_liabilities
-                    ratio = round(v["Market Cap"] / ncav, 1)
-                    net_debt = int(bs[0]["netDebt"])
-                    v["Net Debt"] = net_debt
-                    v["NCAV Ratio"] = 1
-                    if ratio > 0 and ratio < 2.5:
-                        v["isAdded"] = True
-                        v["NCAV Ratio"] = ratio
-
-                except:
-                    issues.append(k)
-                    continue
-            
-            for i in issues:
-                stk_res.pop(i)
-            
-            starting_stocks = starting_stocks-len(issues)
-            print(f"Phase II complete.\n{len(issues)} stocks removed.\n{starting_stocks} remaining.") if debug else None
-            issues = []
-            for k, v in stk_res.items():
-                self.__check_reqs(requests_sent)
-                km = await self.handler.get_key_metrics(session, k)
-                requests_sent += 1
-                self.__check_reqs(requests_sent)
-                cf = await self.handler.get_cashflow(session, k)
-                requests_sent +=1
-                try:
-                    free_float = self.__find_float_from_ticker(k)
-                    y_0_ttm = km[0]['freeCashFlowPerShareTTM'] * free_float
-                    rest = [i['freeCashFlow'] for i in cf]
-                    total = y_0_ttm + sum(rest)
-                    five_year_fcf_average = total / 5 
-                    pfcfRatio = v["Market Cap"]/five_year_fcf_average
-                    v['5Y average'] = five_year_fcf_average
-                    v["Cash & Equivalents"]= cf[0]["cashAtEndOfPeriod"]
-                    
-                    v["P/aFCF Ratio"] = round(pfcfRatio, 1)
-                    if pfcfRatio > 0 and pfcfRatio < 10:
-                        v["isAdded"] = True
-                    
-                    negCashflow = 0
-                    for i in rest:
-                        if i < 0:
-                            negCashflow += 1
-                    if negCashflow > 2:
-                        issues.append(k)
-                        continue
-                    ev = km[0]["enterpriseValueTTM"]
-                    v["EV"] = round(ev)
-                    evFCF = ev/five_year_fcf_average
-                    v["EV/aFCF"] = 100
-                    if evFCF > 1 and evFCF < 5:
-                        v["isAdded"] = True
-                        v["EV/aFCF"] = round(evFCF, 1)
-                    
-                    pTBV = v["Market Cap"]/km[0]['tangibleAssetValueTTM']
-                    v["P/TBV Ratio"] = round(pTBV)
-                    
-                    if pTBV > 0 and pTBV < 1:
-                        v["isAdded"] = True
-                    
-                except Exception as e:
-                    issues.append(k)
-                    continue
-        
-            for i in issues:
-                stk_res.pop(i)
-            
-            starting_stocks = starting_stocks-len(issues)
-            print(f"Phase III complete.\n{len(issues)} stocks removed.\n{starting_stocks} remaining.") if debug else None
-            issues = []
-            for k, v in stk_res.items():
-                self.__check_reqs(requests_sent)
-                hist = await self.handler.get_historical(session, k)
-                requests_sent += 1 
-                try:
-                    five_year_max = round(max([i['close'] for i in hist['historical']]), 2)
-                    five_year_price_metric = ((five_year_max - hist['historical'][0]['close'])/hist['historical'][0]['close']) * 100
-                    v['5Y Price Metric'] = round(five_year_price_metric)
-                    v['Current Price'] = round(hist['historical'][0]['close'], 2)
-                    v['5Y Max'] = five_year_max
-                except:
-                    issues.append(k)
-                    continue
-            
-            for i in issues:
-                stk_res.pop(i)
-            
-            starting_stocks = starting_stocks-len(issues)
-            print(f"Phase IV complete.\n{len(issues)} stocks removed.\n{starting_stocks} remaining.") if debug else None
-            issues = []
-            for k, v in stk_res.items():
-                try:
-                    fv_upside = (v['5Y average'] * 7) + v["Cash & Equivalents"]
-                    upside_percentage = ((fv_upside-v['Market Cap'])/v['Market Cap']) * 100
-                    v['FV Upside Metric'] = round(upside_percentage)
-                except:
-                    issues.append(k)
-            
-            starting_stocks = starting_stocks-len(issues)
-            print(f"Phase IV complete.\n{len(issues)} stocks removed.\n{starting_stocks} remaining.") if debug else None
-            for i in issues:
-                stk_res.pop(i)
+            if "pipeline" in phases:
+                stk_res = phases["pipeline"]
+                print("Phases II - V restored from checkpoint.") if debug else None
+            else:
+                if self.floats is None:
+                    self.floats = await self.handler.load_floats(stk_res.keys())
+                started = self.__time("floats", started)
+                pipeline = self.__build_pipeline(concurrency, queue_size, retry_delay, phases.get("plan"))
+                self.journal.record("phase", "plan", [stage.name for stage in pipeline.stages])
+                print(f"Plan: {self.planner.describe(pipeline.stages)}")
+                stk_res = await pipeline.run(*pipeline.resume(stk_res, checkpoint.get("stage", {})))
+                for stage in pipeline.stages:
+                    starting_stocks = starting_stocks-stage.removed
+                    print(f"Phase {stage.name} complete.\n{stage.removed} stocks removed.\n{starting_stocks} remaining.") if debug else None
+                started = self.__time("pipeline", started)
+                for stage in pipeline.stages:
+                    if stage.finished:
+                        self.__record_phase(f"stage:{stage.name}", stage.finished - stage.started, stage.received, stage.passed)
+                self.planner.record(pipeline.stages)
+                self.journal.record("phase", "pipeline", stk_res)
+                self.journal.flush()
+            stk_res = self.__format_results(stk_res)
+            self.__time("format", started)
+            print(f"{self.handler.client.rate_limiter.requests_sent - requests_before} requests sent") if debug else None
             
             self.results = self.__clean_results(stk_res)
             self.__sort_results()
             return stk_res
+        finally:
+            self.handler.save_prices()
+            if self.__owns_client:
+                await self.handler.client.close()
         
     def create_xlsx(self, file_path:str) -> None:
         """
@@ -272,7 +348,7 @@ class BetaModule:
         if len(self.results) == 0:
             print(f'ERROR: results dictionary is empty. Execute `Screener.run()` to screen the stocks. If you are still seeing this after running `Screener.run()`, there are no new stocks from the previous execution.')
         else:
-            df = pd.DataFrame.from_dict(self.results, orient='index')
+            df = self.results.to_frame()
             df.to_excel(file_path)
             print(f"File saved to {file_path}")
     
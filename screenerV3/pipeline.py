@@ -0,0 +1,197 @@
+from screener.FMPClient import FMPRequestError, rate_limit_waits
+from screener.Journal import Journal
+from screener.RunMetrics import RunMetrics, get_run_metrics
+import aiohttp
+import asyncio
+import time
+
+_DONE = object()
+
+class Stage:
+    def __init__(self, name: str, evaluate, fetch = None, concurrency: int = 10, requires: list[str] = None) -> None:
+        """
+        A single screening phase in a `Pipeline`.
+
+        Parameters:
+        - `name` (str): Name of the stage, used for reporting and concurrency overrides.
+        - `evaluate` (callable): `evaluate(ticker, record, payload) -> bool`. Updates the ticker's record in place and returns whether the ticker survives. Raising drops the ticker.
+        - `fetch` (callable): Optional coroutine `fetch(ticker)` returning the payload passed to `evaluate`. A connection error (`aiohttp.ClientError`) passes `None`; any exception other than that and `FMPRequestError` is a bug and stops the run.
+        - `concurrency` (int): Number of tickers this stage works on at once. Default is 10.
+        - `requires` (list[str]): Names of the stages whose fields `evaluate` needs, which must run first.
+
+        Returns:
+        - `None`
+        """
+        self.name = name
+        self.evaluate = evaluate
+        self.fetch = fetch
+        self.concurrency = concurrency
+        self.requires = requires or []
+        self.received = 0
+        self.passed = 0
+        self.fetch_seconds = 0.0
+        self.started = None # perf_counter of the first ticker received, and of the last pass finishing
+        self.finished = None
+
+    @property
+    def removed(self) -> int:
+        return self.received - self.passed
+
+
+class Pipeline:
+    def __init__(self, stages: list[Stage], queue_size: int = 100, retries: int = 1, retry_delay: float = 30.0, journal: Journal = None, name: str = None, metrics: RunMetrics = None) -> None:
+        """
+        Streams tickers through a sequence of stages.
+
+        A ticker that survives one stage is handed straight to the next one, so every
+        stage works concurrently. Queues between stages are bounded by `queue_size`
+        to keep fast stages from running far ahead of slow ones.
+
+        Tickers whose fetch still fails with a transient error (`FMPRequestError`) are
+        not dropped: they are deferred and re-run from the failed stage once the
+        main pass has finished.
+
+        If a `journal` is given, every stage outcome is recorded as a `stage` entry
+        (`ticker -> [stage index, record or None]`) so an interrupted run can be resumed.
+
+        Parameters:
+        - `stages` (list[Stage]): The stages, in order.
+        - `queue_size` (int): Maximum number of tickers waiting between two stages. Default is 100.
+        - `retries` (int): Number of passes over the deferred tickers. Default is 1.
+        - `retry_delay` (float): Seconds to wait before each retry pass. Default is 30.
+        - `journal` (Journal): Optional checkpoint journal.
+        - `name` (str): Name of the module running the pipeline, used as a metrics label.
+        - `metrics` (RunMetrics): Where the peak depth of every stage's queue is recorded. Defaults to the shared run metrics.
+
+        Returns:
+        - `None`
+        """
+        self.stages = stages
+        self.queue_size = queue_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.journal = journal
+        self.name = name
+        self.metrics = metrics or get_run_metrics()
+        self.deferred = []
+
+    def resume(self, records: dict, progress: dict) -> tuple[dict, dict]:
+        """
+        Applies the `stage` entries of a replayed journal to a fresh set of records.
+
+        Parameters:
+        - `records` (dict): Ticker -> record dictionary.
+        - `progress` (dict): The journal's `stage` entries (ticker -> [stage index, record or None]).
+
+        Returns:
+        - `tuple`: The records without tickers that already failed a stage, and the ticker -> first stage map to pass to `run`.
+        """
+        remaining = {}
+        start = {}
+        for ticker, record in records.items():
+            if ticker not in progress:
+                remaining[ticker] = record
+                continue
+            index, saved = progress[ticker]
+            if saved is not None:
+                remaining[ticker] = saved
+                start[ticker] = index + 1
+        return remaining, start
+
+    async def run(self, records: dict, start: dict[str:int] = None) -> dict:
+        """
+        Runs every record through the pipeline, then drains the deferred tickers.
+
+        Parameters:
+        - `records` (dict): Ticker -> record dictionary. Records are updated in place.
+        - `start` (dict): Ticker -> index of the first stage to run, for resumed tickers. Default is 0 for every ticker.
+
+        Returns:
+        - `dict`: The records that survived every stage, in their original order. Tickers that are still deferred after every retry are left in `deferred`.
+        """
+        start = start or {}
+        groups = {}
+        for ticker, record in records.items():
+            groups.setdefault(start.get(ticker, 0), {})[ticker] = record
+        survivors = set()
+        for index in sorted(groups):
+            if index >= len(self.stages):
+                survivors |= set(groups[index])
+            else:
+                survivors |= await self.__run_pass(index, groups[index])
+        for attempt in range(self.retries):
+            if not self.deferred:
+                break
+            deferred, self.deferred = self.deferred, []
+            print(f"Retrying {len(deferred)} deferred tickers in {self.retry_delay} seconds...")
+            await asyncio.sleep(self.retry_delay)
+            for first in sorted(set(index for index, _ in deferred)):
+                survivors |= await self.__run_pass(first, dict(item for index, item in deferred if index == first))
+        if self.deferred:
+            print(f"{len(self.deferred)} tickers could not be fetched.")
+        if self.journal is not None:
+            self.journal.flush()
+        return {k: v for k, v in records.items() if k in survivors}
+
+    async def __run_pass(self, start: int, records: dict) -> set:
+        stages = self.stages[start:]
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(len(stages) + 1)]
+        survivors = set()
+
+        async def feed() -> None:
+            for item in records.items():
+                await queues[0].put(item)
+            await queues[0].put(_DONE)
+
+        async def collect() -> None:
+            while True:
+                item = await queues[-1].get()
+                if item is _DONE:
+                    return
+                survivors.add(item[0])
+
+        await asyncio.gather(
+            feed(),
+            *[self.__run_stage(start + i, queues[i], queues[i + 1]) for i in range(len(stages))],
+            collect())
+        return survivors
+
+    async def __run_stage(self, index: int, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+        stage = self.stages[index]
+        await asyncio.gather(*[self.__worker(index, inbox, outbox) for _ in range(stage.concurrency)])
+        if stage.started is not None:
+            stage.finished = time.perf_counter()
+        await outbox.put(_DONE)
+
+    async def __worker(self, index: int, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+        stage = self.stages[index]
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                await inbox.put(_DONE) # let the other workers of this stage see it
+                return
+            ticker, record = item
+            self.metrics.set_max("screener_queue_depth_max", inbox.qsize() + 1, module=self.name, stage=stage.name)
+            started = time.perf_counter()
+            if stage.started is None:
+                stage.started = started
+            try:
+                with rate_limit_waits() as waited:
+                    payload = await stage.fetch(ticker) if stage.fetch else None
+            except FMPRequestError:
+                self.deferred.append((index, item))
+                continue
+            except aiohttp.ClientError:
+                payload = None
+            # waiting for the shared rate limit says which stage queued first, not what it costs
+            stage.fetch_seconds += max(0.0, time.perf_counter() - started - waited[0])
+            stage.received += 1
+            try:
+                keep = stage.evaluate(ticker, record, payload)
+            except Exception:
+                keep = False
+            if self.journal is not None:
+                self.journal.record("stage", ticker, [index, record if keep else None])
+            if keep:
+                stage.passed += 1
+                await outbox.put(item)
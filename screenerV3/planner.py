@@ -0,0 +1,138 @@
+from .pipeline import Stage
+import json
+import os
+
+def stage_counts(stage: Stage) -> dict:
+    """
+    Returns the counters of a finished stage that the planner learns from.
+    """
+    return {"received": stage.received, "passed": stage.passed, "fetch_seconds": stage.fetch_seconds}
+
+class Planner:
+    def __init__(self, path: str, decay: float = 0.5, min_samples: int = 20) -> None:
+        """
+        Orders the stages of a `Pipeline` by cost and selectivity, learned across runs.
+
+        For every stage the planner keeps the share of tickers that passed it and the
+        fetch time spent per ticker. Rate limiter waits are left out: with a limiter
+        shared by every stage they measure which stage queued behind the others, not the
+        bandwidth and latency an endpoint costs (cached endpoints are cheap). Stages
+        are then run in increasing order of `cost / (1 - pass rate)`, the order that
+        minimizes the expected cost per ticker for independent filters, while respecting
+        each stage's `requires`.
+
+        Parameters:
+        - `path` (str): Path to the JSON file holding the observed statistics. Created if missing.
+        - `decay` (float): Weight kept by the previous statistics when a run is recorded. Default is 0.5.
+        - `min_samples` (int): Tickers a stage must have seen before its statistics are used. Default is 20.
+
+        Returns:
+        - `None`
+        """
+        self.path = path
+        self.decay = decay
+        self.min_samples = min_samples
+        self.stats = {}
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                self.stats = json.load(file)
+
+    def pass_rate(self, name: str) -> float:
+        """
+        Returns the observed share of tickers that pass a stage, or `None` if it has too few samples.
+        """
+        stats = self.stats.get(name)
+        if not stats or stats["received"] < self.min_samples:
+            return None
+        return stats["passed"] / stats["received"]
+
+    def cost(self, name: str) -> float:
+        """
+        Returns the observed fetch seconds per ticker of a stage, rate limiter waits excluded, or `None` if it has too few samples.
+        """
+        stats = self.stats.get(name)
+        if not stats or stats["received"] < self.min_samples:
+            return None
+        return stats["fetch_seconds"] / stats["received"]
+
+    def __rank(self, stage: Stage) -> float:
+        if stage.fetch is None:
+            return 0.0 # free filters run as soon as the fields they need are there
+        pass_rate, cost = self.pass_rate(stage.name), self.cost(stage.name)
+        if pass_rate >= 1:
+            return float('inf')
+        return cost / (1 - pass_rate)
+
+    def plan(self, stages: list[Stage]) -> list[Stage]:
+        """
+        Orders the stages. Among the stages whose requirements already ran, the lowest
+        ranked one runs next; ties keep the declared order. Until every fetching stage
+        has `min_samples`, the declared order is kept.
+
+        Parameters:
+        - `stages` (list[Stage]): The stages, in their declared order.
+
+        Returns:
+        - `list[Stage]`: The stages in the order they should run.
+        """
+        if any(stage.fetch is not None and self.pass_rate(stage.name) is None for stage in stages):
+            return list(stages)
+        pending = list(stages)
+        order = []
+        done = set()
+        while pending:
+            ready = [stage for stage in pending if all(i in done for i in stage.requires)] or pending[:1]
+            stage = min(ready, key=self.__rank)
+            order.append(stage)
+            done.add(stage.name)
+            pending.remove(stage)
+        return order
+
+    def describe(self, stages: list[Stage]) -> str:
+        """
+        Returns a one-line summary of a plan with the statistics it is based on.
+        """
+        parts = []
+        for stage in stages:
+            pass_rate, cost = self.pass_rate(stage.name), self.cost(stage.name)
+            if pass_rate is None:
+                parts.append(f"{stage.name} (no data)")
+            else:
+                parts.append(f"{stage.name} ({pass_rate:.0%} pass, {cost:.3f}s)")
+        return " -> ".join(parts)
+
+    def record(self, stages: list[Stage]) -> None:
+        """
+        Folds the counters of a finished run into the statistics and saves them.
+
+        Parameters:
+        - `stages` (list[Stage]): The stages of the finished pipeline.
+
+        Returns:
+        - `None`
+        """
+        self.record_counts({stage.name: stage_counts(stage) for stage in stages})
+
+    def record_counts(self, counts: dict[str:dict]) -> None:
+        """
+        Folds the counters of a finished run, e.g. summed over the shards of a sharded run, into the statistics and saves them.
+
+        Parameters:
+        - `counts` (dict): Stage name -> `received`, `passed` and `fetch_seconds`.
+
+        Returns:
+        - `None`
+        """
+        for name, count in counts.items():
+            if not count["received"]:
+                continue
+            old = self.stats.get(name, {"received": 0, "passed": 0, "fetch_seconds": 0.0})
+            self.stats[name] = {
+                "received": old["received"] * self.decay + count["received"],
+                "passed": old["passed"] * self.decay + count["passed"],
+                "fetch_seconds": old["fetch_seconds"] * self.decay + count["fetch_seconds"],
+            }
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'w') as file:
+            json.dump(self.stats, file, indent=2)
@@ -0,0 +1,145 @@
+from concurrent.futures import ProcessPoolExecutor
+from .planner import Planner, stage_counts
+from screener.FMPClient import FMPClient
+from screener.FloatIndex import MappedFloatIndex
+from screener.KeyPool import KeyPool, env_keys
+from screener.RateLimiter import SharedRateLimiter
+from screener.ResponseCache import ResponseCache
+from screener.RunMetrics import get_run_metrics, reset_run_metrics
+from screener.Results import Results
+import multiprocessing
+import asyncio
+import zlib
+import os
+
+# state of a worker process, set once by the pool initializer
+_worker = {}
+
+def shard_tickers(tickers: dict[str:list], shards: int, by: str = "country") -> list[dict[str:list]]:
+    """
+    Splits a country -> tickers universe into shards.
+
+    By country, whole countries are dealt largest first to the smallest shard, so a
+    shard's tickers share an exchange calendar and currency. By hash, every ticker goes
+    to the shard given by the CRC32 of its symbol, which balances shards even when one
+    country dominates the universe. Both are deterministic, so a resumed run finds the
+    same tickers in every shard.
+
+    Parameters:
+    - `tickers` (dict): Country -> tickers.
+    - `shards` (int): Number of shards.
+    - `by` (str): `country` or `hash`. Default is `country`.
+
+    Returns:
+    - `list[dict]`: The non-empty shards, each a country -> tickers dict.
+    """
+    parts = [{} for _ in range(shards)]
+    if by == "country":
+        sizes = [0] * shards
+        for country, symbols in sorted(tickers.items(), key=lambda i: (-len(i[1]), i[0])):
+            i = sizes.index(min(sizes))
+            parts[i][country] = list(symbols)
+            sizes[i] += len(symbols)
+    elif by == "hash":
+        for country, symbols in tickers.items():
+            for symbol in symbols:
+                parts[zlib.crc32(symbol.encode()) % shards].setdefault(country, []).append(symbol)
+    else:
+        raise ValueError(f"Unknown sharding '{by}', expected 'country' or 'hash'")
+    return [part for part in parts if any(part.values())]
+
+class _ShardPlanner(Planner):
+    # plans like the module's planner but leaves recording to the parent process
+    def record(self, stages) -> None:
+        self.counts = {stage.name: stage_counts(stage) for stage in stages}
+
+def _init_worker(rate_limiters: list, floats_path: str) -> None:
+    _worker["rate_limiters"] = rate_limiters
+    _worker["floats"] = MappedFloatIndex(floats_path)
+
+def _run_shard(module: type, index: int, tickers: dict, options: dict, run_options: dict) -> tuple:
+    async def main():
+        cache = ResponseCache(options["cache_path"]) if options["cache_path"] else None
+        client = FMPClient(keys=KeyPool(env_keys(), _worker["rate_limiters"]), cache=cache)
+        root, ext = os.path.splitext(options["checkpoint_path"])
+        try:
+            instance = module(None, client=client, rules=options["rules"], checkpoint_path=f"{root}.shard{index}{ext}", plan_path=options["plan_path"], tickers=tickers, floats=_worker["floats"])
+            instance.planner = _ShardPlanner(options["plan_path"])
+            await instance.run_async(**run_options)
+        finally:
+            await client.close()
+        return instance.results, getattr(instance.planner, "counts", {})
+    results, counts = asyncio.run(main())
+    return results, counts, reset_run_metrics() # a pool process may run several shards: report each one once
+
+class ShardedRunner:
+    def __init__(self, module, processes: int = None, by: str = "country", cache_path: str = None, start_method: str = "spawn") -> None:
+        """
+        Runs an `AlphaModule` or `BetaModule` over shards of its universe in a pool of processes.
+
+        Every worker runs its own event loop and FMP client, and all of them draw from
+        one global rate budget: every API key gets a `SharedRateLimiter`. The float
+        index is loaded once by the parent and memory-mapped by the workers, and a
+        worker only receives the tickers of its own shard. The shard results are merged
+        in shard order into the module's `results`, so the module's sheet and Excel
+        outputs work as after a single-process run.
+
+        Parameters:
+        - `module` (AlphaModule | BetaModule): The module to run, built as usual. It provides the universe, rules, sheet and file paths.
+        - `processes` (int): Number of worker processes. Defaults to the number of CPUs.
+        - `by` (str): Sharding of the universe, `country` or `hash`. Default is `country`.
+        - `cache_path` (str): Optional `ResponseCache` database the workers share.
+        - `start_method` (str): `multiprocessing` start method. Default is `spawn`.
+
+        Returns:
+        - `None`
+        """
+        self.module = module
+        self.processes = processes or os.cpu_count() or 1
+        self.by = by
+        self.cache_path = cache_path
+        self.context = multiprocessing.get_context(start_method)
+        self.shards = shard_tickers(module.tickers, self.processes, by)
+
+    async def __share_floats(self) -> str:
+        universe = [ticker for tickers in self.module.tickers.values() for ticker in tickers]
+        floats = await self.module.handler.load_floats(universe)
+        await self.module.handler.client.close() # the workers have their own clients; a shared client reopens its session on next use
+        return floats.save_mapped(os.path.join(floats.snapshot_dir, f"universe_{type(self.module).__name__}"))
+
+    async def run_async(self, debug: bool = False, **run_options) -> Results:
+        """
+        Screens every shard and merges the results into the module.
+
+        Parameters:
+        - `debug` (bool): Passed on to every shard's `run_async`. Default is False.
+        - `run_options`: Other `run_async` arguments, e.g. `concurrency` or `resume`.
+
+        Returns:
+        - `Results`: The merged screening results.
+        """
+        print(f"Screening {len(self.shards)} shards by {self.by} in {self.processes} processes: {[sum(len(i) for i in shard.values()) for shard in self.shards]} tickers.")
+        floats_path = await self.__share_floats()
+        rate_limiters = [SharedRateLimiter(context=self.context) for _ in env_keys()]
+        options = {
+            "rules": self.module.rules.spec,
+            "checkpoint_path": self.module.journal.path,
+            "plan_path": self.module.planner.path,
+            "cache_path": self.cache_path,
+        }
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(self.processes, mp_context=self.context, initializer=_init_worker, initargs=(rate_limiters, floats_path)) as executor:
+            runs = await asyncio.gather(*[
+                loop.run_in_executor(executor, _run_shard, type(self.module), i, shard, options, {**run_options, "debug": debug})
+                for i, shard in enumerate(self.shards)])
+        counts = {}
+        for _, shard_counts, shard_metrics in runs:
+            get_run_metrics().merge(shard_metrics)
+            for name, count in shard_counts.items():
+                total = counts.setdefault(name, {"received": 0, "passed": 0, "fetch_seconds": 0.0})
+                for k in total:
+                    total[k] += count[k]
+        self.module.planner.record_counts(counts)
+        results = self.module.merge_results([results for results, _, _ in runs])
+        print(f"{len(results)} stocks remaining after merging {len(runs)} shards.")
+        return results
@@ -1,12 +1,20 @@
 from datetime import datetime
+from screener.SheetWriter import SheetWriter
+from screener.Sheet import read_seen_tickers
 import gspread
-from time import sleep
+import os
 import re
 
+ALPHA_HEADER = ["Ticker", "Company Name",  "FV Upside", "5Y Price Metric", " ", "NCAV Ratio","EV/aFCF", "Payback Rating", "Average Yield", "HQ Country"]
+BETA_HEADER = ["Ticker", "Company Name", "NCAV Ratio",  "EV/aFCF", "P/TBV Ratio", "HQ Location", " ", "FV Upside", "5Y Price Metric"]
+
 class Sheet:
-    def __init__(self, sheet_path:str = "./service_account.json", file_name:str = 'Screener') -> None:
+    def __init__(self, sheet_path:str = "./service_account.json", file_name:str = 'Screener', diff_only: bool = False, seen_cache_dir: str = "./data/sheets") -> None:
         self.service_account = gspread.service_account(filename = sheet_path)
         self.file = self.service_account.open(file_name)
+        self.writer = SheetWriter(diff_only=diff_only)
+        self.seen_cache_path = os.path.join(seen_cache_dir, f"{file_name}_seen.json")
+        self.__worksheet = None
         self.today = datetime.now()
         self._was_sheet_added_today = False
         self.month_dict = {
@@ -37,31 +45,19 @@ class Sheet:
             return date_str
         return None
     
-    def __add_alpha_header(self) -> None:
-        sheet = self.__get_worksheet_names()[-1]
-        sheet.append_row(values= ["Ticker", "Company Name",  "FV Upside", "5Y Price Metric", " ", "NCAV Ratio","EV/aFCF", "Payback Rating", "Average Yield", "HQ Country"],table_range='A1:J1')
-
-    def __add_beta_header(self) -> None:
-        sheet = self.__get_worksheet_names()[-1]
-        sheet.append_row(values= ["Ticker", "Company Name", "NCAV Ratio",  "EV/aFCF", "P/TBV Ratio", "HQ Location", " ", "FV Upside", "5Y Price Metric"],table_range='A1:I1')
+    def __target(self) -> gspread.Worksheet:
+        # the tab created by this run, or the most recent one if it already existed
+        if self.__worksheet is None:
+            self.__worksheet = self.__get_worksheet_names()[-1]
+        return self.__worksheet
     
     def add_alpha_row_data(self, data: dict):
-        sheet = self.__get_worksheet_names()[-1]
-        itr = 2
-        for k, v in data.items():
-            payload = [k, str(v['Name']), f"{v['FV Upside Metric']}%", f"{v['5Y Price Metric']}%", " ", v["NCAV Ratio"], v["EV/aFCF"], v["Payback Rating"], v["5Y average"], str(v['HQ Location'])]
-            sheet.append_row(values= payload, table_range=f'A{itr}:J{itr}')
-            itr+= 1
-            sleep(2)
+        rows = [[k, str(v['Name']), f"{v['FV Upside Metric']}%", f"{v['5Y Price Metric']}%", " ", v["NCAV Ratio"], v["EV/aFCF"], v["Payback Rating"], v["5Y average"], str(v['HQ Location'])] for k, v in data.items()]
+        self.writer.write(self.__target(), [ALPHA_HEADER] + rows)
     
     def add_beta_row_data(self, data: dict):
-        sheet = self.__get_worksheet_names()[-1]
-        itr = 2
-        for k, v in data.items():
-            payload = [k, str(v['Name']), v["NCAV Ratio"], v["EV/aFCF"], v["P/TBV Ratio"], str(v['HQ Location']), " ", f"{v['FV Upside Metric']}%", f"{v['5Y Price Metric']}%"]
-            sheet.append_row(values= payload, table_range=f'A{itr}:I{itr}')
-            itr+= 1
-            sleep(2)
+        rows = [[k, str(v['Name']), v["NCAV Ratio"], v["EV/aFCF"], v["P/TBV Ratio"], str(v['HQ Location']), " ", f"{v['FV Upside Metric']}%", f"{v['5Y Price Metric']}%"] for k, v in data.items()]
+        self.writer.write(self.__target(), [BETA_HEADER] + rows)
     
     def get_all_worksheets(self) -> list[gspread.Worksheet]:
         try:
@@ -72,8 +68,7 @@ class Sheet:
     def create_alpha_module_tab(self):
         try:
             name = f"{self.today.day}-{self.month_dict[self.today.month]}-{self.today.year}"
-            self.file.add_worksheet(title = name, rows = 0, cols = 0)
-            self.__add_alpha_header()
+            self.__worksheet = self.file.add_worksheet(title = name, rows = 0, cols = 0)
             print(f"Sheet {name} added.")
             self._was_sheet_added_today = True
         except:
@@ -82,8 +77,7 @@ class Sheet:
     def create_beta_module_tab(self):
         try:
             name = f"{self.today.day}-{self.month_dict[self.today.month]}-{self.today.year}"
-            self.file.add_worksheet(title = name, rows = 0, cols = 0)
-            self.__add_beta_header()
+            self.__worksheet = self.file.add_worksheet(title = name, rows = 0, cols = 0)
             print(f"Sheet {name} added.")
             self._was_sheet_added_today = True
         except:
@@ -100,24 +94,8 @@ class Sheet:
         except:
             return []
     
-    def get_all_previously_seen_tickers(self) -> list[str]:
+    def get_all_previously_seen_tickers(self) -> set[str]:
         '''
         Returns all tickers seen in the last year (52 weeks).
         '''
-        seen = []
-        sheets = []
-        all_sheets = self.get_all_worksheets()
-        weeks = len(all_sheets)
-        if weeks > 52:
-            sheets = all_sheets[-52:]
-        else:
-            sheets = all_sheets
-        try:
-            for sheet in sheets:
-                seen.append(sheet.get_values("A2:A1000"))
-        except:
-            print("Google Sheets API limit exceeded. Waiting 30 seconds before trying again.")
-            sleep(31)
-            self.get_all_previously_seen_tickers()
-        
-        return [i[0] for sub in seen for i in sub if i]
+        return read_seen_tickers(self.file, self.get_all_worksheets()[-52:], self.writer, self.seen_cache_path)
@@ -1,15 +1,23 @@
-import aiohttp
 from dotenv import load_dotenv
-import os
+import asyncio
 import json
 import pandas as pd
 from screener.Sheet import Sheet
+from screener.FMPClient import FMPClient
+from screener.FloatIndex import FloatIndex
+from screener.PriceStore import PriceStore, get_price_store
+from screener.RunMetrics import RunMetrics, get_run_metrics
+from screener import Metrics
 
 load_dotenv()
 
 class Handler:
-    def __init__(self) -> None:
-        self.api_key = os.environ['FMP_KEY']
+    def __init__(self, client: FMPClient = None, prices: PriceStore = None, metrics: RunMetrics = None) -> None:
+        self.client = client or FMPClient()
+        self.api_key = self.client.api_key
+        self.prices = prices or get_price_store()
+        self.metrics = metrics or get_run_metrics()
+        self.__summaries = None # ticker -> future of the tickers waiting for the next price summary
     
     def __read_json_file(self, file_path) -> dict[str:list]:
             """
@@ -48,50 +56,90 @@ class Handler:
         print(f"{removed} tickers removed for being screened within the passed year.")
         return ret
     
-    async def get_profile(self, session: aiohttp.ClientSession, ticker: str) -> str:
-        async with session.get(f'https://financialmodelingprep.com/api/v3/profile/{ticker}?apikey={self.api_key}') as response:
-            try:
-                return await response.json()
-            except Exception as e:
-                pass
+    async def get_profile(self, ticker: str) -> str:
+        return await self.client.get_json(f'v3/profile/{ticker}')
     
-    async def get_historical(self, session: aiohttp.ClientSession, ticker: str) -> str:
-        async with session.get(f'https://financialmodelingprep.com/api/v3/historical-price-full/{ticker}?apikey={self.api_key}') as response:
-            try:
-                return await response.json()# if response.status == 200 else print("Hit API limit. Waiting 55 seconds.") and sleep(55)
-            except Exception as e:
-                pass
+    async def get_historical(self, ticker: str) -> dict:
+        """
+        Brings the ticker's closes in the price store up to date and summarizes its price window.
+
+        Tickers whose closes are up to date by the same turn of the event loop are
+        summarized together, with one `PriceStore.summary` call per batch.
+
+        Parameters:
+        - `ticker` (str): The stock ticker symbol.
+
+        Returns:
+        - `dict`: The latest (`close`) and highest (`max_close`) close of the window, empty if the ticker has no prices.
+        """
+        with self.metrics.timer("screener_price_update_seconds"):
+            await self.prices.update(self.client, ticker)
+        loop = asyncio.get_running_loop()
+        if self.__summaries is None:
+            self.__summaries = {}
+            loop.call_soon(self.__summarize)
+        if ticker not in self.__summaries:
+            self.__summaries[ticker] = loop.create_future()
+        return await asyncio.shield(self.__summaries[ticker])
+
+    def __summarize(self) -> None:
+        batch, self.__summaries = self.__summaries, None
+        try:
+            fields = self.prices.fields_of(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                future.set_exception(e)
+                future.exception()
+            return
+        for ticker, future in batch.items():
+            future.set_result(fields[ticker])
+
+    def save_prices(self) -> None:
+        """
+        Writes the closes fetched during the run to the price store.
+
+        Returns:
+        - `None`
+        """
+        self.prices.save()
     
-    async def get_balance_sheet(self, session: aiohttp.ClientSession, ticker: str) -> str:
-        async with session.get(f'https://financialmodelingprep.com/api/v3/balance-sheet-statement/{ticker}?period=quarter&limit=5&apikey={self.api_key}') as response:
-            try:
-                return await response.json()# if response.status == 200 else print("Hit API limit. Waiting 55 seconds.") and sleep(55)
-            except Exception as e:
-                pass
+    def fields(self, kind: str, ticker: str, payload) -> dict:
+        """
+        Extracts the raw fields of a response and the metrics derived from them.
+
+        When the client is a `SharedFetch`, they are computed once per run and reused by every module.
+
+        Parameters:
+        - `kind` (str): `balance_sheet`, `cashflow` or `key_metrics`.
+        - `ticker` (str): The stock ticker symbol.
+        - `payload`: The FMP response.
+
+        Returns:
+        - `dict`: The fields, see `Metrics.derive`.
+        """
+        self.metrics.inc("screener_derived_total", kind=kind)
+        derive = getattr(self.client, "derive", None)
+        if derive is None:
+            return Metrics.derive(kind, payload)
+        return derive(kind, ticker, lambda: Metrics.derive(kind, payload))
+
+    async def get_balance_sheet(self, ticker: str) -> str:
+        return await self.client.get_json(f'v3/balance-sheet-statement/{ticker}', period='quarter', limit=5)
     
-    async def get_cashflow(self, session: aiohttp.ClientSession, ticker: str) -> str:
-        async with session.get(f'https://financialmodelingprep.com/api/v3/cash-flow-statement/{ticker}?period=annual&limit=5&apikey={self.api_key}') as response:
-            try:
-                return await response.json()# if response.status == 200 else print("Hit API limit. Waiting 55 seconds.") and sleep(55)
-            except Exception as e:
-                pass
+    async def get_cashflow(self, ticker: str) -> str:
+        return await self.client.get_json(f'v3/cash-flow-statement/{ticker}', period='annual', limit=5)
 
-    async def get_key_metrics(self, session: aiohttp.ClientSession, ticker: str) -> str:
+    async def get_key_metrics(self, ticker: str) -> str:
         """
         Retrieves the key metrics TTM (Trailing Twelve Months) for a given ticker.
 
         Parameters:
-        - `session` (aiohttp.ClientSession): The aiohttp session to use for making requests.
         - `ticker` (str): The stock ticker symbol.
 
         Returns:
         - `str`: The key metrics TTM data in JSON format.
         """
-        async with session.get(f'https://financialmodelingprep.com/api/v3/key-metrics-ttm/{ticker}?period=quarter&apikey={self.api_key}') as response:
-            try:
-                return await response.json()
-            except Exception as e:
-                pass
+        return await self.client.get_json(f'v3/key-metrics-ttm/{ticker}', period='quarter')
     
     async def get_floats(self) -> None:
         """
@@ -100,13 +148,22 @@ class Handler:
         Returns:
         - `None`
         """
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"https://financialmodelingprep.com/api/v4/shares_float/all?apikey={self.api_key}") as response:
-                try:
-                    return await response.json()
-                except Exception as e:
-                    print(f"Error fetching floats: {e}")
-                    return None
+        floats = await self.client.get_json('v4/shares_float/all')
+        if floats is None:
+            print("Error fetching floats.")
+        return floats
+    
+    async def load_floats(self, tickers: list[str]) -> FloatIndex:
+        """
+        Loads the float index for the given tickers from the shared shares-float snapshot.
+
+        Parameters:
+        - `tickers` (list[str]): The tickers to index.
+
+        Returns:
+        - `FloatIndex`: Symbol -> outstanding shares index.
+        """
+        return await FloatIndex().load(self.client, tickers)
     
     def create_xlsx(self, file_path:str, results:dict) -> None:
         """
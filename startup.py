@@ -42,7 +42,7 @@ def create_env_file() -> None:
     try:
         if not os.path.exists(".env"):
             with open(".env", "w") as f:
-                f.write("FMP_KEY_1 = # *** YOUR API KEY *** ")
+                f.write("FMP_KEY_1 = # *** YOUR API KEY *** \n# FMP_KEY_2 = # *** optional, more keys raise the request budget *** ")
             print(".env file created.")
         else:
             print(".env file already exists")
@@ -0,0 +1,55 @@
+import asyncio
+import shutil
+import pytest
+from screener.BulkClient import BulkClient
+from screener.FMPClient import FMPClient
+
+
+@pytest.fixture
+def bulk(tmp_path):
+    shutil.copytree("./tests/fixtures/bulk", tmp_path, dirs_exist_ok=True)
+    bulk = BulkClient(str(tmp_path), client=FMPClient(api_key="test"))
+    bulk.parse(chunk_size=2)
+    bulk.load()
+    return bulk
+
+def test_parse_projects_columns(bulk):
+    assert(list(bulk.tables["profile"].columns) == ["symbol", "mktCap", "lastDiv", "companyName", "exchange", "industry", "country"])
+    assert(bulk.is_fresh())
+
+def test_statements_most_recent_first(bulk):
+    rows = asyncio.run(bulk.get_json("v3/balance-sheet-statement/AAA", period="quarter", limit=2))
+    assert([row["date"] for row in rows] == ["2024-03-31", "2023-12-31"])
+    assert(rows[0]["netDebt"] == -70000)
+
+def test_batched_profiles_and_missing_values(bulk):
+    rows = asyncio.run(bulk.get_json("v3/profile/AAA,BBB,ZZZ"))
+    assert([row["symbol"] for row in rows] == ["AAA", "BBB"])
+    cashflow = asyncio.run(bulk.get_json("v3/cash-flow-statement/BBB", period="annual", limit=5))
+    assert(cashflow[0]["commonStockRepurchased"] is None)
+
+def test_unknown_ticker_returns_empty_list(bulk):
+    assert(asyncio.run(bulk.get_json("v3/key-metrics-ttm/ZZZ")) == [])
+
+def test_failed_download_keeps_tables_and_falls_back_to_the_api(tmp_path):
+    class Failing:
+        requests = []
+        async def download(self, path, file_path, **params):
+            with open(file_path, 'w') as file:
+                file.write("symbol,mktCap\nAAA,")
+            return False
+        async def get_json(self, path, **params):
+            self.requests.append(path)
+            return [{"symbol": "AAA"}]
+
+    bulk = BulkClient(str(tmp_path), client=Failing())
+    asyncio.run(bulk.ingest())
+    assert(bulk.tables == {} and list(tmp_path.iterdir()) == [])
+    assert(asyncio.run(bulk.get_json("v3/profile/AAA")) == [{"symbol": "AAA"}] and Failing.requests == ["v3/profile/AAA"])
+
+def test_empty_dumps_are_not_saved(tmp_path):
+    (tmp_path / "profile.csv").write_text('{"Error Message": "Limit Reach"}')
+    bulk = BulkClient(str(tmp_path), client=FMPClient(api_key="test"))
+    assert(bulk.parse() == [])
+    bulk.load()
+    assert(bulk.tables == {} and not bulk.is_fresh())
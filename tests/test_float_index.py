@@ -0,0 +1,44 @@
+import asyncio
+import os
+from datetime import date, timedelta
+from screener.FloatIndex import FloatIndex
+
+
+class FakeClient:
+    def __init__(self):
+        self.requests = 0
+
+    async def get_json(self, path, **params):
+        self.requests += 1
+        return [{"symbol": "AAPL", "outstandingShares": 100}, {"symbol": "MSFT", "outstandingShares": 200}, {"symbol": "GOOGL", "outstandingShares": 300}]
+
+def test_only_universe_is_materialized(tmp_path):
+    index = asyncio.run(FloatIndex(str(tmp_path)).load(FakeClient(), ["AAPL", "MSFT", "TSLA"]))
+    assert(len(index) == 2)
+    assert(index.get("MSFT") == 200)
+    assert(index.get("TSLA") == 0)
+    assert("GOOGL" not in index)
+
+def test_snapshot_is_reused_within_window(tmp_path):
+    client = FakeClient()
+    asyncio.run(FloatIndex(str(tmp_path)).load(client))
+    index = asyncio.run(FloatIndex(str(tmp_path)).load(client, ["GOOGL"]))
+    assert(client.requests == 1)
+    assert(index.get("GOOGL") == 300)
+    assert(len(os.listdir(tmp_path)) == 1)
+
+def test_stale_snapshot_is_refreshed(tmp_path):
+    (tmp_path / "shares_float_2000-01-01.json").write_text('{"AAPL": 1}')
+    client = FakeClient()
+    index = asyncio.run(FloatIndex(str(tmp_path)).load(client, ["AAPL"]))
+    assert(client.requests == 1)
+    assert(index.get("AAPL") == 100)
+
+def test_snapshot_is_fresh_up_to_max_age(tmp_path):
+    for age, max_age, requests in [(0, 0, 0), (1, 0, 1), (1, 1, 0), (2, 1, 1)]:
+        folder = tmp_path / f"{age}_{max_age}"
+        folder.mkdir()
+        (folder / f"shares_float_{(date.today() - timedelta(days=age)).isoformat()}.json").write_text('{"AAPL": 1}')
+        client = FakeClient()
+        asyncio.run(FloatIndex(str(folder), max_age_days=max_age).load(client, ["AAPL"]))
+        assert(client.requests == requests)
@@ -0,0 +1,98 @@
+import asyncio
+from aiohttp import web
+from screener.FMPClient import FMPClient, FMPRequestError
+import screener.FMPClient as fmp
+from screener.KeyPool import KeyPool
+from screener.RateLimiter import RateLimiter
+
+
+def serve(handler, test, keys=None):
+    async def main():
+        app = web.Application()
+        app.router.add_get('/api/v3/profile/{ticker}', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        old, fmp.BASE_URL = fmp.BASE_URL, f"http://127.0.0.1:{port}/api"
+        try:
+            async with FMPClient("key", RateLimiter(1000), max_retries=2, backoff=0.01, keys=keys) as client:
+                return await test(client)
+        finally:
+            fmp.BASE_URL = old
+            await runner.cleanup()
+    return asyncio.run(main())
+
+def test_client_retries_throttled_requests():
+    calls = []
+    async def handler(request):
+        calls.append(request.match_info['ticker'])
+        if len(calls) == 1:
+            return web.json_response({}, status=429, headers={"Retry-After": "0"})
+        if len(calls) == 2:
+            return web.json_response({"Error Message": "Limit Reach . Please upgrade your plan."})
+        return web.json_response([{"symbol": "AAPL"}])
+
+    async def test(client):
+        res = await client.get_json('v3/profile/AAPL')
+        return res, client.get_stats()
+
+    res, stats = serve(handler, test)
+    assert(res == [{"symbol": "AAPL"}])
+    assert(stats["retries"] == 2 and stats["throttled"] == 2 and stats["failed"] == 0)
+
+def test_client_raises_after_retries():
+    async def handler(request):
+        return web.Response(status=503)
+
+    async def test(client):
+        try:
+            await client.get_json('v3/profile/AAPL')
+        except FMPRequestError as e:
+            return e, client.get_stats()
+
+    e, stats = serve(handler, test)
+    assert(e.path == 'v3/profile/AAPL' and e.reason.startswith("503"))
+    assert(stats["requests"] == 3 and stats["failed"] == 1)
+
+def test_client_does_not_retry_client_errors():
+    async def handler(request):
+        return web.Response(status=404)
+
+    async def test(client):
+        return await client.get_json('v3/profile/AAPL'), client.get_stats()
+
+    res, stats = serve(handler, test)
+    assert(res is None and stats["requests"] == 1 and stats["retries"] == 0)
+
+def test_client_counts_malformed_bodies():
+    async def handler(request):
+        return web.Response(text="<html>maintenance</html>")
+
+    async def test(client):
+        errors = client.metrics.counters.get("screener_decode_errors_total", {}).get((("endpoint", "v3/profile"),), 0)
+        res = await client.get_json('v3/profile/AAPL')
+        return res, client.metrics.counters["screener_decode_errors_total"][(("endpoint", "v3/profile"),)] - errors
+
+    res, errors = serve(handler, test)
+    assert(res is None and errors == 1)
+
+def test_client_excludes_rejected_and_exhausted_keys():
+    async def handler(request):
+        key = request.query["apikey"]
+        if key == "bad":
+            return web.json_response({"Error Message": "Invalid API KEY. Please retry or visit our documentation."}, status=401)
+        if key == "spent":
+            return web.json_response({"Error Message": "Limit Reach . Please upgrade your plan."})
+        return web.json_response([{"symbol": request.match_info['ticker']}])
+
+    async def test(client):
+        res = [await client.get_json(f'v3/profile/T{i}') for i in range(4)]
+        return res, client.get_stats()
+
+    keys = KeyPool(["bad", "spent", "good"], [RateLimiter(1000) for _ in range(3)])
+    res, stats = serve(handler, test, keys)
+    assert(res == [[{"symbol": f"T{i}"}] for i in range(4)] and stats["retries"] == 0)
+    assert(keys.active == ["good"] and keys.usage["good"]["requests"] == 4)
+    assert(stats["keys"]["1:***"]["auth_errors"] == 1 and stats["keys"]["2:***"]["throttled"] == 1)
@@ -0,0 +1,31 @@
+from screener.Journal import Journal
+
+
+def test_journal_replays_latest_entries(tmp_path):
+    journal = Journal(str(tmp_path / "run.jsonl"), flush_every=2)
+    journal.record("ticker", "AAPL", [None, False])
+    journal.record("ticker", "MSFT", [{"Name": "Microsoft"}, False])
+    journal.record("ticker", "AAPL", [{"Name": "Apple"}, False])
+    assert(Journal(journal.path).load() == {"ticker": {"AAPL": [None, False], "MSFT": [{"Name": "Microsoft"}, False]}})
+    journal.flush()
+    assert(journal.load()["ticker"]["AAPL"] == [{"Name": "Apple"}, False])
+
+def test_journal_ignores_torn_line(tmp_path):
+    journal = Journal(str(tmp_path / "run.jsonl"))
+    journal.record("phase", "profiles", [[{"symbol": "AAPL"}]])
+    journal.flush()
+    with open(journal.path, 'a') as file:
+        file.write('{"kind":"phase","key":"pipel')
+    assert(journal.load() == {"phase": {"profiles": [[{"symbol": "AAPL"}]]}})
+    journal.record("stage", "AAPL", [0, None])
+    journal.flush()
+    assert(journal.load() == {"phase": {"profiles": [[{"symbol": "AAPL"}]]}, "stage": {"AAPL": [0, None]}})
+    journal.reset()
+    assert(journal.load() == {})
+
+def test_journal_creates_its_directory_on_first_write(tmp_path):
+    journal = Journal(str(tmp_path / "checkpoints" / "run.jsonl"))
+    assert(journal.load() == {} and not (tmp_path / "checkpoints").exists())
+    journal.record("stage", "AAPL", [0, None])
+    journal.flush()
+    assert(journal.load() == {"stage": {"AAPL": [0, None]}})
@@ -0,0 +1,41 @@
+import asyncio
+from screener.KeyPool import KeyPool, env_keys
+from screener.RateLimiter import RateLimiter
+
+
+def test_routes_to_the_key_with_most_headroom():
+    pool = KeyPool(["first-key", "second-key"], [RateLimiter(3), RateLimiter(2)])
+
+    async def main():
+        return [await pool.acquire() for _ in range(5)]
+
+    keys = asyncio.run(main())
+    assert(keys == ["first-key", "first-key", "second-key", "first-key", "second-key"])
+    assert(pool.requests_sent == 5 and pool.limit == 5)
+
+def test_never_excludes_the_last_key():
+    pool = KeyPool(["first-key", "second-key"], [RateLimiter(10), RateLimiter(10)])
+    assert(pool.exclude("first-key", "401 Unauthorized"))
+    assert(not pool.exclude("second-key", "401 Unauthorized"))
+    assert(pool.active == ["second-key"] and pool.limit == 10)
+    assert(asyncio.run(pool.acquire()) == "second-key")
+    assert("excluded (401 Unauthorized)" in pool.report().splitlines()[0])
+
+def test_reads_numbered_keys_from_env(monkeypatch):
+    for name in ("FMP_KEY", "FMP_KEY_1", "FMP_KEY_2", "FMP_KEY_10"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("FMP_KEY_10", "c")
+    monkeypatch.setenv("FMP_KEY_2", "b")
+    monkeypatch.setenv("FMP_KEY_1", "a")
+    monkeypatch.setenv("FMP_KEY", "a")
+    assert(env_keys() == ["a", "b", "c"])
+
+def test_contended_pool_works_across_event_loops():
+    pool = KeyPool(["first-key", "second-key"], [RateLimiter(1, 0.1), RateLimiter(1, 0.1)])
+
+    async def main():
+        return await asyncio.gather(*[pool.acquire() for _ in range(4)])
+
+    asyncio.run(main())
+    assert(sorted(asyncio.run(main())) == ["first-key", "first-key", "second-key", "second-key"])
+    assert(pool.requests_sent == 8)
@@ -0,0 +1,42 @@
+import math
+from screener import Metrics
+
+
+def row(ticker):
+    r = Metrics.new_row(shares=10)
+    r.update(Metrics.profile_fields({"mktCap": 1000, "lastDiv": 0, "companyName": ticker, "country": "US", "industry": "Tech"}))
+    r.update(Metrics.balance_sheet_fields([{"totalCurrentAssets": 900, "totalLiabilities": 100, "netDebt": -1}]))
+    r.update(Metrics.cashflow_fields([{"freeCashFlow": 300, "commonStockRepurchased": -1, "cashAtEndOfPeriod": 50}, {"freeCashFlow": -100, "commonStockRepurchased": 0}]))
+    r.update(Metrics.key_metrics_fields([{"marketCapTTM": 1200, "freeCashFlowPerShareTTM": 2, "enterpriseValueTTM": 500, "tangibleAssetValueTTM": 2000}]))
+    r.update(Metrics.historical_fields({"historical": [{"close": 10}, {"close": 20}]}))
+    return r
+
+def test_row_metrics():
+    r = Metrics.compute(row("A"))
+    assert(r["ncav_ratio"] == 1.25)
+    assert(r["fcf_average"] == 40 and r["fcf_average_ttm"] == 44)
+    assert(r["fcf_negative_years"] == 1 and r["buybacks"] == -1 and r["cash"] == 50)
+    assert(r["price_metric"] == 100)
+    assert(r["fv_upside"] == (40 * 7 + 50 - 1000) / 1000 * 100)
+    assert(Metrics.pafcf(r, "market_cap_ttm") == 1200 / 44)
+
+def test_missing_data_and_zero_division_are_nan():
+    r = row("A")
+    r.update(Metrics.key_metrics_fields([{"tangibleAssetValueTTM": 0}]))
+    r.update(Metrics.balance_sheet_fields(None))
+    r = Metrics.compute(r)
+    assert(math.isnan(r["ptbv"]) and math.isnan(r["ev_afcf"]))
+    assert(r["ncav_ratio"] == 1.25)
+    assert(math.isnan(Metrics.compute(Metrics.new_row())["ncav_ratio"]))
+
+def test_frame_matches_rows():
+    rows = {t: row(t) for t in ["A", "B", "C"]}
+    rows["B"]["current_assets"] = 100
+    rows["C"]["close"] = 0
+    frame = Metrics.compute(Metrics.to_frame(rows))
+    for ticker, r in rows.items():
+        expected = Metrics.compute(dict(r))
+        for name in Metrics.METRICS:
+            value = frame.at[ticker, name]
+            assert(value == expected[name] or (math.isnan(value) and math.isnan(expected[name])))
+    assert(math.isnan(frame.at["B", "ncav_ratio"]) and math.isnan(frame.at["C", "price_metric"]))
@@ -0,0 +1,82 @@
+import aiohttp
+import asyncio
+import pytest
+from screenerV3.pipeline import Pipeline, Stage
+from screener.FMPClient import FMPRequestError
+from screener.Journal import Journal
+
+
+def keep_even(ticker, record, payload):
+    record["seen"] = payload
+    return payload % 2 == 0
+
+def test_pipeline_streams_survivors_in_order():
+    async def fetch(ticker):
+        await asyncio.sleep(0.01 * (5 - int(ticker)))
+        return int(ticker)
+
+    records = {str(i): {} for i in range(5)}
+    first = Stage("fetch", keep_even, fetch, concurrency=3)
+    second = Stage("compute", lambda ticker, record, payload: record["seen"] != 4)
+    res = asyncio.run(Pipeline([first, second], queue_size=1).run(records))
+
+    assert(list(res.keys()) == ["0", "2"])
+    assert(first.received == 5 and first.removed == 2)
+    assert(second.received == 3 and second.removed == 1)
+
+def test_pipeline_drops_on_error():
+    async def fetch(ticker):
+        if ticker == "BAD":
+            raise aiohttp.ClientConnectionError(ticker)
+        if ticker == "BUG":
+            raise ValueError(ticker)
+        return 2
+
+    records = {"BAD": {}, "GOOD": {}}
+    res = asyncio.run(Pipeline([Stage("fetch", keep_even, fetch)]).run(records))
+    assert(list(res.keys()) == ["GOOD"]) # no payload: keep_even raises on None
+    with pytest.raises(ValueError):
+        asyncio.run(Pipeline([Stage("fetch", keep_even, fetch)]).run({"BUG": {}, "GOOD": {}}))
+
+def test_pipeline_retries_deferred_tickers():
+    attempts = {}
+    async def fetch(ticker):
+        attempts[ticker] = attempts.get(ticker, 0) + 1
+        if ticker == "SLOW" and attempts[ticker] == 1:
+            raise FMPRequestError(ticker, "429 Too Many Requests")
+        if ticker == "DOWN":
+            raise FMPRequestError(ticker, "503 Service Unavailable")
+        return 2
+
+    records = {"SLOW": {}, "DOWN": {}, "GOOD": {}}
+    first = Stage("first", lambda ticker, record, payload: True)
+    second = Stage("fetch", keep_even, fetch)
+    pipeline = Pipeline([first, second], retries=2, retry_delay=0)
+    res = asyncio.run(pipeline.run(records))
+    assert(list(res.keys()) == ["SLOW", "GOOD"])
+    assert(attempts == {"SLOW": 2, "DOWN": 3, "GOOD": 1})
+    assert(first.received == 3 and second.received == 2)
+    assert(pipeline.deferred == [(1, ("DOWN", {}))])
+
+def test_pipeline_resumes_from_journal(tmp_path):
+    journal = Journal(str(tmp_path / "run.jsonl"))
+    fetched = []
+    async def fetch(ticker):
+        fetched.append(ticker)
+        return 2
+
+    def build():
+        first = Stage("first", keep_even, fetch)
+        second = Stage("second", lambda ticker, record, payload: record["seen"] == 2)
+        return Pipeline([first, second], journal=journal)
+
+    journal.record("stage", "A", [0, {"seen": 2}])
+    journal.record("stage", "B", [0, None])
+    journal.record("stage", "C", [1, {"seen": 2}])
+    journal.flush()
+    pipeline = build()
+    records = {t: {} for t in ["A", "B", "C", "D"]}
+    res = asyncio.run(pipeline.run(*pipeline.resume(records, journal.load()["stage"])))
+    assert(list(res.keys()) == ["A", "C", "D"])
+    assert(fetched == ["D"])
+    assert(journal.load()["stage"]["D"] == [1, {"seen": 2}])
@@ -0,0 +1,74 @@
+import asyncio
+from aiohttp import web
+from screener.FMPClient import FMPClient
+from screener.KeyPool import KeyPool
+from screener.RateLimiter import RateLimiter
+import screener.FMPClient as fmp
+from screenerV3.pipeline import Pipeline, Stage
+from screenerV3.planner import Planner
+
+
+async def fetch(ticker):
+    return int(ticker)
+
+def stages():
+    return [
+        Stage("cheap_lenient", lambda t, r, p: True, fetch),
+        Stage("expensive_strict", lambda t, r, p: True, fetch),
+        Stage("derived", lambda t, r, p: True, requires=["expensive_strict"]),
+        Stage("cheap_strict", lambda t, r, p: True, fetch),
+    ]
+
+def test_unmeasured_stages_keep_declared_order(tmp_path):
+    planner = Planner(str(tmp_path / "plan.json"), min_samples=1)
+    planner.stats = {"cheap_strict": {"received": 100, "passed": 20, "fetch_seconds": 10}}
+    order = [stage.name for stage in planner.plan(stages())]
+    assert(order == ["cheap_lenient", "expensive_strict", "derived", "cheap_strict"])
+
+def test_plan_by_rank_and_requirements(tmp_path):
+    path = str(tmp_path / "plan.json")
+    planner = Planner(path, min_samples=1)
+    planner.stats = {
+        "cheap_lenient": {"received": 100, "passed": 95, "fetch_seconds": 10},      # 2.0
+        "expensive_strict": {"received": 100, "passed": 20, "fetch_seconds": 80},   # 1.0
+        "cheap_strict": {"received": 100, "passed": 20, "fetch_seconds": 10},       # 0.125
+    }
+    order = [stage.name for stage in planner.plan(stages())]
+    assert(order == ["cheap_strict", "expensive_strict", "derived", "cheap_lenient"])
+    assert("cheap_strict (20% pass, 0.100s)" in planner.describe(planner.plan(stages())))
+
+def test_record_persists_pipeline_counters(tmp_path):
+    path = str(tmp_path / "plans" / "plan.json")
+    stage = Stage("even", lambda t, r, p: p % 2 == 0, fetch)
+    asyncio.run(Pipeline([stage]).run({str(i): {} for i in range(10)}))
+    Planner(path).record([stage])
+    Planner(path).record([stage])
+
+    planner = Planner(path, decay=0.5, min_samples=1)
+    assert(planner.stats["even"]["received"] == 15)
+    assert(planner.pass_rate("even") == 0.5)
+    assert(planner.cost("even") >= 0)
+
+def test_stage_cost_leaves_out_rate_limit_waits():
+    async def handler(request):
+        return web.json_response([{"symbol": request.match_info['ticker']}])
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/api/v3/profile/{ticker}', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        old, fmp.BASE_URL = fmp.BASE_URL, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/api"
+        try:
+            async with FMPClient(keys=KeyPool(["key"], [RateLimiter(1, 0.1)])) as client:
+                stage = Stage("profile", lambda t, r, p: True, lambda ticker: client.get_json(f'v3/profile/{ticker}'), concurrency=1)
+                await Pipeline([stage]).run({f"T{i}": {} for i in range(5)})
+                return stage, client.keys.seconds_waited
+        finally:
+            fmp.BASE_URL = old
+            await runner.cleanup()
+
+    stage, waited = asyncio.run(main())
+    assert(waited >= 0.3 and stage.fetch_seconds < 0.2)
@@ -0,0 +1,151 @@
+import asyncio
+import math
+from datetime import date, datetime, timedelta, timezone
+from screener import PriceStore as price_store
+from screener.PriceStore import PriceStore
+from screenerV3.utilities import Handler
+
+
+class FakeClient:
+    def __init__(self, closes: dict):
+        self.closes = closes # date -> close
+        self.calls = []
+
+    async def get_json(self, path, **params):
+        self.calls.append(params)
+        await asyncio.sleep(0)
+        start, end = date.fromisoformat(params["from"]), date.fromisoformat(params["to"])
+        rows = [{"date": d.isoformat(), "close": c} for d, c in sorted(self.closes.items(), reverse=True) if start <= d <= end]
+        return {"symbol": path.rpartition('/')[2], "historical": rows} if rows else {}
+
+def history(today, days, close=lambda i: 10.0 + i):
+    return {today - timedelta(days=days - 1 - i): close(i) for i in range(days)}
+
+def test_fills_window_then_only_missing_days(tmp_path):
+    today = date(2024, 6, 3)
+    client = FakeClient(history(today, 3000))
+    store = PriceStore(str(tmp_path), years=5)
+    assert(asyncio.run(store.update(client, "AAA", today)))
+    assert(client.calls[0]["from"] == "2019-06-03" and client.calls[0]["serietype"] == "line")
+    store.save()
+
+    later = today + timedelta(days=3)
+    client.closes.update({today + timedelta(days=i): 5000.0 + i for i in range(1, 4)})
+    store = PriceStore(str(tmp_path), years=5)
+    asyncio.run(store.update(client, "AAA", later))
+    asyncio.run(store.update(client, "AAA", later)) # already checked today
+    assert(len(client.calls) == 2 and client.calls[1]["from"] == today.isoformat())
+    assert(store.fields("AAA", later) == {"close": 5003.0, "max_close": 5003.0})
+    store.save()
+
+    days, closes = PriceStore(str(tmp_path)).series("AAA")
+    assert(len(days) == len(set(days.tolist())) and list(days) == sorted(days))
+
+def test_restated_history_is_refetched(tmp_path):
+    today = date(2024, 6, 3)
+    client = FakeClient(history(today, 100))
+    store = PriceStore(str(tmp_path))
+    asyncio.run(store.update(client, "AAA", today))
+    store.save()
+
+    client.closes = history(today + timedelta(days=1), 101, lambda i: (10.0 + i) / 2) # 2:1 split
+    asyncio.run(store.update(client, "AAA", today + timedelta(days=1)))
+    days, closes = store.series("AAA")
+    assert(len(client.calls) == 3 and len(days) == 101)
+    assert(closes[-1] == 55.0)
+
+def test_summary_is_a_window_reduction(tmp_path):
+    today = date(2024, 6, 3)
+    client = FakeClient(history(today, 2500, lambda i: 1000.0 if i == 0 else float(i % 50)))
+    store = PriceStore(str(tmp_path), years=5)
+    store.years = 7 # store more than the summary window
+    asyncio.run(store.update(client, "AAA", today))
+    client.closes = history(today, 10)
+    asyncio.run(store.update(client, "BBB", today))
+    store.years = 5
+    frame = store.summary(["AAA", "BBB", "CCC"], today)
+    assert(frame.loc["AAA", "max_close"] == 49 and frame.loc["AAA", "close"] == 2499 % 50)
+    assert(frame.loc["BBB", "close"] == 19 and frame.loc["BBB", "max_close"] == 19)
+    assert(math.isnan(frame.loc["CCC", "close"]) and store.fields("CCC", today) == {})
+
+def test_rewrite_compacts_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_store, "MAX_SEGMENTS", 2)
+    today = date(2024, 6, 3)
+    client = FakeClient(history(today, 30))
+    store = PriceStore(str(tmp_path), years=1)
+    for i in range(4):
+        day = today + timedelta(days=i)
+        client.closes[day] = 100.0 + i
+        asyncio.run(store.update(client, "AAA", day))
+        store.save(day)
+    days, closes = PriceStore(str(tmp_path)).series("AAA")
+    assert(len(days) == 33 and closes[-1] == 103.0)
+    assert(len(list(tmp_path.glob("days.*.bin"))) == 1)
+
+def test_arrays_still_mapped_elsewhere_are_removed_by_a_later_save(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_store, "MAX_SEGMENTS", 1)
+    today = date(2024, 6, 3)
+    client = FakeClient(history(today, 30))
+    store = PriceStore(str(tmp_path), years=1)
+    asyncio.run(store.update(client, "AAA", today))
+    store.save(today)
+    reader = PriceStore(str(tmp_path), years=1) # maps generation 0
+
+    def mapped(path):
+        raise PermissionError(path) # as Windows refuses while `reader` maps the file
+    with monkeypatch.context() as patched:
+        patched.setattr(price_store.os, "remove", mapped)
+        client.closes[today + timedelta(days=1)] = 50.0
+        asyncio.run(store.update(client, "AAA", today + timedelta(days=1)))
+        store.save(today + timedelta(days=1))
+    assert(sorted(path.name for path in tmp_path.glob("days.*.bin")) == ["days.0.bin", "days.1.bin"])
+    assert(reader.series("AAA")[1][-1] == 39.0)
+
+    asyncio.run(store.update(client, "BBB", today + timedelta(days=1)))
+    store.save(today + timedelta(days=1))
+    assert([path.name for path in tmp_path.glob("closes.*.bin")] == ["closes.2.bin"])
+    assert(PriceStore(str(tmp_path)).series("AAA")[1][-1] == 50.0)
+
+def test_processes_saving_disjoint_tickers_share_the_store(tmp_path):
+    today = date(2024, 6, 3)
+    client = FakeClient(history(today, 30))
+    first, second = PriceStore(str(tmp_path), years=1), PriceStore(str(tmp_path), years=1)
+    asyncio.run(first.update(client, "AAA", today))
+    asyncio.run(second.update(client, "BBB", today))
+    first.save(today)
+    second.save(today)
+    store = PriceStore(str(tmp_path))
+    assert("AAA" in store and "BBB" in store)
+    assert(store.fields("AAA", today) == store.fields("BBB", today) == {"close": 39.0, "max_close": 39.0})
+
+def test_concurrent_updates_of_a_ticker_fetch_once(tmp_path):
+    today = date(2024, 6, 3)
+    client = FakeClient(history(today, 30))
+    store = PriceStore(str(tmp_path), years=1)
+
+    async def main():
+        return await asyncio.gather(store.update(client, "AAA", today), store.update(client, "AAA", today))
+
+    assert(asyncio.run(main()) == [True, True] and len(client.calls) == 1)
+    assert(len(store.series("AAA")[0]) == 30)
+
+def test_handler_summarizes_concurrent_tickers_at_once(tmp_path, monkeypatch):
+    today = datetime.now(timezone.utc).date()
+    client = FakeClient(history(today, 30))
+    client.api_key = "key"
+    store = PriceStore(str(tmp_path), years=1)
+    for ticker in ("AAA", "BBB"):
+        asyncio.run(store.update(client, ticker, today))
+    client.closes = {}
+    asyncio.run(store.update(client, "CCC", today))
+    summaries = []
+    summary = store.summary
+    monkeypatch.setattr(store, "summary", lambda tickers, today=None: summaries.append(list(tickers)) or summary(tickers, today))
+    handler = Handler(client, store)
+
+    async def main():
+        return await asyncio.gather(*[handler.get_historical(ticker) for ticker in ("AAA", "BBB", "CCC")])
+
+    fields = asyncio.run(main())
+    assert(summaries == [["AAA", "BBB", "CCC"]])
+    assert(fields[0] == fields[1] == {"close": 39.0, "max_close": 39.0} and fields[2] == {})
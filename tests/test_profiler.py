@@ -0,0 +1,44 @@
+import asyncio
+import json
+import os
+import time
+from screener.Profiler import LoopLagMonitor, RunProfiler, mark_phase
+from screener.RunMetrics import RunMetrics
+
+
+def block_the_loop():
+    time.sleep(0.3)
+
+def test_monitor_flags_blocking_callbacks_with_their_stack():
+    metrics = RunMetrics()
+    monitor = LoopLagMonitor(threshold_ms=100, metrics=metrics)
+
+    async def main():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        block_the_loop()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(main())
+    assert(len(monitor.blocks) == 1 and monitor.blocks[0]["lag_ms"] >= 250)
+    assert("block_the_loop" in monitor.blocks[0]["stack"])
+    assert(metrics.counters["screener_loop_blocked_total"] == {(): 1})
+
+def test_profiler_writes_a_profile_per_phase(tmp_path):
+    path = str(tmp_path / "profile")
+
+    async def main():
+        async with RunProfiler(path, lag_threshold_ms=1000):
+            assert(len([str(i) for i in range(100000)]) == 100000) # freed before the phase ends
+            mark_phase("alpha", "profiles")
+            await asyncio.sleep(0.01)
+            mark_phase("alpha", "stage:cashflow")
+        mark_phase("alpha", "ignored") # no profiler running
+
+    asyncio.run(main())
+    with open(os.path.join(path, "profile.json")) as file:
+        report = json.load(file)
+    assert([i["phase"] for i in report["phases"]] == ["profiles", "stage:cashflow", "other"])
+    assert(report["phases"][0]["peak_traced_mb"] > report["phases"][1]["peak_traced_mb"])
+    assert(os.path.exists(os.path.join(path, "alpha.stage_cashflow.prof")) and report["loop_blocks"] == [])
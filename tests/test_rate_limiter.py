@@ -0,0 +1,46 @@
+import asyncio
+import time
+from screener.RateLimiter import RateLimiter
+
+
+def test_limit_not_exceeded_within_window():
+    limiter = RateLimiter(limit=5, period=0.5)
+
+    async def send(n):
+        for _ in range(n):
+            await limiter.acquire()
+
+    start = time.monotonic()
+    asyncio.run(send(5))
+    assert(time.monotonic() - start < 0.25)
+
+    limiter = RateLimiter(limit=5, period=0.5)
+    start = time.monotonic()
+    asyncio.run(send(6))
+    assert(time.monotonic() - start >= 0.5)
+    assert(limiter.requests_sent == 6)
+
+def test_concurrent_callers_share_budget():
+    limiter = RateLimiter(limit=4, period=0.5)
+
+    async def main():
+        await asyncio.gather(*[limiter.acquire() for _ in range(8)])
+
+    start = time.monotonic()
+    asyncio.run(main())
+    assert(time.monotonic() - start >= 0.5)
+    assert(limiter.seconds_waited > 0)
+
+def test_estimate_minutes():
+    limiter = RateLimiter(limit=300)
+    assert(limiter.estimate_minutes(3000) == 10)
+
+def test_contended_limiter_works_across_event_loops():
+    limiter = RateLimiter(limit=2, period=0.2)
+
+    async def main():
+        await asyncio.gather(*[limiter.acquire() for _ in range(4)])
+
+    asyncio.run(main())
+    asyncio.run(main()) # a lock bound to the first loop would raise here
+    assert(limiter.requests_sent == 8)
@@ -0,0 +1,45 @@
+import json
+from screener import Metrics
+from screener.Journal import Journal
+from screener.Records import Profile, Price, decode, project
+from screener.ResponseCache import ResponseCache
+from screener.RunMetrics import RunMetrics
+
+
+def test_profiles_keep_only_the_fields_read():
+    body = json.dumps([
+        {"symbol": "AAA", "companyName": "A Corp", "mktCap": 5000000, "lastDiv": None, "country": "US", "industry": "Software", "exchange": "NASDAQ", "description": "x" * 1000},
+        {"symbol": "BBB", "mktCap": "1.5e6"},
+    ]).encode()
+    a, b = decode("v3/profile", body)
+    assert(isinstance(a, Profile) and not hasattr(a, "__dict__"))
+    assert(dict(a) == {"symbol": "AAA", "companyName": "A Corp", "mktCap": 5000000, "lastDiv": None, "country": "US", "industry": "Software", "exchange": "NASDAQ"})
+    assert(a["mktCap"] == 5000000 and a.get("lastDiv", 0) is None and b.get("lastDiv", 0) == 0 and b["mktCap"] == 1.5e6)
+    assert("description" not in a and Metrics.profile_fields(a)["market_cap"] == 5000000)
+
+def test_malformed_records_are_dropped_and_counted():
+    metrics = RunMetrics()
+    body = b'[{"symbol": "AAA", "mktCap": 10}, {"symbol": "BBB", "mktCap": "n/a"}, {"symbol": ["CCC"]}, 3]'
+    profiles = decode("v3/profile", body, metrics)
+    assert([i["symbol"] for i in profiles] == ["AAA"])
+    assert(metrics.counters["screener_decode_errors_total"] == {(("endpoint", "v3/profile"),): 3})
+
+def test_other_payloads_pass_through():
+    error = {"Error Message": "Limit Reach . Please upgrade your plan."}
+    assert(decode("v3/profile", json.dumps(error).encode()) == error)
+    assert(decode("v3/historical-price-full", b"{}") == {})
+    assert(decode("v4/insider-trading", b'[{"a": 1}]') == [{"a": 1}])
+    prices = decode("v3/historical-price-full", b'{"symbol": "AAA", "historical": [{"date": "2024-01-02", "open": 1, "close": 2.5, "volume": 9}]}')
+    assert(isinstance(prices["historical"][0], Price) and dict(prices["historical"][0]) == {"date": "2024-01-02", "close": 2.5})
+
+def test_records_round_trip_through_the_cache_and_journal(tmp_path):
+    profiles = project("v3/profile", [{"symbol": "AAA", "mktCap": 10, "extra": 1}])
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    cache.put("v3/profile", "AAA", {}, profiles)
+    assert(project("v3/profile", cache.get("v3/profile", "AAA", {})) == profiles)
+    cache.close()
+
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    journal.record("phase", "profiles", [profiles])
+    journal.flush()
+    assert(Journal(str(tmp_path / "journal.jsonl")).load()["phase"]["profiles"] == [[{"symbol": "AAA", "mktCap": 10}]])
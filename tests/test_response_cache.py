@@ -0,0 +1,71 @@
+from datetime import date, datetime, timezone
+from screener.ResponseCache import ResponseCache, next_close, next_filing
+import asyncio
+
+
+def test_hit_miss_and_params_in_key(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    assert(cache.get("v3/profile", "AAPL") is None)
+    cache.put("v3/profile", "AAPL", {}, [{"symbol": "AAPL"}])
+    assert(cache.get("v3/profile", "AAPL") == [{"symbol": "AAPL"}])
+    assert(cache.get("v3/profile", "AAPL", {"period": "quarter"}) is None)
+    assert(cache.get_stats()["cache_hits"] == 1)
+    assert(cache.get_stats()["cache_misses"] == 2)
+
+def test_expired_and_uncacheable_responses(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttls={"v3/profile": -1})
+    cache.put("v3/profile", "AAPL", {}, [{"symbol": "AAPL"}])
+    cache.put("v3/key-metrics-ttm", "AAPL", {}, {"Error Message": "Limit Reach"})
+    cache.put("v3/unknown", "AAPL", {}, [1])
+    assert(cache.get("v3/profile", "AAPL") is None)
+    assert(cache.get("v3/key-metrics-ttm", "AAPL") is None)
+    assert(cache.get("v3/unknown", "AAPL") is None)
+
+def test_persists_and_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, max_bytes=10 ** 6)
+    cache.put("v3/profile", "OLD", {}, [{"symbol": "OLD"}])
+    cache.put("v3/profile", "NEW", {}, [{"symbol": "NEW"}])
+    cache.close()
+
+    cache = ResponseCache(path, max_bytes=40)
+    assert(cache.get("v3/profile", "NEW") is not None)
+    cache.put("v3/profile", "NEWEST", {}, [{"symbol": "NEWEST"}])
+    assert(cache.get("v3/profile", "OLD") is None)
+    assert(cache.get("v3/profile", "NEWEST") is not None)
+    assert(cache.get_stats()["cache_evictions"] >= 1)
+
+def test_next_close_skips_weekends():
+    friday_night = datetime(2024, 5, 10, 22, 0, tzinfo=timezone.utc)
+    assert(next_close(friday_night) == datetime(2024, 5, 13, 21, 0, tzinfo=timezone.utc))
+
+def test_next_filing_follows_cadence():
+    now = datetime(2024, 5, 10, tzinfo=timezone.utc)
+    quarters = [{"date": "2024-03-31", "fillingDate": "2024-04-25"}, {"date": "2023-12-31", "fillingDate": "2024-02-01"}]
+    assert(next_filing(quarters, "quarter", now) == datetime(2024, 7, 18, tzinfo=timezone.utc))
+    assert(next_filing(quarters, "annual", now) == datetime(2025, 4, 18, tzinfo=timezone.utc))
+    late = [{"date": "2023-09-30", "fillingDate": "2023-11-01"}]
+    assert(next_filing(late, "quarter", now) == datetime(2024, 5, 11, tzinfo=timezone.utc))
+
+class CalendarClient:
+    def __init__(self):
+        self.requests = []
+
+    async def get_json(self, path, **params):
+        self.requests.append(params)
+        return [{"symbol": "AAPL", "date": "2024-05-02"}]
+
+def test_sync_filings_invalidates_reported_tickers(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    statements = [{"date": "2024-03-31", "fillingDate": "2099-01-01"}]
+    for ticker in ["AAPL", "MSFT"]:
+        cache.put("v3/balance-sheet-statement", ticker, {"period": "quarter"}, statements)
+        cache.put("v3/profile", ticker, {}, [{"symbol": ticker}])
+    client = CalendarClient()
+    assert(asyncio.run(cache.sync_filings(client, date(2024, 1, 1))) == 0)
+    assert(client.requests == [])
+    assert(asyncio.run(cache.sync_filings(client, date(2024, 5, 10))) == 1)
+    assert(len(client.requests) == 2 and client.requests[0]["from"] == "2023-12-25")
+    assert(cache.get("v3/balance-sheet-statement", "AAPL", {"period": "quarter"}) is None)
+    assert(cache.get("v3/balance-sheet-statement", "MSFT", {"period": "quarter"}) is not None)
+    assert(cache.get("v3/profile", "AAPL") is not None)
@@ -0,0 +1,60 @@
+import math
+import pickle
+import numpy as np
+import pandas as pd
+from screener import Metrics
+from screener.Results import Results
+
+
+def sample() -> Results:
+    return Results.from_frame(pd.DataFrame({
+        "Name": ["A Corp", "B Corp", "C Corp"],
+        "NCAV Ratio": [1.5, np.nan, 0.5],
+        "P/aFCF Ratio": [12.0, 3.0, np.nan],
+        "isAdded": [True, False, True],
+    }, index=["AAA", "BBB", "CCC"]))
+
+def test_columns_have_fixed_types_and_rows_read_as_dicts():
+    results = sample()
+    assert(results.columns["NCAV Ratio"].dtype == np.float64 and results.columns["isAdded"].dtype == bool)
+    assert(list(results) == ["AAA", "BBB", "CCC"] and "BBB" in results and "ZZZ" not in results)
+    assert(dict(results["AAA"]) == {"Name": "A Corp", "NCAV Ratio": 1.5, "P/aFCF Ratio": 12.0, "isAdded": True})
+    assert(math.isnan(results["BBB"]["NCAV Ratio"]) and type(results["CCC"]["isAdded"]) is bool)
+    assert([k for k, v in results.items() if v["isAdded"]] == ["AAA", "CCC"])
+
+    results["BBB"]["Payback Rating"] = 2
+    results["AAA"]["isAdded"] = "buyback"
+    assert(results["BBB"]["Payback Rating"] == 2 and math.isnan(results["AAA"]["Payback Rating"]))
+    assert(results["AAA"]["isAdded"] == "buyback" and results["CCC"]["isAdded"] is True)
+
+def test_filter_sort_and_merge():
+    results = sample()
+    assert(list(results.filter(~(results.column("P/aFCF Ratio") > 10))) == ["BBB", "CCC"]) # NaN isn't above 10
+    assert(list(results.sort("NCAV Ratio")) == ["CCC", "AAA", "BBB"]) # NaN sorts last
+    assert(list(results.drop(["AAA", "ZZZ"])) == ["BBB", "CCC"])
+    assert(results.pop("BBB")["Name"] == "B Corp" and list(results) == ["AAA", "CCC"] and results.pop("BBB", None) is None)
+
+    merged = Results.concat([results, Results(), {"DDD": {"Name": "D Corp", "NCAV Ratio": 0.1}}])
+    assert(list(merged) == ["AAA", "CCC", "DDD"] and merged["DDD"]["NCAV Ratio"] == 0.1 and math.isnan(merged["DDD"]["P/aFCF Ratio"]))
+    assert(pickle.loads(pickle.dumps(merged)).to_dict().keys() == merged.to_dict().keys())
+
+def test_frames_share_the_columns():
+    results = sample()
+    frame = results.to_frame()
+    assert(list(frame.index) == ["AAA", "BBB", "CCC"] and list(frame.columns) == list(results.columns))
+    assert(np.shares_memory(frame["NCAV Ratio"].to_numpy(), results.columns["NCAV Ratio"]))
+    assert(Results.from_frame(frame).to_dict().keys() == results.to_dict().keys())
+
+def test_payback_rating():
+    rating = Metrics.payback_rating([200, 0, 0, 0, 0, np.nan], [10, 100, 50, 34, 10, 10], [100, 100, 100, 100, 100, 100])
+    assert(list(rating[:4]) == [0.5, 1, 2, 3] and np.isnan(rating[4]) and np.isnan(rating[5]))
+
+def test_append_grows_the_columns_in_place():
+    results = Results()
+    for i in range(40):
+        results.append(f"T{i}", {"NCAV Ratio": i / 2, "Name": f"{i} Corp", **({"EV": 1} if i == 39 else {})})
+    results.append("T0", {"NCAV Ratio": 9.0})
+    assert(len(results) == 40 and results.columns["NCAV Ratio"].dtype == np.float64 and results.columns["Name"].dtype == object)
+    assert(results["T0"]["NCAV Ratio"] == 9.0 and math.isnan(results["T0"]["Name"]) and results["T39"]["EV"] == 1)
+    assert(math.isnan(results["T1"]["EV"]) and list(results)[:2] == ["T0", "T1"])
+    assert(len(pickle.loads(pickle.dumps(results))) == 40)
@@ -0,0 +1,55 @@
+import json
+import pytest
+from screener import Metrics
+from screener.Rules import Rules, ALPHA_RULES, BETA_RULES
+
+
+def profile(ticker, **fields):
+    p = {"symbol": ticker, "mktCap": 1000, "lastDiv": 0, "companyName": ticker, "country": "US", "industry": "Tech", "exchange": "X"}
+    p.update(fields)
+    return Metrics.new_row(**Metrics.profile_fields(p))
+
+def test_profile_rule_matches_on_rows_and_frames():
+    rows = {
+        "A": profile("A"),
+        "B": profile("B", country="CN"),
+        "C": profile("C", industry="Banks - Regional"),
+        "D": profile("D", industry="Asset Management"),
+        "E": profile("E", industry=None),
+        "F": profile("F", mktCap=0),
+        "G": profile("G", lastDiv="n/a"),
+    }
+    rules = Rules(ALPHA_RULES)
+    mask = rules.evaluate("profile", Metrics.to_frame(rows))
+    assert(list(mask[mask].index) == ["A"])
+    for ticker, r in rows.items():
+        assert(rules.evaluate("profile", r) == mask[ticker])
+
+def test_rule_references_and_negation():
+    rules = Rules(BETA_RULES)
+    r = Metrics.new_row(market_cap=1000, current_assets=900, total_liabilities=100, tangible_assets_ttm=500)
+    assert(rules.evaluate("ncav", r) and not rules.evaluate("ptbv", r))
+    assert(rules.evaluate("isAdded", r))
+    r["total_liabilities"] = 850
+    assert(not rules.evaluate("isAdded", r))
+
+    rules = Rules({"cashflow": ALPHA_RULES["cashflow"]})
+    r = Metrics.new_row(market_cap=100, fcf_sum=100, last_div=0, buybacks=0)
+    assert(not rules.evaluate("cashflow", r))
+    r["buybacks"] = -1
+    assert(rules.evaluate("cashflow", r))
+
+def test_invalid_specs_raise():
+    with pytest.raises(ValueError):
+        Rules({"a": {"field": "ptbv", "between": [0, 1]}})
+    with pytest.raises(ValueError):
+        Rules({"a": {"rule": "b"}})
+
+def test_spec_from_file(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"cheap": {"field": "ptbv", "gt": 0, "lt": 1}}))
+    rules = Rules(str(path))
+    assert("cheap" in rules)
+    frame = Metrics.to_frame({"A": Metrics.new_row(market_cap=1, tangible_assets_ttm=2), "B": Metrics.new_row(market_cap=2, tangible_assets_ttm=1)})
+    masks = rules.masks(frame)
+    assert(list(masks["cheap"]) == [True, False])
@@ -0,0 +1,63 @@
+import asyncio
+import json
+from screener.FMPClient import FMPClient
+import screener.FMPClient as fmp
+from screener.FMPStandIn import FMPStandIn
+from screener.RateLimiter import RateLimiter
+from screener.RunMetrics import RunMetrics
+
+
+def test_histograms_and_prometheus_exposition():
+    metrics = RunMetrics()
+    for seconds in [0.01, 0.02, 0.2, 0.3, 40]:
+        metrics.observe("screener_fmp_request_seconds", seconds, endpoint="v3/profile")
+    metrics.inc("screener_fmp_throttled_total", endpoint="v3/profile")
+    metrics.set_max("screener_queue_depth_max", 3, module="alpha", stage="cashflow")
+    metrics.set_max("screener_queue_depth_max", 2, module="alpha", stage="cashflow")
+    metrics.record_phase("alpha", "profiles", 1.5, 10, 4)
+
+    report = json.loads(json.dumps(metrics.report()))
+    histogram = report["histograms"]["screener_fmp_request_seconds"][0]
+    assert(histogram["count"] == 5 and histogram["buckets"]["0.025"] == 2 and histogram["buckets"]["+Inf"] == 5)
+    assert(0.1 < histogram["p50"] < 0.25 and histogram["p99"] == 30.0)
+    assert(report["gauges"]["screener_queue_depth_max"] == [{"labels": {"module": "alpha", "stage": "cashflow"}, "value": 3}])
+    assert(report["phases"] == [{"module": "alpha", "phase": "profiles", "seconds": 1.5, "tickers_in": 10, "tickers_out": 4}])
+
+    text = metrics.to_prometheus()
+    assert("# TYPE screener_fmp_request_seconds histogram" in text)
+    assert('screener_fmp_request_seconds_bucket{endpoint="v3/profile",le="0.25"} 3' in text)
+    assert('screener_fmp_request_seconds_count{endpoint="v3/profile"} 5' in text)
+    assert('screener_phase_tickers_out_total{module="alpha",phase="profiles"} 4' in text)
+
+def test_merge_adds_another_process_metrics():
+    a, b = RunMetrics(), RunMetrics()
+    a.inc("screener_fmp_requests_total", endpoint="v3/profile", status=200)
+    b.inc("screener_fmp_requests_total", 2, endpoint="v3/profile", status=200)
+    b.observe("screener_batch_seconds", 2.0, module="screener2")
+    b.record_phase("beta", "profiles", 1.0)
+    a.merge(b)
+    assert(a.counters["screener_fmp_requests_total"] == {(("endpoint", "v3/profile"), ("status", "200")): 3})
+    assert(a.histograms["screener_batch_seconds"][(("module", "screener2"),)][2] == 1 and len(a.phases) == 1)
+
+def test_client_records_requests_bytes_and_throttling():
+    metrics = RunMetrics()
+
+    async def main():
+        async with FMPStandIn(["AAA"], throttle_rate=0.5, seed=3) as stand_in:
+            old, fmp.BASE_URL = fmp.BASE_URL, stand_in.url
+            try:
+                async with FMPClient("key", RateLimiter(1000), max_retries=10, backoff=0.001, metrics=metrics) as client:
+                    for ticker in ["AAA", "BBB", "CCC"]:
+                        await client.get_json(f'v3/profile/{ticker}')
+                    await client.get_json('v4/shares_float/all')
+                return stand_in.get_stats()
+            finally:
+                fmp.BASE_URL = old
+
+    served = asyncio.run(main())
+    requests = metrics.counters["screener_fmp_requests_total"]
+    assert(requests[(("endpoint", "v3/profile"), ("status", "200"))] == 3)
+    assert(requests[(("endpoint", "v4/shares_float"), ("status", "200"))] == 1)
+    assert(sum(metrics.counters["screener_fmp_throttled_total"].values()) == served["throttled"] > 0)
+    assert(metrics.counters["screener_fmp_response_bytes_total"][(("endpoint", "v3/profile"),)] > 0)
+    assert(sum(h[2] for h in metrics.histograms["screener_fmp_request_seconds"].values()) == served["requests"])
@@ -0,0 +1,46 @@
+import asyncio
+import multiprocessing
+import time
+from screener.FloatIndex import FloatIndex, MappedFloatIndex
+from screener.RateLimiter import SharedRateLimiter
+from screenerV3.runner import shard_tickers
+
+UNIVERSE = {"USA": [f"US{i}" for i in range(7)], "Japan": [f"JP{i}" for i in range(4)], "UK": ["UK0", "UK1"], "Canada": ["CA0"]}
+
+def test_shards_by_country_are_balanced_and_whole():
+    shards = shard_tickers(UNIVERSE, 2)
+    assert(shards == [{"USA": UNIVERSE["USA"]}, {"Japan": UNIVERSE["Japan"], "UK": ["UK0", "UK1"], "Canada": ["CA0"]}])
+    assert(len(shard_tickers(UNIVERSE, 8)) == 4)
+
+def test_shards_by_hash_are_deterministic():
+    shards = shard_tickers(UNIVERSE, 3, by="hash")
+    assert(shards == shard_tickers(UNIVERSE, 3, by="hash"))
+    tickers = sorted(t for shard in shards for v in shard.values() for t in v)
+    assert(tickers == sorted(t for v in UNIVERSE.values() for t in v))
+
+def test_mapped_float_index_matches_index(tmp_path):
+    index = FloatIndex(str(tmp_path))
+    index.shares = {"MSFT": 200, "AAPL": 100, "NONE": None}
+    mapped = MappedFloatIndex(index.save_mapped(str(tmp_path / "universe")))
+    assert(len(mapped) == 3 and "AAPL" in mapped and "TSLA" not in mapped)
+    assert([mapped.get(t) for t in ("AAPL", "MSFT", "NONE", "TSLA")] == [100, 200, None, 0])
+
+def send(limiter, n, times):
+    for _ in range(n):
+        limiter.acquire_sync()
+        with times.get_lock():
+            times[int(times[0]) + 1] = time.monotonic()
+            times[0] += 1
+
+def test_processes_share_one_budget():
+    context = multiprocessing.get_context("fork")
+    limiter = SharedRateLimiter(4, 0.5, context)
+    times = context.Array('d', 9)
+    workers = [context.Process(target=send, args=(limiter, 4, times)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    sent = sorted(times[1:])
+    assert(times[0] == 8 and sent[4] - sent[0] >= 0.5)
+    assert(asyncio.run(asyncio.wait_for(limiter.acquire(), 1)) is None and limiter.headroom() < 4)
@@ -0,0 +1,59 @@
+import asyncio
+import json
+from screener.AsyncScreener2 import AsyncScreener2
+from screener.FMPClient import FMPClient
+import screener.FMPClient as fmp
+from screener.FMPStandIn import FMPStandIn
+from screener.RateLimiter import RateLimiter
+
+TICKERS = [f"T{i}" for i in range(40)]
+
+class OfflineSheet:
+    def get_all_previously_seen_tickers(self) -> set:
+        return set()
+
+def screen(tmp_path, resume=False, **options):
+    path = tmp_path / "universe.json"
+    path.write_text(json.dumps({"US": TICKERS}))
+    pending, peak = set(), [0]
+
+    async def main():
+        async with FMPStandIn(TICKERS, latency=0.002, jitter=1.0, seed=5) as stand_in:
+            old, fmp.BASE_URL = fmp.BASE_URL, stand_in.url
+            try:
+                async with FMPClient("key", RateLimiter(100000)) as client:
+                    get_json = client.get_json
+
+                    async def tracked(path, **params):
+                        ticker = path.rpartition('/')[2]
+                        pending.add(ticker)
+                        peak[0] = max(peak[0], len(pending - {"all"}))
+                        try:
+                            return await get_json(path, **params)
+                        finally:
+                            pending.discard(ticker)
+
+                    client.get_json = tracked
+                    screener = AsyncScreener2(str(path), client=client, sheet_client=OfflineSheet(), checkpoint_path=str(tmp_path / "checkpoint.jsonl"), **options)
+                    await screener.run_async(batch_size=len(TICKERS), resume=resume)
+                    return screener
+            finally:
+                fmp.BASE_URL = old
+
+    screener = asyncio.run(main())
+    return screener, peak[0]
+
+def test_streaming_matches_batch_evaluation_with_bounded_pending_tickers(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    batch, batch_peak = screen(tmp_path)
+    streamed, stream_peak = screen(tmp_path, stream=True, max_pending=3)
+    assert(len(batch.results) > 0 and list(streamed.results) == list(batch.results))
+    assert(json.dumps(streamed.results.to_dict()) == json.dumps(batch.results.to_dict()))
+    assert(stream_peak <= 3 < batch_peak)
+
+def test_resume_restores_the_fetched_rows_into_the_result_columns(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    first, _ = screen(tmp_path)
+    resumed, peak = screen(tmp_path, resume=True)
+    assert(peak == 0) # every ticker came from the journal
+    assert(json.dumps(resumed.results.to_dict()) == json.dumps(first.results.to_dict()))
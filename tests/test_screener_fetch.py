@@ -0,0 +1,81 @@
+import asyncio
+import json
+import aiohttp
+import pytest
+from screener.AsyncScreener import AsyncScreener
+from screener.AsyncScreener2 import AsyncScreener2
+from screener.FMPClient import FMPRequestError
+from screener.RateLimiter import RateLimiter
+
+
+class OfflineSheet:
+    def get_all_previously_seen_tickers(self) -> set:
+        return set()
+
+class StubClient:
+    def __init__(self, failing: dict = None):
+        self.rate_limiter = RateLimiter(100000)
+        self.failing = failing or {} # path -> exception raised for it
+        self.calls = [] # ("start" | "end", endpoint)
+        self.in_flight = 0
+        self.peak = 0
+
+    async def get_json(self, path, **params):
+        endpoint = path.rpartition('/')[0]
+        self.calls.append(("start", endpoint))
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if path in self.failing:
+                raise self.failing[path]
+            return [{"endpoint": endpoint}]
+        finally:
+            self.in_flight -= 1
+            self.calls.append(("end", endpoint))
+
+def screeners(tmp_path, failing=None, **options):
+    # each screener with its private `__get_data` and the endpoints it requests, in slot order
+    path = tmp_path / "universe.json"
+    path.write_text(json.dumps({"US": ["AAA"]}))
+    return [
+        (AsyncScreener(str(path), client=StubClient(failing), sheet_client=OfflineSheet(), **options), "_AsyncScreener__get_data",
+         ["v3/profile", "v3/cash-flow-statement", "v3/balance-sheet-statement"]),
+        (AsyncScreener2(str(path), client=StubClient(failing), sheet_client=OfflineSheet(), checkpoint_path=str(tmp_path / "checkpoint.jsonl"), **options), "_AsyncScreener2__get_data",
+         ["v3/profile", "v3/key-metrics-ttm", "v3/balance-sheet-statement", "v3/cash-flow-statement"]),
+    ]
+
+@pytest.mark.parametrize("fan_out", [True, False])
+def test_endpoints_overlap_only_when_fanned_out(tmp_path, fan_out):
+    for screener, get_data, endpoints in screeners(tmp_path, fan_out=fan_out):
+        client = screener.client
+        data = asyncio.run(getattr(screener, get_data)("AAA"))
+        assert([payload[0]["endpoint"] for payload in data] == endpoints)
+        if fan_out:
+            assert(client.peak == len(endpoints) and [kind for kind, _ in client.calls[:len(endpoints)]] == ["start"] * len(endpoints))
+        else:
+            assert(client.peak == 1 and client.calls == [(kind, endpoint) for endpoint in endpoints for kind in ("start", "end")])
+
+def test_semaphore_caps_requests_in_flight(tmp_path):
+    for screener, get_data, endpoints in screeners(tmp_path, max_concurrency=2):
+        client = screener.client
+
+        async def main():
+            return await asyncio.gather(*[getattr(screener, get_data)(ticker) for ticker in ("AAA", "BBB", "CCC")])
+
+        asyncio.run(main())
+        assert(client.peak == 2 and len(client.calls) == 2 * 3 * len(endpoints))
+
+def test_failing_endpoint_leaves_none_in_its_slot(tmp_path):
+    failing = {
+        "v3/cash-flow-statement/AAA": aiohttp.ClientConnectionError("reset"),
+        "v3/balance-sheet-statement/BBB": FMPRequestError("v3/balance-sheet-statement/BBB", "429 Too Many Requests"),
+    }
+    for screener, get_data, endpoints in screeners(tmp_path, failing):
+        async def main():
+            return await asyncio.gather(getattr(screener, get_data)("AAA"), getattr(screener, get_data)("BBB"))
+
+        for ticker, data in zip(("AAA", "BBB"), asyncio.run(main())):
+            expected = [None if f"{endpoint}/{ticker}" in failing else [{"endpoint": endpoint}] for endpoint in endpoints]
+            assert(list(data) == expected)
+        assert(screener.retry_queue == {"BBB"})
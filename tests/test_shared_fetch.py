@@ -0,0 +1,71 @@
+import asyncio
+from screener import Metrics
+from screener.FMPClient import FMPRequestError
+from screener.SharedFetch import SharedFetch
+
+
+class FakeClient:
+    def __init__(self, fail: int = 0):
+        self.paths = []
+        self.fail = fail
+
+    async def get_json(self, path, **params):
+        self.paths.append(path)
+        await asyncio.sleep(0.01)
+        if self.fail:
+            self.fail -= 1
+            raise FMPRequestError(path, "429 Too Many Requests")
+        endpoint, _, tickers = path.rpartition('/')
+        if endpoint == "v3/profile":
+            return [{"symbol": t} for t in tickers.split(',') if t != "GONE"]
+        return [{"path": path, **params}]
+
+def test_requests_are_sent_once_and_coalesced():
+    client = FakeClient()
+    fetch = SharedFetch(client)
+
+    async def main():
+        first = await asyncio.gather(*[fetch.get_json('v3/cash-flow-statement/AAA', period='annual', limit=5) for _ in range(3)])
+        again = await fetch.get_json('v3/cash-flow-statement/AAA', limit=5, period='annual')
+        other = await fetch.get_json('v3/cash-flow-statement/AAA', period='quarter', limit=5)
+        return first, again, other
+
+    first, again, other = asyncio.run(main())
+    assert(client.paths == ['v3/cash-flow-statement/AAA'] * 2)
+    assert(first[0] == first[2] == again and other[0]["period"] == "quarter")
+    assert(fetch.stats["coalesced"] == 2 and fetch.stats["deduplicated"] == 1)
+
+def test_profile_batches_are_split_by_ticker():
+    client = FakeClient()
+    fetch = SharedFetch(client)
+
+    async def main():
+        return await asyncio.gather(fetch.get_json('v3/profile/A,B,GONE'), fetch.get_json('v3/profile/B,C'))
+
+    first, second = asyncio.run(main())
+    assert(client.paths == ['v3/profile/A,B,GONE', 'v3/profile/C'])
+    assert(first == [{"symbol": "A"}, {"symbol": "B"}] and second == [{"symbol": "B"}, {"symbol": "C"}])
+    assert(asyncio.run(fetch.get_json('v3/profile/GONE')) == [] and len(client.paths) == 2)
+
+def test_transient_failures_are_not_kept():
+    client = FakeClient(fail=1)
+    fetch = SharedFetch(client)
+
+    async def main():
+        try:
+            await fetch.get_json('v3/key-metrics-ttm/AAA')
+        except FMPRequestError:
+            pass
+        return await fetch.get_json('v3/key-metrics-ttm/AAA')
+
+    assert(asyncio.run(main())[0]["path"] == 'v3/key-metrics-ttm/AAA' and len(client.paths) == 2)
+
+def test_derived_values_are_computed_once():
+    fetch = SharedFetch(FakeClient())
+    bs = [{"totalCurrentAssets": 900, "totalLiabilities": 300, "netDebt": 5}]
+    calls = []
+    derive = lambda: calls.append(1) or Metrics.derive("balance_sheet", bs)
+    assert(fetch.derive("balance_sheet", "AAA", derive)["ncav"] == 600)
+    assert(fetch.derive("balance_sheet", "AAA", derive)["ncav"] == 600 and len(calls) == 1)
+    row = Metrics.new_row(market_cap=1200, **Metrics.derive("balance_sheet", bs))
+    assert(Metrics.ncav_ratio(row) == 2.0)
@@ -0,0 +1,35 @@
+from screener.RateLimiter import RateLimiter
+from screener.Sheet import read_seen_tickers
+from screener.SheetWriter import SheetWriter
+
+
+class FakeTab:
+    def __init__(self, title, tickers):
+        self.title = title
+        self.tickers = tickers
+
+class FakeFile:
+    def __init__(self, tabs):
+        self.tabs = {tab.title: tab for tab in tabs}
+        self.requests = []
+
+    def values_batch_get(self, ranges):
+        self.requests.append(ranges)
+        titles = [r.rpartition("!")[0][1:-1].replace("''", "'") for r in ranges]
+        return {"valueRanges": [{"range": r, "values": [[t] for t in self.tabs[title].tickers]} for r, title in zip(ranges, titles)]}
+
+def test_reads_every_tab_in_one_request_and_caches_old_tabs(tmp_path):
+    cache = str(tmp_path / "seen.json")
+    tabs = [FakeTab("1-Jan-2024", ["A", "B"]), FakeTab("8-Jan-2024", ["C"]), FakeTab("Bob's", ["D", ""])]
+    file = FakeFile(tabs)
+    writer = SheetWriter(RateLimiter(1000))
+
+    seen = read_seen_tickers(file, tabs, writer, cache)
+    assert(seen == {"A", "B", "C", "D"} and len(file.requests) == 1)
+    assert(file.requests[0][2] == "'Bob''s'!A2:A1000")
+
+    tabs.append(FakeTab("15-Jan-2024", ["E"]))
+    file = FakeFile(tabs)
+    seen = read_seen_tickers(file, tabs[1:], writer, cache)
+    assert(seen == {"C", "D", "E"})
+    assert(file.requests == [["'15-Jan-2024'!A2:A1000"]]) # only the newest tab is new
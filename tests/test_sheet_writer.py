@@ -0,0 +1,69 @@
+from gspread.utils import a1_range_to_grid_range
+from screener.RateLimiter import RateLimiter
+from screener.SheetWriter import SheetWriter
+
+
+class FakeWorksheet:
+    def __init__(self):
+        self.row_count = 0
+        self.col_count = 0
+        self.cells = {}
+        self.calls = []
+
+    def resize(self, rows, cols):
+        self.calls.append("resize")
+        self.row_count, self.col_count = rows, cols
+
+    def __set(self, range_name, values):
+        grid = a1_range_to_grid_range(range_name)
+        assert(grid["startRowIndex"] + len(values) <= self.row_count)
+        for r, row in enumerate(values):
+            for c, value in enumerate(row):
+                assert(grid["startColumnIndex"] + c < self.col_count)
+                self.cells[(grid["startRowIndex"] + r, grid["startColumnIndex"] + c)] = value
+
+    def update(self, values, range_name):
+        self.calls.append("update")
+        self.__set(range_name, values)
+
+    def batch_update(self, data):
+        self.calls.append("batch_update")
+        for i in data:
+            self.__set(i["range"], i["values"])
+
+    def get_values(self, value_render_option=None):
+        self.calls.append("get_values")
+        rows = max((r for r, c in self.cells if self.cells[(r, c)] != ""), default=-1) + 1
+        cols = max((c for r, c in self.cells if self.cells[(r, c)] != ""), default=-1) + 1
+        return [[self.cells.get((r, c), "") for c in range(cols)] for r in range(rows)]
+
+def table(n, nan_row=None):
+    rows = [["Ticker", "Name", "Ratio"]]
+    for i in range(n):
+        rows.append([f"T{i}", f"Company {i}", float("nan") if i == nan_row else i / 2])
+    return rows
+
+def test_writes_table_in_one_request():
+    sheet = FakeWorksheet()
+    writer = SheetWriter(RateLimiter(1000))
+    assert(writer.write(sheet, table(300, nan_row=3)) == 301 * 3)
+    assert(sheet.calls == ["resize", "update"])
+    assert(sheet.cells[(4, 2)] == "N/A" and sheet.cells[(300, 0)] == "T299")
+
+def test_chunks_only_above_the_cell_limit():
+    sheet = FakeWorksheet()
+    writer = SheetWriter(RateLimiter(1000), max_cells=300)
+    writer.write(sheet, table(250))
+    assert(sheet.calls.count("update") == 3 and writer.requests == 4)
+    assert(sheet.cells[(250, 1)] == "Company 249")
+
+def test_diff_only_rewrites_changed_cells():
+    sheet = FakeWorksheet()
+    SheetWriter(RateLimiter(1000)).write(sheet, table(10))
+    writer = SheetWriter(RateLimiter(1000), diff_only=True)
+    rows = table(8)
+    rows[2][2] = 99
+    assert(writer.write(sheet, rows) == 1 + 2 * 3)
+    assert(sheet.calls[-2:] == ["get_values", "batch_update"])
+    assert(sheet.get_values() == rows)
+    assert(writer.write(sheet, rows) == 0 and sheet.calls[-1] == "get_values")
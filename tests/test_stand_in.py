@@ -0,0 +1,68 @@
+import asyncio
+from screener.FMPClient import FMPClient
+import screener.FMPClient as fmp
+from screener.FMPStandIn import FMPStandIn
+from screener.RateLimiter import RateLimiter
+
+
+def run(stand_in, test):
+    async def main():
+        async with stand_in:
+            old, fmp.BASE_URL = fmp.BASE_URL, stand_in.url
+            try:
+                async with FMPClient("key", RateLimiter(1000), max_retries=8, backoff=0.01) as client:
+                    return await test(client)
+            finally:
+                fmp.BASE_URL = old
+    return asyncio.run(main())
+
+def test_synthetic_payloads_are_deterministic():
+    async def test(client):
+        profiles = await client.get_json('v3/profile/AAA,BBB')
+        sheets = await client.get_json('v3/balance-sheet-statement/AAA', period='quarter', limit=5)
+        prices = await client.get_json('v3/historical-price-full/AAA', serietype='line', **{"from": "2024-01-01", "to": "2024-01-31"})
+        floats = await client.get_json('v4/shares_float/all')
+        missing = await client.get_json('v3/unknown/AAA')
+        return profiles, sheets, prices, floats, missing
+
+    first = run(FMPStandIn(["AAA", "BBB"]), test)
+    profiles, sheets, prices, floats, missing = first
+    assert([i["symbol"] for i in profiles] == ["AAA", "BBB"] and "mktCap" in profiles[0])
+    assert(len(sheets) == 5 and sheets[0]["date"] > sheets[1]["date"])
+    assert(prices["historical"][0]["date"] == "2024-01-31" and set(prices["historical"][0]) == {"date", "close"})
+    assert([i["symbol"] for i in floats] == ["AAA", "BBB"])
+    assert(missing is None)
+    assert(run(FMPStandIn(["AAA", "BBB"]), test)[:4] == first[:4])
+
+def test_injected_faults_are_retried():
+    stand_in = FMPStandIn(["AAA"], throttle_rate=0.3, error_rate=0.2, rate_limit=5, period=0.05, seed=1)
+
+    async def test(client):
+        return await asyncio.gather(*[client.get_json(f'v3/profile/T{i}') for i in range(20)]), client.get_stats()
+
+    res, stats = run(stand_in, test)
+    served = stand_in.get_stats()
+    assert(all(r[0]["symbol"] == f"T{i}" for i, r in enumerate(res)))
+    assert(served["throttled"] > 0 and served["errors"] > 0 and served["served"] == 20)
+    assert(stats["retries"] == served["throttled"] + served["errors"])
+
+def test_record_and_replay(tmp_path):
+    cassette = str(tmp_path / "cassette.jsonl")
+    upstream = FMPStandIn(["AAA"])
+
+    async def test(client):
+        return await client.get_json('v3/key-metrics-ttm/AAA', period='quarter'), await client.get_json('v3/profile/BBB')
+
+    async def main():
+        async with upstream: # the recorder runs its own loop in a thread and forwards to this one
+            return await asyncio.to_thread(run, FMPStandIn(mode="record", cassette=cassette, upstream=upstream.url), test)
+
+    recorded = asyncio.run(main())
+    stand_in = FMPStandIn(mode="replay", cassette=cassette)
+    assert(run(stand_in, test) == recorded and recorded[0][0]["marketCapTTM"] > 0)
+    with open(cassette) as file:
+        assert("apikey" not in file.read())
+
+    async def missing(client):
+        return await client.get_json('v3/profile/CCC')
+    assert(run(stand_in, missing) is None and stand_in.get_stats()["missed"] == 1)